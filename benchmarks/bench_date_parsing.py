@@ -0,0 +1,49 @@
+# Fichier : benchmarks/bench_date_parsing.py
+# Micro-benchmark : construction des objets Conge à partir de lignes SQLite (dateutil vs fromisoformat).
+#
+# Usage : python benchmarks/bench_date_parsing.py [nombre_de_lignes]
+
+import sys
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db import models
+from utils.date_utils import validate_date, parse_sql_date
+
+def _build_rows(nb_rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE conges (id INTEGER PRIMARY KEY, agent_id INTEGER, type_conge TEXT, justif TEXT, interim_id INTEGER, date_debut TEXT, date_fin TEXT, jours_pris INTEGER, statut TEXT)")
+    origin = date(2015, 1, 1)
+    conn.executemany(
+        "INSERT INTO conges (agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i % 5000, 'Congé annuel', '', None, (origin + timedelta(days=i % 3650)).isoformat(),
+          (origin + timedelta(days=i % 3650 + 4)).isoformat(), 5, 'Actif') for i in range(nb_rows)))
+    rows = conn.execute("SELECT id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut FROM conges").fetchall()
+    conn.close()
+    return rows
+
+def _rows_per_second(rows, date_parser):
+    models.parse_sql_date = date_parser
+    try:
+        start = time.perf_counter()
+        for row in rows:
+            models.Conge.from_db_row(row)
+        elapsed = time.perf_counter() - start
+    finally:
+        models.parse_sql_date = parse_sql_date
+    return len(rows) / elapsed
+
+if __name__ == "__main__":
+    nb_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = _build_rows(nb_rows)
+    # Ancien chemin : dateutil sur chaque date écrite par la base.
+    avant = _rows_per_second(rows, validate_date)
+    apres = _rows_per_second(rows, parse_sql_date)
+    print(f"{nb_rows} lignes de congés")
+    print(f"  avant (dateutil)       : {avant:>12,.0f} lignes/s")
+    print(f"  après (fromisoformat)  : {apres:>12,.0f} lignes/s")
+    print(f"  accélération           : x{apres / avant:.1f}")
@@ -0,0 +1,60 @@
+# Fichier : benchmarks/bench_get_conges.py
+# Benchmark : chargement de tous les congés (get_conges) via le row_factory des modèles,
+# comparé au constructeur validant (Conge.from_db_row) : durée et mémoire par congé.
+#
+# Usage : python benchmarks/bench_get_conges.py [nombre_de_conges]
+
+import sys
+import os
+import gc
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db.database import DatabaseManager
+from db.models import Conge
+
+COLONNES = "id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut"
+
+def _build_db(path, nb_conges):
+    db = DatabaseManager(path)
+    db.connect()
+    with mock.patch("db.database.messagebox"):
+        db.run_migrations()
+    agent_ids = db.bulk_insert_agents([(f"Nom{i}", "Prénom", f"PPR{i}", "Technicien") for i in range(5000)])
+    origine = date(2015, 1, 1)
+    types = ("Congé annuel", "Congé de maladie", "Congé exceptionnel")
+    db.bulk_insert_conges(
+        Conge(None, agent_ids[i % len(agent_ids)], types[i % 3], "", None, (origine + timedelta(days=i % 3650)).isoformat(),
+              (origine + timedelta(days=i % 3650 + 4)).isoformat(), 5)
+        for i in range(nb_conges))
+    return db
+
+def _mesure(charger):
+    # Durée sans tracemalloc (qui ralentit fortement les allocations), puis mémoire sur un second chargement.
+    gc.collect()
+    start = time.perf_counter()
+    nb = len(charger())
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    conges = charger()
+    octets, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del conges
+    return nb, elapsed, octets / nb
+
+if __name__ == "__main__":
+    nb_conges = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _build_db(os.path.join(tmp, "bench.db"), nb_conges)
+        avant = _mesure(lambda: [Conge.from_db_row(r) for r in db.execute_query(f"SELECT {COLONNES} FROM conges ORDER BY date_debut DESC", fetch="all")])
+        apres = _mesure(db.get_conges)
+        db.close()
+    print(f"{nb_conges} congés")
+    for libelle, (nb, duree, octets) in (("from_db_row (validant)", avant), ("row_factory (get_conges)", apres)):
+        print(f"  {libelle:<26}: {duree:6.2f} s  {nb / duree:>10,.0f} congés/s  {octets:6.0f} octets/congé")
@@ -0,0 +1,161 @@
+# Fichier : core/conges/audit.py
+# Audit en masse des congés annuels d'une année, réparti par tranches d'agents sur plusieurs processus.
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from db.backup import connect_read_only
+from db.models import Conge, SoldeAnnuel
+from core.conges.strategies import CongeAnnuelStrategy
+
+TYPE_AUDITE = 'Congé annuel'
+
+
+class AuditReport:
+    """
+    Résultat d'un audit :
+      - jours_incoherents : (Conge, jours recalculés) dont le décompte ne correspond plus au calendrier ;
+      - chevauchements : (Conge, Conge) de congés actifs d'un même agent qui se recouvrent ;
+      - soldes_negatifs : SoldeAnnuel dont le solde est inférieur à zéro ;
+      - ecarts_journal : (SoldeAnnuel, solde reconstitué) quand le solde enregistré diffère du dernier
+        point de contrôle augmenté des mouvements journalisés depuis.
+    """
+    def __init__(self, year):
+        self.year = year
+        self.jours_incoherents = []
+        self.chevauchements = []
+        self.soldes_negatifs = []
+        self.ecarts_journal = []
+        self.agents = {}
+        self.nb_agents = 0
+        self.nb_conges = 0
+
+    def __len__(self):
+        return len(self.jours_incoherents) + len(self.chevauchements) + len(self.soldes_negatifs) + len(self.ecarts_journal)
+
+    def agent_name(self, agent_id):
+        return self.agents.get(agent_id, "Agent Inconnu")
+
+    def _merge(self, partial):
+        self.nb_conges += partial['nb_conges']
+        self.agents.update(partial['agents'])
+        conge = lambda row: Conge.row_factory(None, row)
+        self.jours_incoherents.extend((conge(row), jours) for row, jours in partial['jours_incoherents'])
+        self.chevauchements.extend((conge(a), conge(b)) for a, b in partial['chevauchements'])
+        self.soldes_negatifs.extend(SoldeAnnuel(*row) for row in partial['soldes_negatifs'])
+        self.ecarts_journal.extend((SoldeAnnuel(*row), solde_journal) for row, solde_journal in partial['ecarts_journal'])
+
+
+class AnnualLeaveAuditor:
+    """
+    Audite les congés annuels d'une année sur toute la base.
+
+    Les agents sont découpés en tranches d'identifiants consécutifs ; chaque tranche est traitée par
+    un processus du pool, sur sa propre connexion en lecture seule : le thread Tk et les connexions
+    d'écriture de l'application ne sont pas sollicités. Les jours sont recalculés par lots
+    (numpy.busday_count quand NumPy est disponible). Une seule tranche est traitée sans pool, le
+    démarrage des processus coûtant alors plus que le calcul.
+    """
+    AGENTS_PAR_TRANCHE = 2000
+
+    def __init__(self, db_path, max_workers=None, agents_par_tranche=None):
+        self.db_path = db_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.agents_par_tranche = agents_par_tranche or self.AGENTS_PAR_TRANCHE
+
+    def run(self, year, holidays_set, progress=None):
+        """
+        Audite l'année 'year' avec les jours fériés 'holidays_set' ; retourne un AuditReport.
+        'progress(agents_traites, agents_total)' est appelé depuis le thread appelant après chaque tranche.
+        """
+        conn = connect_read_only(self.db_path)
+        try: agent_ids = [row[0] for row in conn.execute("SELECT id FROM agents ORDER BY id")]
+        finally: conn.close()
+
+        report = AuditReport(year)
+        report.nb_agents = len(agent_ids)
+        tranches = [agent_ids[i:i + self.agents_par_tranche] for i in range(0, len(agent_ids), self.agents_par_tranche)]
+        args = [(self.db_path, tranche[0], tranche[-1], year, frozenset(holidays_set)) for tranche in tranches]
+        done = 0
+        if progress: progress(0, len(agent_ids))
+        if len(tranches) <= 1 or self.max_workers <= 1:
+            for tranche, tranche_args in zip(tranches, args):
+                report._merge(audit_tranche(*tranche_args))
+                done += len(tranche)
+                if progress: progress(done, len(agent_ids))
+        else:
+            # 'spawn' : les processus ne partagent ni les connexions ni les verrous du processus Tk.
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tranches)), mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(audit_tranche, *tranche_args): len(tranche) for tranche, tranche_args in zip(tranches, args)}
+                for future in as_completed(futures):
+                    report._merge(future.result())
+                    done += futures[future]
+                    if progress: progress(done, len(agent_ids))
+        report.jours_incoherents.sort(key=lambda item: (item[0].agent_id, item[0].date_debut))
+        report.chevauchements.sort(key=lambda item: (item[0].agent_id, item[0].date_debut))
+        return report
+
+
+def audit_tranche(db_path, first_agent_id, last_agent_id, year, holidays_set):
+    """
+    Audite les agents d'identifiant compris entre 'first_agent_id' et 'last_agent_id' (processus de
+    travail). Retourne des lignes brutes, sérialisables, que AuditReport convertit en modèles.
+    """
+    conn = connect_read_only(db_path)
+    try:
+        # L'index par agent borne la lecture à la tranche ; sans indication, SQLite préfère l'index
+        # (statut, dates), qui parcourt l'année entière pour chaque tranche.
+        conges = conn.execute("""SELECT id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut
+                                 FROM conges INDEXED BY idx_conges_agent_statut_dates
+                                 WHERE agent_id BETWEEN ? AND ? AND statut = 'Actif' AND date_debut <= ? AND date_fin >= ?
+                                 ORDER BY agent_id, date_debut, id""",
+                              (first_agent_id, last_agent_id, f"{year}-12-31", f"{year}-01-01")).fetchall()
+        soldes = conn.execute("""
+            WITH derniers_points AS (
+                SELECT p.agent_id, p.annee, p.solde, p.mouvement_id FROM points_controle_solde p
+                WHERE p.agent_id BETWEEN ?1 AND ?2
+                  AND p.date_point = (SELECT MAX(q.date_point) FROM points_controle_solde q WHERE q.agent_id = p.agent_id AND q.annee = p.annee)
+            )
+            SELECT s.id, s.agent_id, s.annee, s.solde, s.statut,
+                   COALESCE(dp.solde, 0) + COALESCE((SELECT SUM(m.delta) FROM mouvements_solde m
+                                                     WHERE m.agent_id = s.agent_id AND m.annee = s.annee AND m.id > COALESCE(dp.mouvement_id, 0)), 0),
+                   dp.agent_id IS NOT NULL OR EXISTS (SELECT 1 FROM mouvements_solde m WHERE m.agent_id = s.agent_id AND m.annee = s.annee)
+            FROM soldes_annuels s LEFT JOIN derniers_points dp ON dp.agent_id = s.agent_id AND dp.annee = s.annee
+            WHERE s.agent_id BETWEEN ?1 AND ?2""", (first_agent_id, last_agent_id)).fetchall()
+
+        annuels = [row for row in conges if row[2] == TYPE_AUDITE]
+        recalcules = CongeAnnuelStrategy().calculate_days_batch([date.fromisoformat(row[5][:10]) for row in annuels],
+                                                                [date.fromisoformat(row[6][:10]) for row in annuels], holidays_set)
+        partial = {
+            'nb_conges': len(annuels),
+            'jours_incoherents': [(row, jours) for row, jours in zip(annuels, recalcules) if float(jours) != float(row[7])],
+            'chevauchements': _chevauchements(conges),
+            'soldes_negatifs': [row[:5] for row in soldes if row[3] < 0],
+            'ecarts_journal': [(row[:5], round(row[5], 2)) for row in soldes if row[6] and round(row[3] - row[5], 2) != 0],
+        }
+        agent_ids = {row[0][1] for row in partial['jours_incoherents']} | {a[1] for a, _ in partial['chevauchements']}
+        agent_ids |= {row[1] for row in partial['soldes_negatifs']} | {row[1] for row, _ in partial['ecarts_journal']}
+        partial['agents'] = {}
+        if agent_ids:
+            placeholders = ','.join('?' for _ in agent_ids)
+            partial['agents'] = {agent_id: f"{nom} {prenom or ''}".strip() for agent_id, nom, prenom in
+                                 conn.execute(f"SELECT id, nom, prenom FROM agents WHERE id IN ({placeholders})", tuple(agent_ids))}
+        return partial
+    finally:
+        conn.close()
+
+
+def _chevauchements(conges):
+    """Toutes les paires de congés d'un même agent qui se recouvrent, pour des lignes triées par (agent_id, date_debut)."""
+    paires = []
+    agent_courant, actifs = None, []  # Congés de l'agent courant qui ne sont pas encore terminés.
+    for row in conges:
+        if row[1] != agent_courant:
+            agent_courant, actifs = row[1], []
+        debut = row[5][:10]
+        actifs = [a for a in actifs if a[6][:10] >= debut]
+        paires.extend((a, row) for a in actifs)
+        actifs.append(row)
+    return paires
@@ -0,0 +1,117 @@
+# Fichier : core/conges/coverage.py
+# Couverture des effectifs : nombre d'agents en congé par jour et par grade sur une période.
+
+import threading
+from collections import OrderedDict
+from itertools import accumulate, chain
+from datetime import timedelta
+
+from utils.date_utils import as_date
+
+
+class CoverageReport:
+    """
+    Absences par jour sur [debut, fin] : 'par_grade[grade][i]' et 'totaux[i]' comptent les agents en
+    congé le jour 'debut + i'. Un jour est critique pour un grade quand ses absents dépassent le seuil
+    du grade. Les 'grades' donnés figurent dans le rapport même sans absent.
+    """
+    def __init__(self, debut, fin, par_grade, seuils, seuil_defaut, grades=()):
+        self.debut = debut
+        self.fin = fin
+        nb_jours = (fin - debut).days + 1
+        self.par_grade = {**{grade: [0] * nb_jours for grade in grades}, **par_grade}
+        self.seuils = seuils
+        self.seuil_defaut = seuil_defaut
+        self.totaux = [sum(counts[i] for counts in self.par_grade.values()) for i in range(nb_jours)]
+
+    @property
+    def grades(self):
+        return sorted(self.par_grade)
+
+    def jours(self):
+        return [self.debut + timedelta(days=i) for i in range(len(self.totaux))]
+
+    def seuil(self, grade):
+        return self.seuils.get(grade, self.seuil_defaut)
+
+    def jours_critiques(self):
+        """{jour: [grades dont les absents dépassent le seuil]}, par ordre chronologique."""
+        critiques = {}
+        for grade in self.grades:
+            seuil = self.seuil(grade)
+            if seuil is None: continue
+            for i, count in enumerate(self.par_grade[grade]):
+                if count > seuil: critiques.setdefault(i, []).append(grade)
+        return {self.debut + timedelta(days=i): critiques[i] for i in sorted(critiques)}
+
+    def rows(self):
+        """Lignes (jour, total, absents par grade dans l'ordre de 'grades') pour l'affichage et l'export."""
+        grades = self.grades
+        return [(jour, self.totaux[i], *(self.par_grade[g][i] for g in grades)) for i, jour in enumerate(self.jours())]
+
+
+class CoverageEngine:
+    """
+    Calcule la couverture des effectifs d'une période à partir des congés actifs, lus en une requête.
+
+    Les congés d'un même agent qui se recouvrent sont d'abord fusionnés (un agent n'est compté qu'une
+    fois par jour). Chaque congé ne produit ensuite que deux événements, +1 au premier jour et -1 au
+    lendemain du dernier jour (bornés à la période) ; un seul balayage cumulatif de la période donne
+    les absents de chaque jour : le coût est proportionnel au nombre de congés plus le nombre de jours,
+    et non à leur produit. Les résultats sont mémorisés par période jusqu'à la prochaine modification
+    de congé ou d'agent ('invalidate').
+    """
+    def __init__(self, db_manager, max_periods=16):
+        self.db = db_manager
+        self.max_periods = max_periods
+        self._reports = OrderedDict()
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    def compute(self, debut, fin, seuils=None, seuil_defaut=None, grades=()):
+        """Couverture de [debut, fin] (CoverageReport) ; 'seuils' : {grade: absents tolérés}, sinon 'seuil_defaut'."""
+        debut, fin = as_date(debut), as_date(fin)
+        if fin < debut: raise ValueError("La date de fin précède la date de début.")
+        key = (debut, fin)
+        with self._lock:
+            if key in self._reports:
+                self._reports.move_to_end(key)
+                par_grade = self._reports[key]
+                return CoverageReport(debut, fin, par_grade, seuils or {}, seuil_defaut, grades)
+            generation = self._generation
+        par_grade = self._sweep(debut, fin, self.db.get_leave_spans(debut.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')))
+        with self._lock:
+            # Une modification survenue pendant le calcul rend le résultat périmé : on ne le mémorise pas.
+            if generation == self._generation:
+                self._reports[key] = par_grade
+                while len(self._reports) > self.max_periods:
+                    self._reports.popitem(last=False)
+        return CoverageReport(debut, fin, par_grade, seuils or {}, seuil_defaut, grades)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._reports.clear()
+
+    @staticmethod
+    def _sweep(debut, fin, spans):
+        """'spans' : lignes (agent_id, grade, premier jour, dernier jour) en ordinaux, triées par agent puis début."""
+        origin, nb_jours = debut.toordinal(), (fin - debut).days + 1
+        events = {}
+        # Une ligne sentinelle vide le dernier congé fusionné.
+        agent_courant = grade_courant = span_debut = span_fin = None
+        for agent_id, grade, s, e in chain(spans, [(None, None, 0, 0)]):
+            if agent_courant is not None and agent_id == agent_courant and s <= span_fin + 1:
+                if e > span_fin: span_fin = e
+                continue
+            if agent_courant is not None:
+                # Congé fusionné de l'agent précédent, borné à la période : +1 le premier jour, -1 le lendemain du dernier.
+                start = max(span_debut - origin, 0)
+                stop = min(span_fin - origin + 1, nb_jours)
+                if start < stop:
+                    deltas = events.get(grade_courant)
+                    if deltas is None: deltas = events[grade_courant] = [0] * (nb_jours + 1)
+                    deltas[start] += 1
+                    deltas[stop] -= 1
+            agent_courant, grade_courant, span_debut, span_fin = agent_id, grade, s, e
+        return {grade: list(accumulate(deltas[:nb_jours])) for grade, deltas in events.items()}
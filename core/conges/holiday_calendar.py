@@ -0,0 +1,133 @@
+# Fichier : core/conges/holiday_calendar.py
+# Cache des jours fériés par année, partagé par toute l'application via le CongeManager.
+
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from utils.config_loader import CONFIG
+from utils.date_utils import load_official_holidays, parse_sql_date
+
+class HolidayCalendar:
+    """
+    Mémorise les jours fériés (officiels et personnalisés) année par année.
+
+    Les jours officiels sont matérialisés dans la table 'jours_feries' : la bibliothèque
+    'holidays' n'est sollicitée que pour générer une année absente de la base. Les années
+    manquantes du cache sont ensuite chargées en une seule requête par plage de dates, puis
+    conservées tant qu'elles restent parmi les 'max_years' années les plus récemment utilisées.
+    Les modifications de jours fériés personnalisés invalident uniquement les années concernées.
+    """
+    def __init__(self, db_manager, max_years=12, max_periods=32):
+        self.db = db_manager
+        self.max_years = max_years
+        self.max_periods = max_periods
+        self._years = OrderedDict()
+        self._periods = OrderedDict()
+        self._generated_years = None
+        self._lock = threading.RLock()
+
+    def get_year(self, year):
+        """Retourne l'ensemble (frozenset) des jours fériés d'une année."""
+        with self._lock:
+            if year in self._years:
+                self._years.move_to_end(year)
+                return self._years[year]
+        return self._load_years([year])[year]
+
+    def get_holidays_set_for_period(self, start_year, end_year):
+        """
+        Retourne les jours fériés de 'start_year' à 'end_year' inclus, plus une année de marge
+        pour les calculs de date de fin et de reprise qui débordent sur l'année suivante.
+        """
+        key = (start_year, end_year)
+        years = range(start_year, end_year + 2)
+        with self._lock:
+            if key in self._periods:
+                self._periods.move_to_end(key)
+                return self._periods[key]
+            known = {y: self._years[y] for y in years if y in self._years}
+        missing = [y for y in years if y not in known]
+        if missing:
+            known.update(self._load_years(missing))
+        period_set = frozenset().union(*known.values())
+        with self._lock:
+            self._periods[key] = period_set
+            while len(self._periods) > self.max_periods:
+                self._periods.popitem(last=False)
+        return period_set
+
+    def get_holidays_for_year(self, year):
+        """Liste détaillée des jours fériés d'une année : (date, nom, type, source)."""
+        self.ensure_generated([year])
+        return self.db.get_holidays_between(f"{year}-01-01", f"{year}-12-31")
+
+    def ensure_generated(self, years):
+        """Génère en base les jours fériés officiels des années qui n'y sont pas encore."""
+        country_code = CONFIG['conges']['holidays_country']
+        with self._lock:
+            if self._generated_years is None:
+                self._generated_years = self.db.get_generated_holiday_years(country_code)
+            missing = [y for y in years if y not in self._generated_years]
+        for year in missing:
+            self.db.replace_official_holidays(country_code, year, load_official_holidays(year, country_code))
+            with self._lock:
+                self._generated_years.add(year)
+
+    def materialize_window(self, center_year, window=None):
+        """Génère à l'avance les jours officiels de la fenêtre d'années configurée autour de 'center_year'."""
+        if window is None:
+            window = int(CONFIG['conges'].get('holidays_years_window', 5))
+        self.ensure_generated(range(center_year - window, center_year + window + 1))
+
+    def invalidate_year(self, year):
+        """Oublie une année (et toutes les périodes qui la contiennent)."""
+        with self._lock:
+            self._years.pop(year, None)
+            for key in [k for k in self._periods if k[0] <= year <= k[1] + 1]:
+                del self._periods[key]
+
+    def invalidate_date(self, date_sql):
+        """Invalide l'année d'une date au format SQL (YYYY-MM-DD)."""
+        try:
+            self.invalidate_year(int(str(date_sql)[:4]))
+        except ValueError:
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._years.clear()
+            self._periods.clear()
+            self._generated_years = None
+
+    def _load_years(self, years):
+        """Charge plusieurs années en une seule requête par plage et les mémorise."""
+        first_year, last_year = min(years), max(years)
+        try:
+            self.ensure_generated(years)
+            rows = self.db.get_holidays_between(f"{first_year}-01-01", f"{last_year}-12-31")
+        except (sqlite3.Error, ImportError) as e:
+            # En cas d'erreur, on se contente des jours officiels sans les mémoriser.
+            logging.error(f"Erreur lors du chargement des jours fériés pour {first_year}-{last_year}: {e}")
+            return {year: self._official_fallback(year) for year in years}
+
+        by_year = {year: set() for year in years}
+        for date_str, name, h_type, source in rows:
+            h_date = parse_sql_date(date_str).date()
+            if h_date.year in by_year:
+                by_year[h_date.year].add(h_date)
+        loaded = {year: frozenset(dates) for year, dates in by_year.items()}
+        with self._lock:
+            for year, year_set in loaded.items():
+                self._years[year] = year_set
+                self._years.move_to_end(year)
+            while len(self._years) > self.max_years:
+                self._years.popitem(last=False)
+        return loaded
+
+    def _official_fallback(self, year):
+        try:
+            return frozenset(load_official_holidays(year))
+        except ImportError:
+            return frozenset()
@@ -0,0 +1,135 @@
+# Fichier : core/conges/intervals.py
+# Index en mémoire des congés actifs de chaque agent, pour détecter les chevauchements sans requête.
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+from utils.date_utils import as_date
+
+
+class LeaveInterval(namedtuple('LeaveInterval', ['debut', 'fin', 'conge_id', 'type_conge'])):
+    """Congé actif réduit à ses bornes (objets date), comparable par date de début."""
+    __slots__ = ()
+
+    @classmethod
+    def from_conge(cls, conge):
+        return cls(as_date(conge.date_debut), as_date(conge.date_fin), conge.id, conge.type_conge)
+
+
+class AgentIntervals:
+    """
+    Congés actifs d'un agent, triés par date de début, avec le maximum cumulé des dates de fin.
+
+    Les congés qui recouvrent [debut, fin] sont ceux qui commencent au plus tard à 'fin' (une recherche
+    dichotomique sur les débuts) et dont la fin est au moins 'debut' : le maximum cumulé des fins étant
+    croissant, une seconde recherche dichotomique donne le premier candidat. Les congés d'un agent étant
+    normalement disjoints, la réponse coûte O(log n + k).
+    """
+    __slots__ = ('_intervals', '_max_fins')
+
+    def __init__(self, intervals=()):
+        self._intervals = sorted(intervals)
+        self._max_fins = []
+        self._recompute_from(0)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def __iter__(self):
+        return iter(self._intervals)
+
+    def _recompute_from(self, index):
+        del self._max_fins[index:]
+        current = self._max_fins[-1] if self._max_fins else None
+        for interval in self._intervals[index:]:
+            current = interval.fin if current is None or interval.fin > current else current
+            self._max_fins.append(current)
+
+    def overlapping(self, debut, fin, exclude_id=None):
+        """Congés qui recouvrent au moins un jour de [debut, fin], par date de début."""
+        debut, fin = as_date(debut), as_date(fin)
+        hi = bisect_right(self._intervals, (fin, date.max))
+        lo = bisect_left(self._max_fins, debut, 0, hi)
+        return [i for i in self._intervals[lo:hi] if i.fin >= debut and i.conge_id != exclude_id]
+
+    def add(self, interval):
+        index = bisect_left(self._intervals, interval)
+        self._intervals.insert(index, interval)
+        self._recompute_from(index)
+
+    def remove(self, conge_id):
+        for index, interval in enumerate(self._intervals):
+            if interval.conge_id == conge_id:
+                del self._intervals[index]
+                self._recompute_from(index)
+                return True
+        return False
+
+
+class LeaveIntervalIndex:
+    """
+    Index des congés actifs par agent, partagé par l'application via le CongeManager.
+
+    L'index d'un agent est chargé en une requête à sa première utilisation (ou pour plusieurs agents
+    à la fois avec 'load_agents', avant un import), puis tenu à jour par le manager à chaque ajout,
+    modification ou suppression de congé. Seuls les 'max_agents' agents les plus récemment utilisés
+    sont conservés.
+    """
+    def __init__(self, db_manager, max_agents=512):
+        self.db = db_manager
+        self.max_agents = max_agents
+        self._agents = OrderedDict()
+        self._lock = threading.RLock()
+
+    def for_agent(self, agent_id):
+        with self._lock:
+            if agent_id in self._agents:
+                self._agents.move_to_end(agent_id)
+                return self._agents[agent_id]
+        return self.load_agents([agent_id])[agent_id]
+
+    def load_agents(self, agent_ids):
+        """Charge en une requête les agents absents de l'index ; retourne {agent_id: AgentIntervals}."""
+        with self._lock:
+            known = {agent_id: self._agents[agent_id] for agent_id in agent_ids if agent_id in self._agents}
+        missing = [agent_id for agent_id in dict.fromkeys(agent_ids) if agent_id not in known]
+        if missing:
+            by_agent = {agent_id: [] for agent_id in missing}
+            for conge_id, agent_id, type_conge, debut, fin in self.db.get_active_leave_intervals(missing):
+                by_agent[agent_id].append(LeaveInterval(as_date(debut), as_date(fin), conge_id, type_conge))
+            loaded = {agent_id: AgentIntervals(intervals) for agent_id, intervals in by_agent.items()}
+            known.update(loaded)
+            with self._lock:
+                self._agents.update(loaded)
+                # Un import peut charger plus d'agents que la capacité : ils restent utilisables par l'appelant.
+                while len(self._agents) > max(self.max_agents, len(loaded)):
+                    self._agents.popitem(last=False)
+        return known
+
+    def overlapping(self, agent_id, debut, fin, exclude_id=None):
+        intervals = self.for_agent(agent_id)
+        with self._lock:
+            return intervals.overlapping(debut, fin, exclude_id)
+
+    def add(self, conge):
+        """Ajoute un congé actif (modèle Conge avec son id) à l'index de son agent, s'il est chargé."""
+        with self._lock:
+            intervals = self._agents.get(conge.agent_id)
+            if intervals is not None:
+                intervals.add(LeaveInterval.from_conge(conge))
+
+    def remove(self, agent_id, conge_id):
+        with self._lock:
+            intervals = self._agents.get(agent_id)
+            if intervals is not None:
+                intervals.remove(conge_id)
+
+    def invalidate(self, agent_id):
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._agents.clear()
@@ -0,0 +1,87 @@
+# Fichier : core/conges/ledger.py
+# Registre en mémoire des soldes actifs, le temps d'une opération sur les congés.
+
+from core.constants import SoldeStatus, TypeMouvement
+
+
+class SoldeLedger:
+    """
+    Soldes actifs des agents touchés par une opération (soumission, remplacement, suppression de congé).
+
+    Les soldes d'un agent sont chargés une seule fois, à sa première utilisation ; les débits (FIFO : du
+    solde le plus ancien au plus récent) et les crédits (LIFO : du plus récent au plus ancien) sont
+    appliqués en mémoire, puis 'flush' écrit les seules valeurs modifiées en un executemany, et les
+    mouvements correspondants (un par solde touché, avec le congé concerné) dans le journal, en un
+    second executemany. Le nombre de requêtes ne dépend donc plus du nombre de congés remplacés ni
+    de segments créés.
+    """
+    def __init__(self, db_manager, solde_max_annee):
+        self.db = db_manager
+        self.solde_max_annee = solde_max_annee
+        # agent_id -> [[solde_id, annee, solde], ...] triés par année croissante
+        self._soldes = {}
+        self._initial = {}
+        # Lignes du journal en attente : (agent_id, solde_id, annee, type, delta, solde_apres, statut, conge_id)
+        self._mouvements = []
+
+    def _soldes_agent(self, agent_id):
+        soldes = self._soldes.get(agent_id)
+        if soldes is None:
+            soldes = self._soldes[agent_id] = [list(row) for row in self.db.get_soldes_actifs(agent_id)]
+            for solde_id, _, valeur in soldes:
+                self._initial[solde_id] = valeur
+        return soldes
+
+    def total(self, agent_id):
+        return sum(s[2] for s in self._soldes_agent(agent_id))
+
+    def debiter(self, agent_id, jours_a_prendre, conge_id=None):
+        """Décompte les jours des soldes actifs, du plus ancien au plus récent (FIFO)."""
+        if jours_a_prendre <= 0: return
+        solde_total = self.total(agent_id)
+        if solde_total < jours_a_prendre:
+            raise ValueError(f"Solde total insuffisant ({solde_total}j) pour décompter {jours_a_prendre}j.")
+        jours_restants = jours_a_prendre
+        for solde in self._soldes_agent(agent_id):
+            if jours_restants == 0: break
+            jours_pris = min(solde[2], jours_restants)
+            if jours_pris > 0: self._appliquer(agent_id, solde, -jours_pris, TypeMouvement.DEBIT, conge_id)
+            jours_restants -= jours_pris
+
+    def crediter(self, agent_id, jours_a_rendre, conge_id=None):
+        """
+        Restitue les jours sur les soldes actifs, du plus récent au plus ancien (LIFO) : c'est l'opération
+        inverse exacte du débit. Un solde ne remonte pas au-delà du solde annuel maximal ; le reliquat
+        éventuel (solde apuré entre-temps) est crédité sur le solde le plus récent.
+        """
+        if jours_a_rendre <= 0: return
+        soldes = self._soldes_agent(agent_id)
+        jours_restants = jours_a_rendre
+        for solde in reversed(soldes):
+            if jours_restants == 0: break
+            jours_a_ajouter = min(jours_restants, self.solde_max_annee - solde[2])
+            if jours_a_ajouter > 0:
+                self._appliquer(agent_id, solde, jours_a_ajouter, TypeMouvement.CREDIT, conge_id)
+                jours_restants -= jours_a_ajouter
+        if jours_restants > 0 and soldes:
+            self._appliquer(agent_id, soldes[-1], jours_restants, TypeMouvement.CREDIT, conge_id)
+
+    def _appliquer(self, agent_id, solde, delta, type_mouvement, conge_id):
+        solde[2] += delta
+        self._mouvements.append((agent_id, solde[0], solde[1], type_mouvement, delta, solde[2], SoldeStatus.ACTIF, conge_id))
+
+    def changes(self):
+        """Couples (solde_id, nouvelle_valeur) des soldes modifiés depuis le chargement ou le dernier flush."""
+        return [(solde_id, valeur) for soldes in self._soldes.values() for solde_id, _, valeur in soldes
+                if valeur != self._initial[solde_id]]
+
+    def flush(self):
+        """Écrit les soldes modifiés et leurs mouvements (dans la transaction de l'appelant)."""
+        changes = self.changes()
+        if changes:
+            agent_ids = [agent_id for agent_id, soldes in self._soldes.items() if any(s[2] != self._initial[s[0]] for s in soldes)]
+            self.db.bulk_update_soldes(changes, agent_ids=agent_ids)
+            for solde_id, valeur in changes:
+                self._initial[solde_id] = valeur
+        self.db.journaliser_mouvements(self._mouvements)
+        self._mouvements = []
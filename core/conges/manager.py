@@ -8,37 +8,91 @@ import shutil
 from datetime import datetime, timedelta
 from tkinter import messagebox
 
-from utils.date_utils import get_holidays_set_for_period, jours_ouvres, validate_date
+from utils.date_utils import jours_ouvres, validate_date
 from utils.config_loader import CONFIG
 from db.models import Agent, Conge
+from db.backup import BackupEngine, BackupError
+from db.backup_store import BackupStore
 from core.constants import SoldeStatus
+from core.conges.holiday_calendar import HolidayCalendar
+from core.conges.ledger import SoldeLedger
+from core.conges.audit import AnnualLeaveAuditor
+from core.conges.intervals import AgentIntervals, LeaveInterval, LeaveIntervalIndex
+from core.conges.coverage import CoverageEngine
 
 class CongeManager:
     def __init__(self, db_manager, certificats_dir):
         self.db = db_manager
         self.certificats_dir = certificats_dir
+        self.holiday_calendar = HolidayCalendar(db_manager)
+        self.leave_intervals = LeaveIntervalIndex(db_manager)
+        self.coverage = CoverageEngine(db_manager)
+        self.backups = BackupEngine(db_manager)
+        backups_config = CONFIG.get('backups') or {}
+        self.backup_store = BackupStore(
+            self.backups, os.path.join(os.path.dirname(db_manager.get_db_path()), backups_config.get('store_dir', os.path.join("backups", "instantanes"))),
+            chunk_pages=int(backups_config.get('chunk_pages', 16)), compression=backups_config.get('compression', 'zlib'),
+            retention=backups_config.get('retention'))
 
     def get_annee_exercice(self):
         return self.db.get_annee_exercice()
 
+    def creer_sauvegarde(self, label=None, progress=None):
+        """Instantané à chaud de la base (bloquant : à lancer dans un thread de travail) ; retourne son manifeste."""
+        return self.backup_store.create_snapshot(label=label, progress=progress)
+
+    def sauvegarde_quotidienne(self):
+        """Crée l'instantané du jour s'il n'existe pas encore (appelé au démarrage, dans un thread de travail)."""
+        today = datetime.now().strftime('%Y-%m-%d')
+        try:
+            if not any(m['cree_le'].startswith(today) for m in self.backup_store.list_snapshots() if not m.get('etiquette')):
+                self.backup_store.create_snapshot()
+        except (BackupError, OSError) as e:
+            logging.error(f"Échec de la sauvegarde quotidienne : {e}", exc_info=True)
+
+    def lister_sauvegardes(self): return self.backup_store.list_snapshots()
+    def supprimer_sauvegarde(self, snapshot_id): self.backup_store.delete_snapshot(snapshot_id)
+
+    def restaurer_sauvegarde(self, snapshot_id, progress=None):
+        """Restaure à chaud un instantané (bloquant : à lancer dans un thread de travail)."""
+        assembled_path = os.path.join(self.backup_store.root, f"{snapshot_id}.restauration")
+        self.backup_store.assemble(snapshot_id, assembled_path, progress=progress)
+        try:
+            self.restaurer_fichier(assembled_path, progress=progress)
+        finally:
+            os.remove(assembled_path)
+
+    def restaurer_fichier(self, backup_path, progress=None):
+        """
+        Restaure à chaud une copie complète de la base : le contenu est rechargé dans la base ouverte,
+        mis à niveau par les migrations, et les caches sont vidés. Il reste à rafraîchir les fenêtres.
+        """
+        self.backups.restore_live(backup_path, progress=progress)
+        self.db.run_migrations(notify=False)
+        self.invalidate_caches()
+
+    def invalidate_caches(self):
+        """Vide les caches qui dépendent du contenu de la base (jours fériés, congés par agent, couverture, comptages d'agents)."""
+        self.holiday_calendar.clear()
+        self.leave_intervals.clear()
+        self.coverage.invalidate()
+        self.db.clear_caches()
+
+    def get_query_instrumentation(self):
+        """Mesure des requêtes SQL (db.instrumentation.QueryInstrumentation), ou None si désactivée."""
+        return self.db.instrumentation
+
     def effectuer_glissement_annuel(self):
-        self.db.conn.execute('BEGIN TRANSACTION')
+        """Clôture l'exercice courant ; retourne un résumé des soldes créés et expirés."""
         try:
             annee_actuelle = self.get_annee_exercice()
             nouvelle_annee = annee_actuelle + 1
             annee_a_expirer = annee_actuelle - 2
             solde_initial = float(CONFIG['conges'].get('solde_annuel_par_defaut', 22.0))
-            all_agents = self.get_all_agents()
-            for agent in all_agents:
-                self.db.execute_query("INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, ?, ?, ?)",
-                                      (agent.id, nouvelle_annee, solde_initial, SoldeStatus.ACTIF))
-                self.db.execute_query("UPDATE soldes_annuels SET statut = ? WHERE agent_id = ? AND annee = ?",
-                                      (SoldeStatus.EXPIRE, agent.id, annee_a_expirer))
-            self.db.set_annee_exercice(nouvelle_annee)
-            self.db.conn.commit()
-            return True
+            resume = self.db.glissement_annuel(nouvelle_annee, annee_a_expirer, solde_initial)
+            resume.update({'annee_cloturee': annee_actuelle, 'nouvelle_annee': nouvelle_annee, 'annee_expiree': annee_a_expirer})
+            return resume
         except sqlite3.Error as e:
-            self.db.conn.rollback()
             logging.error(f"Échec du glissement annuel : {e}", exc_info=True)
             raise e
 
@@ -54,113 +108,111 @@ class CongeManager:
             raise e
     
     def update_soldes_manuellement(self, updated_soldes_data):
-        self.db.conn.execute('BEGIN TRANSACTION')
         try:
-            for solde_id, new_value in updated_soldes_data.items():
-                self.db.update_solde_by_id(solde_id, new_value)
-            self.db.conn.commit()
+            self.db.corriger_soldes(updated_soldes_data.items())
             return True
         except sqlite3.Error as e:
-            self.db.conn.rollback()
             logging.error(f"Échec de la mise à jour manuelle des soldes : {e}", exc_info=True)
             raise e
 
+    def point_controle_periodique(self):
+        """
+        Photographie les soldes si le dernier point de contrôle date de plus de 'points_controle_jours'
+        (appelé au démarrage) : la reconstitution d'un solde passé ne relit ainsi qu'une courte queue.
+        """
+        intervalle = int(CONFIG['conges'].get('points_controle_jours', 30))
+        dernier = self.db.get_date_dernier_point_controle()
+        if dernier and datetime.strptime(dernier, '%Y-%m-%d %H:%M:%S') > datetime.now() - timedelta(days=intervalle):
+            return 0
+        try:
+            return self.db.creer_point_controle()
+        except sqlite3.Error as e:
+            logging.error(f"Échec du point de contrôle des soldes : {e}", exc_info=True)
+            return 0
+
+    def get_mouvements_solde(self, agent_id, limit=None): return self.db.get_mouvements_solde(agent_id, limit=limit)
+    def get_soldes_a_date(self, agent_id, date_sql): return self.db.get_soldes_a_date(agent_id, date_sql)
+
     def get_all_agents(self, **kwargs): return self.db.get_agents(**kwargs)
     def get_agents_count(self, term=None): return self.db.get_agents_count(term=term)
+    def get_agents_page(self, term=None, after=None, limit=20): return self.db.get_agents_page(term=term, after=after, limit=limit)
+    def get_agents_with_resume(self, order_by="nom"): return self.db.get_agents_with_resume(order_by=order_by)
+    def get_solde_resume(self, agent_id): return self.db.get_solde_resume(agent_id)
     def get_agent_by_id(self, agent_id): return self.db.get_agent_by_id(agent_id)
+    def get_agent_refs(self, term=None, limit=None, exclude_id=None): return self.db.get_agent_refs(term=term, limit=limit, exclude_id=exclude_id)
+    def get_agent_ref(self, agent_id): return self.db.get_agent_ref(agent_id)
     def get_all_conges(self): return self.db.get_conges()
     def get_conges_for_agent(self, agent_id): return self.db.get_conges(agent_id=agent_id)
     def get_conge_by_id(self, conge_id): return self.db.get_conge_by_id(conge_id)
     def get_certificat_for_conge(self, conge_id): return self.db.get_certificat_for_conge(conge_id)
     def get_holidays_for_year(self, year): return self.db.get_holidays_for_year(year)
+    def get_all_holidays_for_year(self, year): return self.holiday_calendar.get_holidays_for_year(year)
     def get_sick_leaves_by_status(self, status, search_term=None): return self.db.get_sick_leaves_by_status(status, search_term)
-    def get_holidays_set_for_period(self, start_year, end_year): return get_holidays_set_for_period(self.db, start_year, end_year)
+    def get_holidays_set_for_period(self, start_year, end_year): return self.holiday_calendar.get_holidays_set_for_period(start_year, end_year)
     def get_agents_on_leave_today(self): return self.db.get_agents_on_leave_today()
-    def add_holiday(self, date_sql, name, h_type): return self.db.add_holiday(date_sql, name, h_type)
-    def delete_holiday(self, date_sql): return self.db.delete_holiday(date_sql)
-    def add_or_update_holiday(self, date_sql, name, h_type): return self.db.add_or_update_holiday(date_sql, name, h_type)
-
-    def _debiter_solde(self, agent_id, jours_a_prendre):
-        if jours_a_prendre <= 0: return
-        agent = self.get_agent_by_id(agent_id)
-        if agent.get_solde_total_actif() < jours_a_prendre:
-            raise ValueError(f"Solde total insuffisant ({agent.get_solde_total_actif()}j) pour décompter {jours_a_prendre}j.")
-        
-        # Logique FIFO : on trie du plus ancien au plus récent
-        soldes_actifs = sorted([s for s in agent.soldes_annuels if s.statut == SoldeStatus.ACTIF], key=lambda s: s.annee)
-        
-        jours_restants_a_debiter = jours_a_prendre
-        for solde_annuel in soldes_actifs:
-            if jours_restants_a_debiter == 0: break
-            jours_pris_sur_ce_solde = min(solde_annuel.solde, jours_restants_a_debiter)
-            nouveau_solde = solde_annuel.solde - jours_pris_sur_ce_solde
-            self.db.update_solde_by_id(solde_annuel.id, nouveau_solde)
-            jours_restants_a_debiter -= jours_pris_sur_ce_solde
-            
-        if jours_restants_a_debiter > 0:
-            raise sqlite3.Error("Incohérence de solde détectée lors du débit.")
 
-    def _crediter_solde(self, agent_id, jours_a_rendre):
-        """
-        Crédite les jours sur les soldes actifs de l'agent avec une logique LIFO.
-        C'est l'opération inverse exacte du débit.
-        """
-        if jours_a_rendre <= 0: return
-        agent = self.get_agent_by_id(agent_id)
-        
-        # Logique LIFO : on trie du plus récent au plus ancien
-        soldes_actifs = sorted([s for s in agent.soldes_annuels if s.statut == SoldeStatus.ACTIF], key=lambda s: s.annee, reverse=True)
-        
-        jours_restants_a_rendre = jours_a_rendre
-        for solde_annuel in soldes_actifs:
-            if jours_restants_a_rendre == 0: break
-            
-            # On ne peut pas restituer plus que ce que le solde de cette année contient au maximum
-            # (par exemple, 22 jours par défaut). C'est une sécurité.
-            solde_max_annee = float(CONFIG['conges'].get('solde_annuel_par_defaut', 22.0))
-            jours_pouvant_etre_rendus = solde_max_annee - solde_annuel.solde
-            
-            jours_a_ajouter = min(jours_restants_a_rendre, jours_pouvant_etre_rendus)
-            
-            if jours_a_ajouter > 0:
-                nouveau_solde = solde_annuel.solde + jours_a_ajouter
-                self.db.update_solde_by_id(solde_annuel.id, nouveau_solde)
-                jours_restants_a_rendre -= jours_a_ajouter
-
-        # S'il reste des jours, c'est probablement car un solde a été apuré entre-temps.
-        # On les crédite sur le solde le plus récent.
-        if jours_restants_a_rendre > 0 and soldes_actifs:
-            solde_le_plus_recent = soldes_actifs[0]
-            solde_final = solde_le_plus_recent.solde + jours_restants_a_rendre
-            self.db.update_solde_by_id(solde_le_plus_recent.id, solde_final)
+    def add_holiday(self, date_sql, name, h_type):
+        added = self.db.add_holiday(date_sql, name, h_type)
+        if added: self.holiday_calendar.invalidate_date(date_sql)
+        return added
+
+    def delete_holiday(self, date_sql):
+        deleted = self.db.delete_holiday(date_sql)
+        self.holiday_calendar.invalidate_date(date_sql)
+        return deleted
+
+    def add_or_update_holiday(self, date_sql, name, h_type):
+        updated = self.db.add_or_update_holiday(date_sql, name, h_type)
+        self.holiday_calendar.invalidate_date(date_sql)
+        return updated
+
+    def _solde_ledger(self):
+        """Registre des soldes pour une opération : chargés une fois par agent, écrits en une requête par 'flush'."""
+        return SoldeLedger(self.db, float(CONFIG['conges'].get('solde_annuel_par_defaut', 22.0)))
 
     def save_agent(self, agent_data, is_modification=False):
         if is_modification:
-            return self.db.modifier_agent(agent_data['id'], agent_data['nom'], agent_data['prenom'], agent_data['ppr'], agent_data['grade'])
+            modified = self.db.modifier_agent(agent_data['id'], agent_data['nom'], agent_data['prenom'], agent_data['ppr'], agent_data['grade'])
+            # Le grade de l'agent peut avoir changé : la couverture par grade est à recalculer.
+            self.coverage.invalidate()
+            return modified
         else:
             try:
                 agent_id = self.db.ajouter_agent(agent_data['nom'], agent_data['prenom'], agent_data['ppr'], agent_data['grade'])
                 if not agent_id:
                     raise sqlite3.IntegrityError("Le PPR est probablement déjà utilisé.")
                 
-                soldes_initiaux = agent_data.get('soldes', {})
-                if not soldes_initiaux:
-                    annee_exercice = self.get_annee_exercice()
-                    solde_defaut = float(CONFIG['conges'].get('solde_annuel_par_defaut', 22.0))
-                    if solde_defaut > 0:
-                         soldes_initiaux[annee_exercice] = solde_defaut
-                
-                for annee, solde_val in soldes_initiaux.items():
-                    if solde_val > 0:
-                        self.db.execute_query("INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, ?, ?, ?)", 
-                                              (agent_id, annee, solde_val, SoldeStatus.ACTIF))
+                self.db.bulk_upsert_soldes(self.soldes_initiaux_rows(agent_id, agent_data.get('soldes')))
                 return agent_id
             except sqlite3.Error as e:
                 logging.error(f"Échec de la sauvegarde de l'agent (transaction externe) : {e}")
                 raise e
 
+    def soldes_initiaux_rows(self, agent_id, soldes=None, annee_exercice=None):
+        """Lignes (agent_id, annee, solde, statut) des soldes d'un nouvel agent ; solde par défaut si aucun n'est fourni."""
+        soldes_initiaux = dict(soldes or {})
+        if not soldes_initiaux:
+            annee_exercice = annee_exercice if annee_exercice is not None else self.get_annee_exercice()
+            solde_defaut = float(CONFIG['conges'].get('solde_annuel_par_defaut', 22.0))
+            if solde_defaut > 0:
+                soldes_initiaux[annee_exercice] = solde_defaut
+        return [(agent_id, annee, solde_val, SoldeStatus.ACTIF) for annee, solde_val in soldes_initiaux.items() if solde_val > 0]
+
     def delete_agent(self, agent_id):
-        return self.db.supprimer_agent(agent_id)
+        deleted = self.db.supprimer_agent(agent_id)
+        self.leave_intervals.invalidate(agent_id)
+        self.coverage.invalidate()
+        return deleted
+
+    def find_conflicting_leaves(self, agent_id, start_date, end_date, exclude_id=None):
+        """Congés actifs (LeaveInterval) de l'agent qui recouvrent [start_date, end_date], lus dans l'index en mémoire."""
+        return self.leave_intervals.overlapping(agent_id, start_date, end_date, exclude_id)
+
+    def calculer_couverture(self, start_date, end_date):
+        """Absents par jour et par grade sur la période (CoverageReport), avec les seuils de 'conges.couverture'."""
+        couverture_config = CONFIG['conges'].get('couverture') or {}
+        return self.coverage.compute(start_date, end_date, seuils=couverture_config.get('seuils_par_grade') or {},
+                                     seuil_defaut=couverture_config.get('seuil'), grades=(CONFIG.get('ui') or {}).get('grades', ()))
 
     def handle_conge_submission(self, form_data, is_modification):
         try:
@@ -182,95 +234,147 @@ class CongeManager:
                 else:
                     return False
 
-            self.db.conn.execute('BEGIN TRANSACTION')
             agent_id = form_data['agent_id']; jours_pris = form_data['jours_pris']; type_conge = form_data['type_conge']
-            
-            if is_modification:
-                old_conge = self.get_conge_by_id(form_data['conge_id'])
-                if old_conge and old_conge.type_conge in CONFIG['conges']['types_decompte_solde']:
-                    self._crediter_solde(old_conge.agent_id, old_conge.jours_pris)
-                self.db.supprimer_conge(form_data['conge_id'])
-
-            if type_conge in CONFIG['conges']['types_decompte_solde']:
-                self._debiter_solde(agent_id, jours_pris)
+            with self.db.transaction():
+                ledger = self._solde_ledger()
+                if is_modification:
+                    old_conge = self.get_conge_by_id(form_data['conge_id'])
+                    if old_conge and old_conge.type_conge in CONFIG['conges']['types_decompte_solde']:
+                        ledger.crediter(old_conge.agent_id, old_conge.jours_pris, conge_id=old_conge.id)
+                    self.db.supprimer_conge(form_data['conge_id'])
 
-            conge_model = Conge(id=None, agent_id=agent_id, type_conge=type_conge, justif=form_data.get('justif'), interim_id=form_data.get('interim_id'), date_debut=start_date.strftime('%Y-%m-%d'), date_fin=end_date.strftime('%Y-%m-%d'), jours_pris=jours_pris)
-            new_conge_id = self.db.ajouter_conge(conge_model)
-            self.db.conn.commit()
+                # Le congé est inséré avant le débit pour que le journal des mouvements le référence.
+                conge_model = Conge(id=None, agent_id=agent_id, type_conge=type_conge, justif=form_data.get('justif'), interim_id=form_data.get('interim_id'), date_debut=start_date.strftime('%Y-%m-%d'), date_fin=end_date.strftime('%Y-%m-%d'), jours_pris=jours_pris)
+                new_conge_id = self.db.ajouter_conge(conge_model)
+                if type_conge in CONFIG['conges']['types_decompte_solde']:
+                    ledger.debiter(agent_id, jours_pris, conge_id=new_conge_id)
+                ledger.flush()
 
+            if is_modification: self.leave_intervals.remove(agent_id, form_data['conge_id'])
+            self.coverage.invalidate()
+            conge_model.id = new_conge_id
+            self.leave_intervals.add(conge_model)
             if new_conge_id and type_conge == "Congé de maladie": self._handle_certificat_save(form_data, new_conge_id)
             return True
 
         except (ValueError, sqlite3.Error) as e:
-            if self.db.conn.in_transaction: self.db.conn.rollback()
             raise e
         except Exception as e:
-            if self.db.conn.in_transaction: self.db.conn.rollback()
             logging.error(f"Erreur inattendue soumission congé: {e}", exc_info=True)
             raise e
 
     def _split_or_replace_leaves(self, annual_overlaps, form_data):
-        self.db.conn.execute('BEGIN TRANSACTION')
-        try:
+        """
+        Remplace les congés annuels chevauchés par le nouveau congé, en recréant les parties qui
+        débordent avant et après. Le nombre de requêtes est constant : soldes chargés une fois,
+        suppressions et insertions groupées, soldes écrits en une fois.
+        """
+        with self.db.transaction():
             new_start = validate_date(form_data['date_debut'])
             new_end = validate_date(form_data['date_fin'])
             agent_id = form_data['agent_id']
             holidays_set = self.get_holidays_set_for_period(new_start.year - 1, new_end.year + 2)
+            ledger = self._solde_ledger()
 
             for conge in annual_overlaps:
-                self._crediter_solde(agent_id, conge.jours_pris)
-                self.db.supprimer_conge(conge.id)
+                ledger.crediter(agent_id, conge.jours_pris, conge_id=conge.id)
+            self.db.supprimer_conges([conge.id for conge in annual_overlaps])
             
             type_conge = form_data['type_conge']
             new_conge_model = Conge(id=None, agent_id=agent_id, type_conge=type_conge, justif=form_data.get('justif'), interim_id=form_data.get('interim_id'), date_debut=new_start.strftime('%Y-%m-%d'), date_fin=new_end.strftime('%Y-%m-%d'), jours_pris=form_data['jours_pris'])
-            
-            if type_conge in CONFIG['conges']['types_decompte_solde']:
-                self._debiter_solde(agent_id, new_conge_model.jours_pris)
-            new_conge_id = self.db.ajouter_conge(new_conge_model)
+            nouveaux_conges = [new_conge_model]
 
             min_start_date = min(c.date_debut for c in annual_overlaps)
             max_end_date = max(c.date_fin for c in annual_overlaps)
 
             if min_start_date < new_start:
-                self._create_leave_segment(agent_id, min_start_date, new_start - timedelta(days=1), holidays_set)
+                nouveaux_conges.append(self._leave_segment(agent_id, min_start_date, new_start - timedelta(days=1), holidays_set))
             if max_end_date > new_end:
-                self._create_leave_segment(agent_id, new_end + timedelta(days=1), max_end_date, holidays_set)
+                nouveaux_conges.append(self._leave_segment(agent_id, new_end + timedelta(days=1), max_end_date, holidays_set))
+            nouveaux_conges = [c for c in nouveaux_conges if c is not None]
 
-            self.db.conn.commit()
-            if new_conge_id and type_conge == "Congé de maladie": self._handle_certificat_save(form_data, new_conge_id)
-            return True
-        except (ValueError, sqlite3.Error) as e:
-            self.db.conn.rollback(); raise e
+            # Insertion avant débit : chaque mouvement du journal référence le congé qui l'a provoqué.
+            conge_ids = self.db.bulk_insert_conges(nouveaux_conges)
+            for conge, conge_id in zip(nouveaux_conges, conge_ids):
+                if conge.type_conge in CONFIG['conges']['types_decompte_solde']:
+                    ledger.debiter(agent_id, conge.jours_pris, conge_id=conge_id)
+            ledger.flush()
+            new_conge_id = conge_ids[0]
 
-    def _create_leave_segment(self, agent_id, start_date, end_date, holidays_set):
-        if start_date > end_date: return
+        self.coverage.invalidate()
+        for conge in annual_overlaps:
+            self.leave_intervals.remove(agent_id, conge.id)
+        for conge, conge_id in zip(nouveaux_conges, conge_ids):
+            conge.id = conge_id
+            self.leave_intervals.add(conge)
+
+        if new_conge_id and type_conge == "Congé de maladie": self._handle_certificat_save(form_data, new_conge_id)
+        return True
+
+    def importer_conges(self, conges_models):
+        """
+        Importe des congés actifs (modèles Conge) en une transaction et retourne leur nombre. Les
+        chevauchements, avec les congés existants comme entre congés importés, sont contrôlés sur l'index
+        en mémoire (chargé en une requête pour tous les agents concernés) : aucune requête par ligne.
+        """
+        conges_models = list(conges_models)
+        existants = self.leave_intervals.load_agents([c.agent_id for c in conges_models])
+        importes, errors = {}, []
+        for i, conge in enumerate(conges_models, start=1):
+            deja_importes = importes.setdefault(conge.agent_id, AgentIntervals())
+            conflits = existants[conge.agent_id].overlapping(conge.date_debut, conge.date_fin) + deja_importes.overlapping(conge.date_debut, conge.date_fin)
+            if conflits:
+                errors.append(f"Congé {i} ({conge.type_conge} du {conge.date_debut:%d/%m/%Y} au {conge.date_fin:%d/%m/%Y}) : chevauche un {conflits[0].type_conge} du {conflits[0].debut:%d/%m/%Y} au {conflits[0].fin:%d/%m/%Y}")
+            else:
+                deja_importes.add(LeaveInterval.from_conge(conge))
+        if errors:
+            raise ValueError("Importation annulée en raison de chevauchements :\n" + "\n".join(errors[:10]))
+
+        with self.db.transaction():
+            conge_ids = self.db.bulk_insert_conges(conges_models)
+            ledger = self._solde_ledger()
+            for conge, conge_id in zip(conges_models, conge_ids):
+                if conge.type_conge in CONFIG['conges']['types_decompte_solde']:
+                    ledger.debiter(conge.agent_id, conge.jours_pris, conge_id=conge_id)
+            ledger.flush()
+        self.coverage.invalidate()
+        for conge, conge_id in zip(conges_models, conge_ids):
+            conge.id = conge_id
+            self.leave_intervals.add(conge)
+        return len(conge_ids)
+
+    def _leave_segment(self, agent_id, start_date, end_date, holidays_set):
+        """Segment de congé annuel recréé autour d'un remplacement, ou None s'il est vide."""
+        if start_date > end_date: return None
         jours = jours_ouvres(start_date, end_date, holidays_set)
-        if jours > 0:
-            self._debiter_solde(agent_id, jours)
-            segment = Conge(None, agent_id, 'Congé annuel', None, None, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), jours)
-            self.db.ajouter_conge(segment)
+        if jours <= 0: return None
+        return Conge(None, agent_id, 'Congé annuel', None, None, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), jours)
 
     def delete_conge(self, conge_id):
         conge = self.get_conge_by_id(conge_id)
         if not conge: 
             raise ValueError("Congé introuvable.")
         
-        self.db.conn.execute('BEGIN TRANSACTION')
-        try:
+        with self.db.transaction():
             if conge.type_conge in CONFIG['conges']['types_decompte_solde']:
-                self._crediter_solde(conge.agent_id, conge.jours_pris)
-            
+                ledger = self._solde_ledger()
+                ledger.crediter(conge.agent_id, conge.jours_pris, conge_id=conge.id)
+                ledger.flush()
             self.db.supprimer_conge(conge_id)
-            self.db.conn.commit()
-            return True
-        except (ValueError, sqlite3.Error) as e:
-            self.db.conn.rollback()
-            raise e
+        self.leave_intervals.remove(conge.agent_id, conge_id)
+        self.coverage.invalidate()
+        return True
             
     def _handle_certificat_save(self, form_data, conge_id):
         # Placeholder
         pass
 
-    def find_inconsistent_annual_leaves(self, year):
-        # Placeholder
-        pass
\ No newline at end of file
+    def find_inconsistent_annual_leaves(self, year, progress=None):
+        """
+        Audite les congés annuels actifs de 'year' contre le calendrier actuel des jours fériés, ainsi que
+        les chevauchements, les soldes négatifs et les écarts au journal des mouvements. Bloquant (plusieurs
+        processus en lecture seule) : à lancer dans un thread de travail. Retourne un AuditReport.
+        """
+        holidays_set = self.get_holidays_set_for_period(year - 1, year + 1)
+        auditor = AnnualLeaveAuditor(self.db.get_db_path(), max_workers=CONFIG['conges'].get('audit_workers'))
+        return auditor.run(year, holidays_set, progress=progress)
\ No newline at end of file
@@ -2,12 +2,26 @@
 # Version finale : gère le calcul des durées et la configuration de l'UI.
 
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from functools import lru_cache
 import os
 
-from utils.date_utils import jours_ouvres
+try:
+    import numpy as np
+except ImportError: # NumPy est optionnel : les calculs par lots se replient sur Python pur.
+    np = None
+
+from utils.date_utils import as_date, get_business_day_index
 from utils.config_loader import CONFIG
 
+def _as_datetime64(values):
+    # NumPy convertit directement les date, datetime (tronqués au jour) et datetime64.
+    return np.asarray(values, dtype='datetime64[D]')
+
+@lru_cache(maxsize=16)
+def _busdaycalendar_for(frozen_holidays):
+    return np.busdaycalendar(holidays=np.array(sorted(as_date(d) for d in frozen_holidays), dtype='datetime64[D]'))
+
 class CongeStrategy(ABC):
     """Interface de base pour toutes les stratégies de congés."""
     def __init__(self):
@@ -55,24 +69,48 @@ class CongeStrategy(ABC):
     def calculate_days(self, start_date, end_date, holidays_set):
         pass
 
+    def calculate_days_batch(self, start_dates, end_dates, holidays_set):
+        """
+        Version par lots de calculate_days pour les recalculs en masse.
+        Accepte des listes de dates ou des tableaux numpy.datetime64 ; retourne une liste d'entiers.
+        """
+        return [self.calculate_days(as_date(s), as_date(e), holidays_set) for s, e in zip(start_dates, end_dates)]
+
+    def calculate_end_dates_batch(self, start_dates, days_list, holidays_set):
+        """Version par lots de calculate_end_date ; retourne une liste d'objets date."""
+        return [self.calculate_end_date(as_date(s), int(n), holidays_set) for s, n in zip(start_dates, days_list)]
+
 # --- Implémentations concrètes ---
 
 class CongeAnnuelStrategy(CongeStrategy):
     """Stratégie pour les congés annuels, calculés en jours ouvrés."""
     def calculate_end_date(self, start_date, days_to_add, holidays_set):
-        # La seule différence est la suppression des .date() inutiles
-        if days_to_add <= 0: return start_date 
-        temp_date = start_date
-        days_counted = 0
-        while days_counted < days_to_add:
-            if temp_date.weekday() < 5 and temp_date not in holidays_set:
-                days_counted += 1
-            if days_counted < days_to_add:
-                temp_date += timedelta(days=1)
-        return temp_date
+        if days_to_add <= 0: return start_date
+        end_date = get_business_day_index(holidays_set).add_working_days(start_date, days_to_add)
+        # On conserve le type reçu (date ou datetime) pour les appelants existants.
+        return datetime.combine(end_date, start_date.time()) if isinstance(start_date, datetime) else end_date
 
     def calculate_days(self, start_date, end_date, holidays_set):
-        return jours_ouvres(start_date, end_date, holidays_set)
+        return get_business_day_index(holidays_set).count(start_date, end_date)
+
+    def calculate_days_batch(self, start_dates, end_dates, holidays_set):
+        if np is None:
+            return super().calculate_days_batch(start_dates, end_dates, holidays_set)
+        starts, ends = _as_datetime64(start_dates), _as_datetime64(end_dates)
+        if not len(starts): return []
+        valid = ends >= starts
+        # busday_count exclut la date de fin : on la décale d'un jour pour la compter.
+        counts = np.busday_count(starts, np.where(valid, ends, starts) + 1, busdaycal=_busdaycalendar_for(frozenset(holidays_set)))
+        return np.where(valid, counts, 0).tolist()
+
+    def calculate_end_dates_batch(self, start_dates, days_list, holidays_set):
+        if np is None:
+            return super().calculate_end_dates_batch(start_dates, days_list, holidays_set)
+        starts, days = _as_datetime64(start_dates), np.asarray(days_list, dtype='int64')
+        if not len(starts): return []
+        # Comme calculate_end_date : on se cale sur le premier jour ouvré puis on avance de N-1 jours ouvrés.
+        ends = np.busday_offset(starts, np.maximum(days - 1, 0), roll='forward', busdaycal=_busdaycalendar_for(frozenset(holidays_set)))
+        return np.where(days > 0, ends, starts).tolist()
 
 class CongeCalendaireStrategy(CongeStrategy):
     """Stratégie pour les congés calculés en jours calendaires."""
@@ -81,7 +119,14 @@ class CongeCalendaireStrategy(CongeStrategy):
         return start_date + timedelta(days=days_to_add - 1)
 
     def calculate_days(self, start_date, end_date, holidays_set):
-        return (end_date - start_date).days + 1
+        return max((end_date - start_date).days + 1, 0)
+
+    def calculate_days_batch(self, start_dates, end_dates, holidays_set):
+        if np is None:
+            return super().calculate_days_batch(start_dates, end_dates, holidays_set)
+        starts, ends = _as_datetime64(start_dates), _as_datetime64(end_dates)
+        if not len(starts): return []
+        return np.maximum((ends - starts).astype('int64') + 1, 0).tolist()
 
 class CongeMaladieStrategy(CongeCalendaireStrategy):
     """Stratégie pour le congé maladie, avec certificat requis."""
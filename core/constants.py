@@ -18,6 +18,19 @@ class SoldeStatus(str, Enum):
         """Assure que la représentation en chaîne est la valeur elle-même."""
         return self.value
 
+class TypeMouvement(str, Enum):
+    """Nature d'une ligne du journal des mouvements de solde (table 'mouvements_solde')."""
+    INITIAL = 'Initial'
+    DEBIT = 'Débit'
+    CREDIT = 'Crédit'
+    GLISSEMENT = 'Glissement'
+    EXPIRATION = 'Expiration'
+    APUREMENT = 'Apurement'
+    CORRECTION = 'Correction'
+
+    def __str__(self):
+        return self.value
+
 # On pourra ajouter d'autres constantes ici à l'avenir, par exemple :
 # class CongeStatus(str, Enum):
 #     ACTIF = 'Actif'
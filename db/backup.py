@@ -0,0 +1,118 @@
+# Fichier : db/backup.py
+# Sauvegardes à chaud de la base via l'API de sauvegarde de SQLite (sqlite3.Connection.backup).
+
+import os
+import sqlite3
+import logging
+from datetime import datetime
+from pathlib import Path
+
+
+class BackupError(Exception):
+    """Échec d'une sauvegarde ou d'une restauration (copie invalide, fichier illisible...)."""
+
+
+def connect_read_only(db_path):
+    """Connexion en lecture seule ; l'URI est construite par pathlib ('#', '?', '%', lecteurs Windows)."""
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class BackupEngine:
+    """
+    Copie la base page par page (PAGES_PER_STEP pages à la fois, avec une courte pause entre deux
+    étapes) depuis une connexion du pool : l'application reste utilisable pendant la copie, et une
+    écriture concurrente fait simplement reprendre la copie. Le résultat est écrit sous un nom
+    temporaire, vérifié par 'PRAGMA integrity_check', puis renommé atomiquement.
+
+    Les méthodes sont bloquantes : l'interface les exécute dans un thread de travail, et reçoit
+    l'avancement via le callback 'progress(pages_copiees, pages_totales)'.
+    """
+    PAGES_PER_STEP = 256
+    STEP_SLEEP_S = 0.005
+
+    def __init__(self, db_manager, backups_dir=None):
+        self.db = db_manager
+        self.backups_dir = backups_dir or os.path.join(os.path.dirname(db_manager.get_db_path()), "backups")
+
+    def create_backup(self, label=None, progress=None):
+        """Sauvegarde la base dans le dossier des sauvegardes ; retourne le chemin du fichier créé."""
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        db_filename = os.path.basename(self.db.get_db_path())
+        filename = f"backup_{timestamp}_{label}_{db_filename}" if label else f"backup_{timestamp}_{db_filename}"
+        return self.backup_to(os.path.join(self.backups_dir, filename), progress)
+
+    def backup_to(self, dest_path, progress=None):
+        """Copie la base vers 'dest_path' (nom temporaire, vérification, puis renommage atomique)."""
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        tmp_path = dest_path + ".tmp"
+        self._remove(tmp_path)
+        try:
+            with self.db.thread_connection() as src:
+                self.copy(src, tmp_path, progress)
+            self.verify(tmp_path)
+            os.replace(tmp_path, dest_path)
+        except (sqlite3.Error, OSError) as e:
+            self._remove(tmp_path)
+            logging.error(f"Échec de la sauvegarde vers {dest_path} : {e}", exc_info=True)
+            raise BackupError(f"La sauvegarde a échoué : {e}") from e
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        logging.info(f"Sauvegarde créée : {dest_path}")
+        return dest_path
+
+    def restore_live(self, backup_path, progress=None):
+        """
+        Recopie une sauvegarde vérifiée dans la base ouverte, via l'API de sauvegarde en sens inverse
+        (fichier de sauvegarde -> connexion du pool). La copie est une seule transaction d'écriture :
+        en cas d'échec, la base reste intacte ; en cas de succès, toutes les connexions du pool voient
+        immédiatement le contenu restauré, sans fermeture ni redémarrage.
+        """
+        self.verify(backup_path)
+        src = connect_read_only(backup_path)
+        try:
+            with self.db.thread_connection() as dest:
+                src.backup(dest, pages=self.PAGES_PER_STEP, progress=self._progress_callback(progress))
+        except sqlite3.Error as e:
+            logging.error(f"Échec de la restauration depuis {backup_path} : {e}", exc_info=True)
+            raise BackupError(f"La restauration a échoué : {e}") from e
+        finally:
+            src.close()
+        logging.info(f"Base restaurée depuis : {backup_path}")
+
+    def copy(self, src_conn, dest_path, progress=None):
+        """Copie page par page la base ouverte sur 'src_conn' dans le fichier 'dest_path'."""
+        dest = sqlite3.connect(dest_path)
+        try:
+            src_conn.backup(dest, pages=self.PAGES_PER_STEP, sleep=self.STEP_SLEEP_S,
+                            progress=self._progress_callback(progress))
+            # Une sauvegarde est un fichier autonome : pas de journal WAL à côté.
+            dest.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dest.close()
+
+    @staticmethod
+    def verify(path):
+        """Vérifie l'intégrité d'un fichier de base ; lève BackupError s'il est invalide."""
+        try:
+            conn = connect_read_only(path)
+            try:
+                result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            raise BackupError(f"Fichier de sauvegarde illisible ({os.path.basename(path)}) : {e}") from e
+        if result != ["ok"]:
+            raise BackupError(f"Contrôle d'intégrité échoué pour {os.path.basename(path)} : {'; '.join(result[:5])}")
+
+    @staticmethod
+    def _progress_callback(progress):
+        if progress is None: return None
+        return lambda status, remaining, total: progress(total - remaining, total)
+
+    @staticmethod
+    def _remove(path):
+        try: os.remove(path)
+        except FileNotFoundError: pass
@@ -0,0 +1,236 @@
+# Fichier : db/backup_store.py
+# Magasin de sauvegardes incrémentales : blocs de pages dédupliqués et compressés, un manifeste par instantané.
+
+import os
+import json
+import lzma
+import zlib
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from db.backup import BackupError, connect_read_only
+
+_CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def _remove(path):
+    try: os.remove(path)
+    except FileNotFoundError: pass
+
+
+class BackupStore:
+    """
+    Instantanés de la base découpés en blocs de 'chunk_pages' pages. Chaque bloc est rangé sous
+    l'empreinte SHA-256 de son contenu (blocs/ab/abcdef....zlib) : un bloc identique d'un instantané à
+    l'autre n'est écrit qu'une fois, si bien qu'une sauvegarde quotidienne où peu de choses ont changé
+    n'écrit que les blocs modifiés. Chaque instantané est décrit par un manifeste JSON (manifestes/<id>.json)
+    qui liste ses blocs dans l'ordre.
+
+    La rétention garde, parmi les instantanés sans étiquette, le plus récent de chacun des 'daily' derniers
+    jours, 'weekly' dernières semaines et 'monthly' derniers mois ; les instantanés étiquetés (ex. avant
+    une clôture d'exercice) ne sont supprimés qu'à la main. Les blocs qui ne sont plus référencés sont
+    ensuite effacés.
+    """
+    DEFAULT_RETENTION = {'daily': 7, 'weekly': 4, 'monthly': 12}
+
+    def __init__(self, backup_engine, root, chunk_pages=16, compression='zlib', retention=None):
+        if compression not in _CODECS:
+            raise ValueError(f"Compression inconnue : '{compression}' (valeurs possibles : {', '.join(_CODECS)})")
+        self.engine = backup_engine
+        self.root = root
+        self.chunks_dir = os.path.join(root, "blocs")
+        self.manifests_dir = os.path.join(root, "manifestes")
+        self.chunk_pages = chunk_pages
+        self.compression = compression
+        self.retention = {**self.DEFAULT_RETENTION, **(retention or {})}
+        self._lock = threading.Lock()
+
+    # --- Création ---
+    def create_snapshot(self, label=None, progress=None):
+        """
+        Prend un instantané cohérent de la base (via le BackupEngine), le découpe en blocs et écrit son
+        manifeste, puis applique la rétention. Bloquant : à lancer dans un thread de travail.
+        Retourne le manifeste (dict) de l'instantané créé.
+        """
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        now = datetime.now()
+        snapshot_id = self._new_snapshot_id(now, label)
+        copy_path = os.path.join(self.root, f"{snapshot_id}.copie")
+        try:
+            self.engine.backup_to(copy_path, progress)
+            with self._lock:
+                manifest = self._store_file(copy_path, snapshot_id, now, label)
+                self._write_json(self._manifest_path(snapshot_id), manifest)
+        finally:
+            _remove(copy_path)
+        logging.info(f"Instantané {snapshot_id} créé : {manifest['blocs_nouveaux']}/{len(manifest['blocs'])} blocs nouveaux "
+                     f"({manifest['octets_ecrits']} octets écrits)")
+        self.apply_retention()
+        return manifest
+
+    def _store_file(self, path, snapshot_id, now, label):
+        page_size = self._page_size(path)
+        chunk_size = page_size * self.chunk_pages
+        compress = _CODECS[self.compression][0]
+        chunks, new_chunks, written = [], 0, 0
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data: break
+                file_hash.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                chunks.append(digest)
+                chunk_path = self._chunk_path(digest)
+                if os.path.exists(chunk_path): continue
+                os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                payload = compress(data)
+                with open(chunk_path + ".tmp", "wb") as out: out.write(payload)
+                os.replace(chunk_path + ".tmp", chunk_path)
+                new_chunks += 1
+                written += len(payload)
+        return {
+            'id': snapshot_id, 'cree_le': now.strftime('%Y-%m-%d %H:%M:%S'), 'etiquette': label,
+            'base': os.path.basename(self.engine.db.get_db_path()), 'taille': os.path.getsize(path),
+            'taille_page': page_size, 'taille_bloc': chunk_size, 'compression': self.compression,
+            'sha256': file_hash.hexdigest(), 'blocs': chunks, 'blocs_nouveaux': new_chunks, 'octets_ecrits': written,
+        }
+
+    # --- Consultation et restauration ---
+    def list_snapshots(self):
+        """Manifestes de tous les instantanés, du plus récent au plus ancien (les manifestes illisibles sont ignorés)."""
+        manifests, unreadable = self._read_manifests()
+        for filename, error in unreadable:
+            logging.warning(f"Manifeste illisible ignoré ({filename}) : {error}")
+        manifests.sort(key=lambda m: (m['cree_le'], m['id']), reverse=True)
+        return manifests
+
+    def _read_manifests(self):
+        """(manifestes lus, [(fichier, erreur)] des manifestes illisibles ou incomplets)."""
+        if not os.path.isdir(self.manifests_dir): return [], []
+        manifests, unreadable = [], []
+        for filename in os.listdir(self.manifests_dir):
+            if not filename.endswith(".json"): continue
+            try:
+                with open(os.path.join(self.manifests_dir, filename), encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if not isinstance(manifest.get('blocs'), list) or manifest.get('compression') not in _CODECS:
+                    raise ValueError("liste de blocs ou compression manquante")
+                manifests.append(manifest)
+            except (OSError, ValueError, AttributeError) as e:
+                unreadable.append((filename, e))
+        return manifests, unreadable
+
+    def get_manifest(self, snapshot_id):
+        try:
+            with open(self._manifest_path(snapshot_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise BackupError(f"Instantané introuvable ou illisible : {snapshot_id}") from e
+
+    def assemble(self, snapshot_id, dest_path, progress=None):
+        """Reconstitue le fichier de base d'un instantané dans 'dest_path', contrôlé par son empreinte et par integrity_check."""
+        manifest = self.get_manifest(snapshot_id)
+        decompress = _CODECS[manifest['compression']][1]
+        file_hash = hashlib.sha256()
+        total = len(manifest['blocs'])
+        try:
+            with open(dest_path, "wb") as out:
+                for i, digest in enumerate(manifest['blocs'], 1):
+                    with open(self._chunk_path(digest, manifest['compression']), "rb") as f:
+                        data = decompress(f.read())
+                    file_hash.update(data)
+                    out.write(data)
+                    if progress: progress(i, total)
+            if file_hash.hexdigest() != manifest['sha256']:
+                raise BackupError(f"L'instantané {snapshot_id} est corrompu (empreinte différente du manifeste).")
+            self.engine.verify(dest_path)
+        except (OSError, zlib.error, lzma.LZMAError) as e:
+            _remove(dest_path)
+            raise BackupError(f"Impossible de reconstituer l'instantané {snapshot_id} : {e}") from e
+        except BackupError:
+            _remove(dest_path)
+            raise
+        return dest_path
+
+    # --- Suppression et rétention ---
+    def delete_snapshot(self, snapshot_id):
+        with self._lock:
+            _remove(self._manifest_path(snapshot_id))
+            self._collect_garbage()
+
+    def apply_retention(self):
+        """Supprime les instantanés sans étiquette hors politique de rétention ; retourne les identifiants supprimés."""
+        snapshots = [m for m in self.list_snapshots() if not m.get('etiquette')]
+        keep = {snapshots[0]['id']} if snapshots else set()
+        periods = {
+            'daily': lambda d: d.date(),
+            'weekly': lambda d: d.isocalendar()[:2],
+            'monthly': lambda d: (d.year, d.month),
+        }
+        for policy, period_of in periods.items():
+            seen = set()
+            for manifest in snapshots:
+                period = period_of(datetime.strptime(manifest['cree_le'], '%Y-%m-%d %H:%M:%S'))
+                if period in seen: continue
+                if len(seen) >= self.retention[policy]: break
+                seen.add(period)
+                keep.add(manifest['id'])
+        removed = [m['id'] for m in snapshots if m['id'] not in keep]
+        with self._lock:
+            for snapshot_id in removed:
+                _remove(self._manifest_path(snapshot_id))
+            self._collect_garbage()
+        if removed:
+            logging.info(f"Rétention des sauvegardes : {len(removed)} instantané(s) supprimé(s) ({', '.join(removed)})")
+        return removed
+
+    def _collect_garbage(self):
+        """Efface les blocs qui ne sont plus référencés par aucun manifeste (appelé sous verrou)."""
+        manifests, unreadable = self._read_manifests()
+        if unreadable:
+            # Les blocs d'un manifeste illisible sont inconnus : on n'efface rien plutôt que de perdre l'instantané.
+            logging.error(f"Nettoyage des blocs annulé : manifeste(s) illisible(s) {', '.join(f for f, _ in unreadable)}. "
+                          f"Réparez ou supprimez ces fichiers dans {self.manifests_dir}.")
+            return False
+        referenced = {self._chunk_path(d, m['compression']) for m in manifests for d in m['blocs']}
+        if not os.path.isdir(self.chunks_dir): return True
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            for filename in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, filename)
+                if path not in referenced: _remove(path)
+        return True
+
+    # --- Utilitaires ---
+    def _new_snapshot_id(self, now, label):
+        base = now.strftime("%Y-%m-%d_%H-%M-%S") + (f"_{label}" if label else "")
+        snapshot_id, n = base, 1
+        while os.path.exists(self._manifest_path(snapshot_id)):
+            n += 1
+            snapshot_id = f"{base}_{n}"
+        return snapshot_id
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.manifests_dir, f"{snapshot_id}.json")
+
+    def _chunk_path(self, digest, compression=None):
+        return os.path.join(self.chunks_dir, digest[:2], f"{digest}.{compression or self.compression}")
+
+    @staticmethod
+    def _page_size(path):
+        conn = connect_read_only(path)
+        try: return conn.execute("PRAGMA page_size").fetchone()[0]
+        finally: conn.close()
+
+    @staticmethod
+    def _write_json(path, data):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
@@ -4,45 +4,207 @@
 import sqlite3
 from tkinter import messagebox
 import logging
+import json
 import os
 import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
-from db.models import Agent, Conge, SoldeAnnuel
-from core.constants import SoldeStatus
+from db.instrumentation import InstrumentedConnection
+from db.models import Agent, AgentRef, Conge, SoldeAnnuel, SoldeResume
+from core.constants import SoldeStatus, TypeMouvement
 
 class DatabaseManager:
+    # Nombre maximal de connexions inactives gardées en réserve pour les tâches d'arrière-plan.
+    POOL_MAX_IDLE = 4
+    BUSY_TIMEOUT_MS = 5000
+    # Au-delà, le résumé des soldes est recalculé pour tous les agents plutôt qu'agent par agent.
+    SUMMARY_REFRESH_MAX_IDS = 500
+
     def __init__(self, db_file):
         self.db_file = db_file
-        self.conn = None
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._idle_connections = []
+        self._thread_connections = {}
+        self._connected = False
+        # Nombre d'agents par terme de recherche, invalidé à chaque écriture sur la table 'agents'.
+        self._agents_count_cache = {}
+        # Mesure des requêtes (db.instrumentation.QueryInstrumentation), désactivée par défaut.
+        self._instrumentation = None
+
+    @property
+    def instrumentation(self):
+        return self._instrumentation
+
+    @instrumentation.setter
+    def instrumentation(self, instrumentation):
+        """Active (ou coupe, avec None) la mesure des requêtes sur toutes les connexions du pool."""
+        with self._pool_lock:
+            self._instrumentation = instrumentation
+            for conn in self._idle_connections + list(self._thread_connections.values()):
+                conn.instrumentation = instrumentation
+
+    @property
+    def conn(self):
+        """
+        Connexion propre au thread courant. Le premier accès depuis un thread l'emprunte au pool
+        (ou en ouvre une) ; elle reste attachée au thread jusqu'à sa libération ou sa fin.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None and self._connected:
+            conn = self._acquire_connection()
+        return conn
 
     def connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES)
-            self.conn.execute("PRAGMA foreign_keys = ON")
+            self._connected = True
+            self._acquire_connection()
             return True
         except sqlite3.Error as e:
+            self._connected = False
             messagebox.showerror("Erreur Base de Données", f"Impossible de se connecter : {e}")
             return False
 
     def close(self):
-        if self.conn: self.conn.close()
+        with self._pool_lock:
+            connections = self._idle_connections + list(self._thread_connections.values())
+            self._idle_connections, self._thread_connections = [], {}
+            self._connected = False
+            self._local = threading.local()
+        for conn in connections:
+            try: conn.close()
+            except sqlite3.Error: pass
+
+    @contextmanager
+    def thread_connection(self):
+        """Emprunte une connexion du pool pour la durée d'une tâche et la rend ensuite."""
+        borrowed = getattr(self._local, 'conn', None) is None
+        try:
+            yield self.conn
+        finally:
+            if borrowed: self.release_connection()
+
+    def release_connection(self):
+        """Rend au pool la connexion du thread courant."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None: return
+        self._local.conn = None
+        with self._pool_lock:
+            self._thread_connections.pop(threading.current_thread(), None)
+            self._return_to_pool(conn)
+
+    def _open_connection(self):
+        # Les PRAGMAs sont appliqués une seule fois, à l'ouverture de chaque connexion du pool.
+        # InstrumentedConnection : toutes les requêtes de la connexion sont mesurées quand la mesure est active.
+        conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, factory=InstrumentedConnection)
+        conn.instrumentation = self._instrumentation
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _acquire_connection(self):
+        with self._pool_lock:
+            self._reap_finished_threads()
+            conn = self._idle_connections.pop() if self._idle_connections else None
+        if conn is not None and not self._is_healthy(conn):
+            conn = None
+        if conn is None:
+            conn = self._open_connection()
+        with self._pool_lock:
+            self._thread_connections[threading.current_thread()] = conn
+        self._local.conn = conn
+        return conn
+
+    def _reap_finished_threads(self):
+        """Récupère les connexions des threads terminés sans les avoir rendues (appelé sous verrou)."""
+        for thread in [t for t in self._thread_connections if not t.is_alive()]:
+            self._return_to_pool(self._thread_connections.pop(thread))
+
+    def _return_to_pool(self, conn):
+        """Remet une connexion en réserve, ou la ferme si la réserve est pleine (appelé sous verrou)."""
+        try:
+            if conn.in_transaction: conn.rollback()
+            if len(self._idle_connections) < self.POOL_MAX_IDLE:
+                self._idle_connections.append(conn)
+                return
+        except sqlite3.Error:
+            pass
+        try: conn.close()
+        except sqlite3.Error: pass
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            try: conn.close()
+            except sqlite3.Error: pass
+            return False
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unité de travail : toutes les écritures du bloc sont validées par un seul COMMIT final
+        (ou toutes annulées en cas d'exception). Les blocs imbriqués deviennent des SAVEPOINT :
+        une exception n'annule alors que le bloc interne, l'appelant décide de la suite.
+        """
+        conn = self.conn
+        if not conn: raise sqlite3.Error("Pas de connexion à la base de données.")
+        depth = getattr(self._local, 'tx_depth', 0)
+        savepoint = f"sp_niveau_{depth}"
+        conn.execute("BEGIN" if depth == 0 else f"SAVEPOINT {savepoint}")
+        self._local.tx_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.tx_depth = depth
+            if depth == 0:
+                conn.rollback()
+                self._end_of_transaction()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._local.tx_depth = depth
+        if depth == 0:
+            conn.commit()
+            self._end_of_transaction()
+        else:
+            conn.execute(f"RELEASE {savepoint}")
 
-    def execute_query(self, query, params=(), fetch=None):
+    def _end_of_transaction(self):
+        # Un autre thread a pu remettre en cache un comptage antérieur aux écritures de la transaction.
+        if getattr(self._local, 'agents_dirty', False):
+            self._local.agents_dirty = False
+            self._invalidate_agents_count()
+
+    def in_transaction(self):
+        """Indique si le thread courant est à l'intérieur d'un bloc transaction()."""
+        return getattr(self._local, 'tx_depth', 0) > 0
+
+    def execute_query(self, query, params=(), fetch=None, row_factory=None):
         if not self.conn: raise sqlite3.Error("Pas de connexion à la base de données.")
+        # Hors d'un bloc transaction(), chaque écriture est validée immédiatement.
+        autocommit = not self.in_transaction()
         try:
             cursor = self.conn.cursor()
+            # 'row_factory' (ex. Conge.row_factory) construit les modèles directement pendant le fetch.
+            if row_factory is not None: cursor.row_factory = row_factory
             cursor.execute(query, params)
             if fetch == "one": return cursor.fetchone()
             if fetch == "all": return cursor.fetchall()
-            self.conn.commit()
+            if autocommit: self.conn.commit()
             return cursor.lastrowid
         except sqlite3.Error as e:
-            self.conn.rollback()
+            if autocommit: self.conn.rollback()
             logging.error(f"Erreur SQL: {query} avec params {params} -> {e}", exc_info=True)
             raise e
 
-    def _handle_data_migration_from_legacy(self):
+    def _handle_data_migration_from_legacy(self, notify=True):
         cursor = self.conn.cursor()
         try:
             cursor.execute("PRAGMA table_info(agents)")
@@ -50,36 +212,39 @@ class DatabaseManager:
             if 'solde' in columns or '_solde_legacy' in columns:
                 legacy_col_name = 'solde' if 'solde' in columns else '_solde_legacy'
                 logging.info(f"Ancienne colonne '{legacy_col_name}' détectée. Lancement de la migration des données...")
-                self.conn.execute('BEGIN TRANSACTION')
-                
-                cursor.execute(f"SELECT id, {legacy_col_name} FROM agents WHERE {legacy_col_name} IS NOT NULL AND {legacy_col_name} > 0")
-                legacy_data = cursor.fetchall()
-
-                annee_actuelle = self.get_annee_exercice()
-                for agent_id, solde_val in legacy_data:
-                    cursor.execute("INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, ?, ?, ?)",
-                                   (agent_id, annee_actuelle, solde_val, str(SoldeStatus.ACTIF)))
-
-                cursor.execute("CREATE TABLE agents_new (id INTEGER PRIMARY KEY, nom TEXT NOT NULL, prenom TEXT, ppr TEXT UNIQUE NOT NULL, grade TEXT NOT NULL)")
-                cursor.execute("INSERT INTO agents_new (id, nom, prenom, ppr, grade) SELECT id, nom, prenom, ppr, grade FROM agents")
-                cursor.execute("DROP TABLE agents")
-                cursor.execute("ALTER TABLE agents_new RENAME TO agents")
-                
-                cursor.execute("REPLACE INTO db_version (version) VALUES (2)")
-                self.conn.commit()
+                with self.transaction():
+                    cursor.execute(f"SELECT id, {legacy_col_name} FROM agents WHERE {legacy_col_name} IS NOT NULL AND {legacy_col_name} > 0")
+                    legacy_data = cursor.fetchall()
+
+                    annee_actuelle = self.get_annee_exercice()
+                    for agent_id, solde_val in legacy_data:
+                        cursor.execute("INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, ?, ?, ?)",
+                                       (agent_id, annee_actuelle, solde_val, str(SoldeStatus.ACTIF)))
+
+                    cursor.execute("CREATE TABLE agents_new (id INTEGER PRIMARY KEY, nom TEXT NOT NULL, prenom TEXT, ppr TEXT UNIQUE NOT NULL, grade TEXT NOT NULL)")
+                    cursor.execute("INSERT INTO agents_new (id, nom, prenom, ppr, grade) SELECT id, nom, prenom, ppr, grade FROM agents")
+                    cursor.execute("DROP TABLE agents")
+                    cursor.execute("ALTER TABLE agents_new RENAME TO agents")
+
+                    cursor.execute("REPLACE INTO db_version (version) VALUES (2)")
                 logging.info("Migration des données de solde terminée avec succès.")
-                messagebox.showinfo("Mise à jour", "Les données de l'application ont été mises à jour vers la nouvelle version.")
+                if notify: messagebox.showinfo("Mise à jour", "Les données de l'application ont été mises à jour vers la nouvelle version.")
         except sqlite3.Error as e:
-            self.conn.rollback()
             logging.error(f"Échec de la migration des données : {e}", exc_info=True)
             raise e
 
-    def run_migrations(self):
+    def run_migrations(self, notify=True):
+        """Applique les migrations en attente ; 'notify=False' pour un appel hors du thread Tk (pas de boîte de dialogue)."""
         self.execute_query("CREATE TABLE IF NOT EXISTS db_version (version INTEGER PRIMARY KEY)")
         self.execute_query("CREATE TABLE IF NOT EXISTS system_config (config_key TEXT PRIMARY KEY NOT NULL, config_value TEXT NOT NULL)")
 
-        current_version_row = self.execute_query("SELECT version FROM db_version", fetch="one")
-        current_version = current_version_row[0] if current_version_row else 0
+        current_version_row = self.execute_query("SELECT MAX(version) FROM db_version", fetch="one")
+        current_version = current_version_row[0] if current_version_row and current_version_row[0] else 0
+        # La version 2 correspond à la migration Python des anciens soldes : elle doit passer
+        # avant les scripts suivants, qui peuvent s'appuyer sur la nouvelle table 'agents'.
+        legacy_migration_pending = current_version < 2
+        # Traitements Python à exécuter juste après le script SQL d'une version donnée.
+        post_migration_hooks = {7: self._log_soldes_doublons}
         
         migrations_path = os.path.join(os.path.dirname(__file__), 'migrations')
         if os.path.exists(migrations_path):
@@ -94,14 +259,25 @@ class DatabaseManager:
             if migrations:
                 logging.info(f"Migrations SQL à appliquer : {sorted(migrations.keys())}")
                 for version in sorted(migrations.keys()):
+                    if legacy_migration_pending and version > 2:
+                        self._handle_data_migration_from_legacy(notify)
+                        legacy_migration_pending = False
                     script_path = migrations[version]
                     with open(script_path, 'r', encoding='utf-8') as f: script = f.read()
                     self.conn.cursor().executescript(script)
                     self.execute_query("REPLACE INTO db_version (version) VALUES (?)", (version,))
-                messagebox.showinfo("Mise à jour", "La structure de la base de données a été mise à jour.")
+                    if version in post_migration_hooks: post_migration_hooks[version]()
+                if notify: messagebox.showinfo("Mise à jour", "La structure de la base de données a été mise à jour.")
         
-        if current_version < 2:
-            self._handle_data_migration_from_legacy()
+        if legacy_migration_pending:
+            self._handle_data_migration_from_legacy(notify)
+
+    def _log_soldes_doublons(self):
+        """Signale les soldes en double retirés par la migration 7 (conservés dans 'soldes_annuels_doublons')."""
+        doublons = self.execute_query("SELECT id, agent_id, annee, solde, solde_conserve_id FROM soldes_annuels_doublons ORDER BY agent_id, annee, id", fetch="all")
+        for solde_id, agent_id, annee, solde, conserve_id in doublons:
+            logging.warning(f"Solde en double retiré (à vérifier) : id {solde_id}, agent {agent_id}, année {annee}, solde {solde} ; "
+                            f"solde conservé : id {conserve_id}. Ligne archivée dans 'soldes_annuels_doublons'.")
 
     def get_annee_exercice(self):
         result = self.execute_query("SELECT config_value FROM system_config WHERE config_key = 'annee_exercice'", fetch="one")
@@ -114,6 +290,36 @@ class DatabaseManager:
     def set_annee_exercice(self, annee):
         self.execute_query("REPLACE INTO system_config (config_key, config_value) VALUES ('annee_exercice', ?)", (str(annee),))
 
+    def glissement_annuel(self, nouvelle_annee, annee_a_expirer, solde_initial):
+        """
+        Ouvre l'année 'nouvelle_annee' pour tous les agents et fait expirer 'annee_a_expirer', en deux
+        requêtes ensemblistes. Idempotent grâce à l'unicité (agent_id, annee) : une seconde exécution
+        ne crée ni n'expire rien. Retourne le nombre de soldes créés et expirés.
+        """
+        now = self._horodatage()
+        with self.transaction() as conn:
+            with self.resume_soldes_differe(agent_ids=()):
+                dernier_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM soldes_annuels").fetchone()[0]
+                # 'WHERE true' lève l'ambiguïté entre ON CONFLICT et une jointure dans INSERT ... SELECT.
+                crees = conn.execute("""INSERT INTO soldes_annuels (agent_id, annee, solde, statut)
+                                        SELECT id, ?, ?, ? FROM agents WHERE true
+                                        ON CONFLICT(agent_id, annee) DO NOTHING""",
+                                     (nouvelle_annee, solde_initial, SoldeStatus.ACTIF)).rowcount
+                # Les soldes créés sont ceux d'id supérieur au plus grand id existant avant l'INSERT.
+                conn.execute("""INSERT INTO mouvements_solde (agent_id, solde_id, annee, type, delta, solde_apres, statut, conge_id, date_mouvement)
+                                SELECT agent_id, id, annee, ?, solde, solde, statut, NULL, ? FROM soldes_annuels WHERE id > ? AND annee = ?""",
+                             (TypeMouvement.GLISSEMENT, now, dernier_id, nouvelle_annee))
+                conn.execute("""INSERT INTO mouvements_solde (agent_id, solde_id, annee, type, delta, solde_apres, statut, conge_id, date_mouvement)
+                                SELECT agent_id, id, annee, ?, 0, solde, ?, NULL, ? FROM soldes_annuels WHERE annee = ? AND statut != ?""",
+                             (TypeMouvement.EXPIRATION, SoldeStatus.EXPIRE, now, annee_a_expirer, SoldeStatus.EXPIRE))
+                expires = conn.execute("UPDATE soldes_annuels SET statut = ? WHERE annee = ? AND statut != ?",
+                                       (SoldeStatus.EXPIRE, annee_a_expirer, SoldeStatus.EXPIRE)).rowcount
+            # Le changement d'année d'exercice recalcule tout le résumé des soldes (trigger).
+            self.set_annee_exercice(nouvelle_annee)
+            # Nouvel exercice : point de contrôle de tous les soldes.
+            self.creer_point_controle(now)
+        return {'soldes_crees': crees, 'soldes_expires': expires}
+
     def get_soldes_by_status(self, statut):
         query = "SELECT s.id, a.nom, a.prenom, s.annee, s.solde FROM soldes_annuels s JOIN agents a ON s.agent_id = a.id WHERE s.statut = ? AND s.solde > 0 ORDER BY a.nom, s.annee"
         return self.execute_query(query, (str(statut),), fetch="all")
@@ -121,87 +327,388 @@ class DatabaseManager:
     def apurer_soldes_by_ids(self, solde_ids):
         if not solde_ids: return
         placeholders = ','.join('?' for _ in solde_ids)
-        query = f"UPDATE soldes_annuels SET solde = 0 WHERE id IN ({placeholders})"
-        self.execute_query(query, solde_ids)
+        with self.transaction() as conn:
+            conn.execute(f"""INSERT INTO mouvements_solde (agent_id, solde_id, annee, type, delta, solde_apres, statut, conge_id, date_mouvement)
+                             SELECT agent_id, id, annee, ?, -solde, 0, statut, NULL, ? FROM soldes_annuels WHERE id IN ({placeholders}) AND solde != 0""",
+                         (TypeMouvement.APUREMENT, self._horodatage(), *solde_ids))
+            conn.execute(f"UPDATE soldes_annuels SET solde = 0 WHERE id IN ({placeholders})", tuple(solde_ids))
     
-    def update_solde_by_id(self, solde_id, new_value):
-        self.execute_query("UPDATE soldes_annuels SET solde = ? WHERE id = ?", (new_value, solde_id))
+    def get_soldes_actifs(self, agent_id):
+        """Soldes actifs d'un agent : lignes (id, annee, solde) par année croissante."""
+        return self.execute_query("SELECT id, annee, solde FROM soldes_annuels WHERE agent_id = ? AND statut = ? ORDER BY annee", (agent_id, str(SoldeStatus.ACTIF)), fetch="all")
+
+    def update_solde_by_id(self, solde_id, new_value): self.corriger_soldes([(solde_id, new_value)])
+
+    def corriger_soldes(self, soldes_values):
+        """Correction manuelle de soldes : couples (solde_id, nouvelle_valeur), journalisés comme corrections."""
+        soldes_values = [(int(solde_id), float(value)) for solde_id, value in soldes_values]
+        if not soldes_values: return
+        placeholders = ','.join('?' for _ in soldes_values)
+        with self.transaction() as conn:
+            anciens = {row[0]: row[1:] for row in conn.execute(f"SELECT id, agent_id, annee, solde, statut FROM soldes_annuels WHERE id IN ({placeholders})", [sid for sid, _ in soldes_values])}
+            mouvements = [(anciens[sid][0], sid, anciens[sid][1], TypeMouvement.CORRECTION, value - anciens[sid][2], value, anciens[sid][3], None)
+                          for sid, value in soldes_values if sid in anciens and value != anciens[sid][2]]
+            self.bulk_update_soldes(soldes_values, agent_ids={m[0] for m in mouvements})
+            self.journaliser_mouvements(mouvements)
+
+    # --- Journal des mouvements de solde ---
+
+    @staticmethod
+    def _horodatage():
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def journaliser_mouvements(self, mouvements):
+        """
+        Ajoute au journal des lignes (agent_id, solde_id, annee, type, delta, solde_apres, statut, conge_id),
+        horodatées maintenant. À appeler dans la transaction qui modifie les soldes.
+        """
+        if not mouvements: return
+        now = self._horodatage()
+        with self.transaction() as conn:
+            conn.executemany("""INSERT INTO mouvements_solde (agent_id, solde_id, annee, type, delta, solde_apres, statut, conge_id, date_mouvement)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", [(*m, now) for m in mouvements])
+
+    def creer_point_controle(self, date_point=None):
+        """Photographie les soldes de tous les agents (une requête) ; retourne le nombre de lignes écrites."""
+        with self.transaction() as conn:
+            return conn.execute("""INSERT OR IGNORE INTO points_controle_solde (agent_id, date_point, mouvement_id, annee, solde, statut)
+                                   SELECT agent_id, ?, (SELECT COALESCE(MAX(id), 0) FROM mouvements_solde), annee, solde, statut FROM soldes_annuels""",
+                                (date_point or self._horodatage(),)).rowcount
+
+    def get_date_dernier_point_controle(self):
+        row = self.execute_query("SELECT MAX(date_point) FROM points_controle_solde", fetch="one")
+        return row[0] if row else None
+
+    def get_mouvements_solde(self, agent_id, limit=None):
+        """Mouvements d'un agent, du plus récent au plus ancien : (id, date, annee, type, delta, solde_apres, statut, conge_id)."""
+        query = "SELECT id, date_mouvement, annee, type, delta, solde_apres, statut, conge_id FROM mouvements_solde WHERE agent_id = ? ORDER BY id DESC"
+        params = (agent_id,)
+        if limit is not None: query += " LIMIT ?"; params += (limit,)
+        return self.execute_query(query, params, fetch="all")
+
+    def get_soldes_a_date(self, agent_id, date_sql):
+        """
+        Soldes d'un agent à la fin du jour 'date_sql' (YYYY-MM-DD), par année : dernier point de contrôle
+        antérieur, puis valeur après le dernier mouvement de chaque année dans la queue qui le suit.
+        """
+        fin_du_jour = f"{date_sql} 23:59:59"
+        point = self.execute_query("SELECT date_point, mouvement_id FROM points_controle_solde WHERE agent_id = ? AND date_point <= ? ORDER BY date_point DESC LIMIT 1",
+                                   (agent_id, fin_du_jour), fetch="one")
+        soldes = {}
+        if point:
+            for annee, solde, statut in self.execute_query("SELECT annee, solde, statut FROM points_controle_solde WHERE agent_id = ? AND date_point = ?", (agent_id, point[0]), fetch="all"):
+                soldes[annee] = (solde, statut)
+        queue = self.execute_query("SELECT annee, solde_apres, statut FROM mouvements_solde WHERE agent_id = ? AND id > ? AND date_mouvement <= ? ORDER BY id",
+                                   (agent_id, point[1] if point else 0, fin_du_jour), fetch="all")
+        for annee, solde, statut in queue:
+            soldes[annee] = (solde, statut)
+        return [SoldeAnnuel(None, agent_id, annee, solde, statut) for annee, (solde, statut) in sorted(soldes.items())]
+
+    # --- Écritures en masse (executemany) ---
+    # Chaque méthode s'exécute dans une transaction (ou un SAVEPOINT si l'appelant en a ouvert une)
+    # et retourne les id concernés, dans l'ordre des lignes fournies.
 
-    def get_agents(self, term=None, limit=None, offset=None, exclude_id=None):
+    def bulk_insert_agents(self, agents_rows, update_existing=False):
+        """
+        Insère des agents (nom, prenom, ppr, grade). Avec 'update_existing', un PPR déjà connu met à
+        jour l'agent existant au lieu de lever une IntegrityError.
+        """
+        rows = [(nom.strip(), (prenom or "").strip(), ppr.strip(), grade.strip()) for nom, prenom, ppr, grade in agents_rows]
+        if not rows: return []
+        q = "INSERT INTO agents (nom, prenom, ppr, grade) VALUES (?, ?, ?, ?)"
+        if update_existing: q += " ON CONFLICT(ppr) DO UPDATE SET nom = excluded.nom, prenom = excluded.prenom, grade = excluded.grade"
+        with self.transaction() as conn:
+            conn.executemany(q, rows)
+            ids = self._ids_by_key(conn, "SELECT a.id FROM json_each(?) j JOIN agents a ON a.ppr = j.value ORDER BY j.key", [r[2] for r in rows])
+        self._invalidate_agents_count()
+        return ids
+
+    def bulk_upsert_soldes(self, soldes_rows):
+        """Crée ou remplace les soldes (agent_id, annee, solde, statut) ; une ligne par agent et par année."""
+        rows = [tuple(r) for r in soldes_rows]
+        if not rows: return []
+        keys = json.dumps([[r[0], r[1]] for r in rows])
+        join = """FROM json_each(?) j JOIN soldes_annuels s
+                  ON s.agent_id = json_extract(j.value, '$[0]') AND s.annee = json_extract(j.value, '$[1]')"""
+        with self.resume_soldes_differe({r[0] for r in rows}) as conn:
+            anciens = {(agent_id, annee): solde for agent_id, annee, solde in conn.execute(f"SELECT s.agent_id, s.annee, s.solde {join}", (keys,))}
+            conn.executemany("""INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, ?, ?, ?)
+                                ON CONFLICT(agent_id, annee) DO UPDATE SET solde = excluded.solde, statut = excluded.statut""", rows)
+            ids = [row[0] for row in conn.execute(f"SELECT s.id {join} ORDER BY j.key", (keys,))]
+            self.journaliser_mouvements([
+                (agent_id, solde_id, annee, TypeMouvement.CORRECTION if (agent_id, annee) in anciens else TypeMouvement.INITIAL,
+                 solde - anciens.get((agent_id, annee), 0.0), solde, statut, None)
+                for (agent_id, annee, solde, statut), solde_id in zip(rows, ids)])
+            return ids
+
+    def bulk_update_soldes(self, soldes_values, agent_ids=None):
+        """
+        Met à jour la valeur de plusieurs soldes : couples (solde_id, nouvelle_valeur).
+        'agent_ids' (agents propriétaires de ces soldes) évite de les rechercher si l'appelant les connaît.
+        """
+        rows = [(new_value, solde_id) for solde_id, new_value in soldes_values]
+        if not rows: return []
+        if agent_ids is None:
+            agent_ids = self._ids_by_key(self.conn, "SELECT DISTINCT s.agent_id FROM json_each(?) j JOIN soldes_annuels s ON s.id = j.value", [r[1] for r in rows])
+        with self.resume_soldes_differe(agent_ids) as conn:
+            conn.executemany("UPDATE soldes_annuels SET solde = ? WHERE id = ?", rows)
+        return [solde_id for _, solde_id in rows]
+
+    def bulk_insert_conges(self, conges_models):
+        """Insère des congés (modèles Conge) et retourne leurs id."""
+        rows = [(c.agent_id, c.type_conge, c.justif, c.interim_id, c.date_debut.strftime('%Y-%m-%d'), c.date_fin.strftime('%Y-%m-%d'), c.jours_pris, c.statut or 'Actif') for c in conges_models]
+        if not rows: return []
+        with self.transaction() as conn:
+            conn.executemany("INSERT INTO conges (agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            # executemany ne renvoie pas les id générés. Le verrou d'écriture étant tenu depuis le premier
+            # INSERT, aucun autre écrivain n'a pu s'intercaler : les id sont les n derniers attribués.
+            last_id = conn.execute("SELECT MAX(id) FROM conges").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def get_existing_pprs(self, pprs):
+        """Sous-ensemble des PPR donnés déjà attribués à un agent (une seule requête)."""
+        rows = self.execute_query("SELECT a.ppr FROM json_each(?) j JOIN agents a ON a.ppr = j.value", (json.dumps(list(pprs)),), fetch="all")
+        return {row[0] for row in rows}
+
+    @contextmanager
+    def resume_soldes_differe(self, agent_ids=None):
+        """
+        Suspend la mise à jour ligne à ligne de 'agent_solde_summary' pendant une écriture en masse,
+        puis recalcule en une requête le résumé des agents 'agent_ids' (None : tous les agents).
+        """
+        if getattr(self._local, 'resume_differe', False):
+            with self.transaction() as conn: yield conn
+            if agent_ids is None or agent_ids: self.refresh_solde_summary(agent_ids)
+            return
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO system_config (config_key, config_value) VALUES ('resume_soldes_differe', '1')")
+            self._local.resume_differe = True
+            try:
+                yield conn
+            finally:
+                self._local.resume_differe = False
+            conn.execute("DELETE FROM system_config WHERE config_key = 'resume_soldes_differe'")
+            if agent_ids is None or agent_ids: self.refresh_solde_summary(agent_ids)
+
+    def refresh_solde_summary(self, agent_ids=None):
+        """Recalcule le résumé des soldes des agents donnés (None : tous) à partir de la vue de référence."""
+        # Le filtre n'est propagé dans la vue (recherche par clé) que pour une liste IN (?, ?, ...) explicite ;
+        # au-delà de quelques centaines d'agents, un recalcul complet en une passe est plus rapide.
+        agent_ids = None if agent_ids is None or len(agent_ids) > self.SUMMARY_REFRESH_MAX_IDS else list(agent_ids)
+        q = "INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE "
+        q += "true" if agent_ids is None else f"agent_id IN ({','.join('?' for _ in agent_ids)})"
+        q += """ ON CONFLICT(agent_id) DO UPDATE SET solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1,
+                 solde_n = excluded.solde_n, total_actif = excluded.total_actif"""
+        self.execute_query(q, tuple(agent_ids or ()))
+
+    @staticmethod
+    def _ids_by_key(conn, query, keys):
+        """Relit les id correspondant à une liste de clés passée en un seul paramètre JSON, dans l'ordre de la liste."""
+        return [row[0] for row in conn.execute(query, (json.dumps(keys),))]
+
+    @staticmethod
+    def _agents_fts_match(term):
+        """
+        Traduit une saisie utilisateur en requête FTS5 : chaque mot devient un préfixe ("mot"*),
+        tous les mots devant être présents. Retourne None si la saisie ne contient aucun mot.
+        """
+        tokens = re.findall(r"\w+", term or "")
+        return " ".join(f'"{token}"*' for token in tokens) or None
+
+    def _agents_search_clause(self, term, id_column="id"):
+        """Clause WHERE (et ses paramètres) filtrant 'id_column' sur les agents trouvés par l'index plein texte."""
+        match = self._agents_fts_match(term)
+        if match is None: return None, []
+        return f"{id_column} IN (SELECT rowid FROM agents_fts WHERE agents_fts MATCH ?)", [match]
+
+    def get_agents(self, term=None, limit=None, offset=None, exclude_id=None, with_soldes=True):
         q = "SELECT id, nom, prenom, ppr, grade FROM agents"; p, c = [], []
-        if term: t = f"%{term.lower()}%"; c.append("(LOWER(nom) LIKE ? OR LOWER(prenom) LIKE ? OR LOWER(ppr) LIKE ?)"); p.extend([t, t, t])
+        clause, clause_params = self._agents_search_clause(term)
+        if clause: c.append(clause); p.extend(clause_params)
         if exclude_id is not None: c.append("id != ?"); p.append(exclude_id)
         if c: q += " WHERE " + " AND ".join(c)
         q += " ORDER BY nom, prenom"
         if limit is not None: q += " LIMIT ? OFFSET ?"; p.extend([limit, offset])
-        agents_rows = self.execute_query(q, tuple(p), fetch="all")
-        if not agents_rows: return []
-        agents = [Agent.from_db_row(row) for row in agents_rows]
+        agents = self.execute_query(q, tuple(p), fetch="all", row_factory=Agent.row_factory)
+        if not agents: return []
+        if not with_soldes: return agents
         agent_ids = [agent.id for agent in agents]
         soldes_query = f"SELECT id, agent_id, annee, solde, statut FROM soldes_annuels WHERE agent_id IN ({','.join('?' for _ in agent_ids)})"
-        all_soldes_rows = self.execute_query(soldes_query, agent_ids, fetch="all")
+        all_soldes = self.execute_query(soldes_query, agent_ids, fetch="all", row_factory=SoldeAnnuel.row_factory)
         soldes_map = {}
-        for row in all_soldes_rows:
-            solde_obj = SoldeAnnuel.from_db_row(row)
+        for solde_obj in all_soldes:
             if solde_obj.agent_id not in soldes_map: soldes_map[solde_obj.agent_id] = []
             soldes_map[solde_obj.agent_id].append(solde_obj)
         for agent in agents: agent.soldes_annuels = soldes_map.get(agent.id, [])
         return agents
 
+    def get_agent_refs(self, term=None, limit=None, exclude_id=None):
+        """Références (id, nom, prenom, ppr) des agents, triées par nom : une seule requête, sans soldes."""
+        q = "SELECT id, nom, prenom, ppr FROM agents"; p, c = [], []
+        clause, clause_params = self._agents_search_clause(term)
+        if clause: c.append(clause); p.extend(clause_params)
+        if exclude_id is not None: c.append("id != ?"); p.append(exclude_id)
+        if c: q += " WHERE " + " AND ".join(c)
+        q += " ORDER BY nom, prenom"
+        if limit is not None: q += " LIMIT ?"; p.append(limit)
+        return [AgentRef(*row) for row in self.execute_query(q, tuple(p), fetch="all")]
+
+    def get_agent_ref(self, agent_id):
+        row = self.execute_query("SELECT id, nom, prenom, ppr FROM agents WHERE id = ?", (agent_id,), fetch="one")
+        return AgentRef(*row) if row else None
+
     def get_agent_by_id(self, agent_id):
-        row = self.execute_query("SELECT id, nom, prenom, ppr, grade FROM agents WHERE id=?", (agent_id,), fetch="one")
-        if not row: return None
-        agent = Agent.from_db_row(row)
-        soldes_rows = self.execute_query("SELECT id, agent_id, annee, solde, statut FROM soldes_annuels WHERE agent_id = ?", (agent.id,), fetch="all")
-        agent.soldes_annuels = [SoldeAnnuel.from_db_row(s_row) for s_row in soldes_rows]
+        agent = self.execute_query("SELECT id, nom, prenom, ppr, grade FROM agents WHERE id=?", (agent_id,), fetch="one", row_factory=Agent.row_factory)
+        if not agent: return None
+        agent.soldes_annuels = self.execute_query("SELECT id, agent_id, annee, solde, statut FROM soldes_annuels WHERE agent_id = ?", (agent.id,), fetch="all", row_factory=SoldeAnnuel.row_factory)
         return agent
 
+    def get_agents_page(self, term=None, after=None, limit=20):
+        """
+        Page d'agents triée par (nom, prenom, id), avec le résumé de leurs soldes, en une seule requête.
+        Pagination par clé : 'after' est le triplet (nom, prenom, id) du dernier agent de la page
+        précédente, ce qui rend le coût d'une page indépendant de sa position dans la liste.
+        """
+        q = """SELECT a.id, a.nom, a.prenom, a.ppr, a.grade, a.id, r.solde_n2, r.solde_n1, r.solde_n, r.total_actif
+               FROM agents a LEFT JOIN agent_solde_summary r ON r.agent_id = a.id"""
+        p, c = [], []
+        clause, clause_params = self._agents_search_clause(term, id_column="a.id")
+        if clause: c.append(clause); p.extend(clause_params)
+        if after is not None: c.append("(a.nom, a.prenom, a.id) > (?, ?, ?)"); p.extend(after)
+        if c: q += " WHERE " + " AND ".join(c)
+        q += " ORDER BY a.nom, a.prenom, a.id LIMIT ?"; p.append(limit)
+        return self._agents_with_resume(self.execute_query(q, tuple(p), fetch="all"))
+
+    def get_solde_resume(self, agent_id):
+        """Soldes actifs N-2, N-1, N et total d'un agent, lus dans le résumé maintenu par triggers."""
+        row = self.execute_query("SELECT agent_id, solde_n2, solde_n1, solde_n, total_actif FROM agent_solde_summary WHERE agent_id = ?", (agent_id,), fetch="one")
+        return SoldeResume.from_db_row(row) if row else SoldeResume(agent_id, 0, 0, 0, 0)
+
+    def get_agents_with_resume(self, order_by="nom"):
+        """Tous les agents avec le résumé de leurs soldes ; tri par nom ou par solde total décroissant."""
+        order = "r.total_actif DESC, a.nom, a.prenom" if order_by == "total_actif" else "a.nom, a.prenom"
+        q = f"""SELECT a.id, a.nom, a.prenom, a.ppr, a.grade, a.id, r.solde_n2, r.solde_n1, r.solde_n, r.total_actif
+                FROM agents a LEFT JOIN agent_solde_summary r ON r.agent_id = a.id ORDER BY {order}"""
+        return self._agents_with_resume(self.execute_query(q, fetch="all"))
+
+    @staticmethod
+    def _agents_with_resume(rows):
+        """Lignes (id, nom, prenom, ppr, grade, agent_id, solde_n2, solde_n1, solde_n, total_actif) -> agents."""
+        agents = []
+        for row in rows:
+            agent = Agent.from_db_row(row)
+            agent.resume_soldes = SoldeResume.from_db_row(row[5:])
+            agents.append(agent)
+        return agents
+
     def get_agents_count(self, term=None):
+        key = (term or "").strip().lower()
+        cached = self._agents_count_cache.get(key)
+        if cached is not None: return cached
         q, p = "SELECT COUNT(*) FROM agents", []
-        if term: t = f"%{term.lower()}%"; q += " WHERE LOWER(nom) LIKE ? OR LOWER(prenom) LIKE ? OR LOWER(ppr) LIKE ?"; p.extend([t, t, t])
-        return self.execute_query(q, tuple(p), fetch="one")[0]
+        clause, clause_params = self._agents_search_clause(term)
+        if clause: q += f" WHERE {clause}"; p.extend(clause_params)
+        count = self.execute_query(q, tuple(p), fetch="one")[0]
+        # Pendant une transaction, le comptage voit des écritures non validées : on ne le mémorise pas.
+        if not self.in_transaction(): self._agents_count_cache[key] = count
+        return count
+
+    def clear_caches(self):
+        """Oublie les valeurs mémorisées (après une restauration, le contenu de la base a changé)."""
+        self._agents_count_cache = {}
+
+    def _invalidate_agents_count(self):
+        self._agents_count_cache = {}
+        if self.in_transaction(): self._local.agents_dirty = True
 
     def ajouter_agent(self, nom, prenom, ppr, grade):
-        try: return self.execute_query("INSERT INTO agents (nom, prenom, ppr, grade) VALUES (?, ?, ?, ?)",(nom.strip(), prenom.strip(), ppr.strip(), grade.strip()))
+        try: agent_id = self.execute_query("INSERT INTO agents (nom, prenom, ppr, grade) VALUES (?, ?, ?, ?)",(nom.strip(), (prenom or "").strip(), ppr.strip(), grade.strip()))
         except sqlite3.IntegrityError: return None
+        self._invalidate_agents_count(); return agent_id
 
     def modifier_agent(self, agent_id, nom, prenom, ppr, grade):
         try:
-            self.execute_query("UPDATE agents SET nom=?, prenom=?, ppr=?, grade=? WHERE id=?",(nom.strip(), prenom.strip(), ppr.strip(), grade.strip(), agent_id))
-            return True
+            self.execute_query("UPDATE agents SET nom=?, prenom=?, ppr=?, grade=? WHERE id=?",(nom.strip(), (prenom or "").strip(), ppr.strip(), grade.strip(), agent_id))
+            # Un changement de nom ou de PPR modifie les comptages filtrés par recherche.
+            self._invalidate_agents_count(); return True
         except sqlite3.IntegrityError: return False
 
     def supprimer_agent(self, agent_id):
-        self.execute_query("DELETE FROM agents WHERE id=?", (agent_id,)); return True
+        self.execute_query("DELETE FROM agents WHERE id=?", (agent_id,)); self._invalidate_agents_count(); return True
 
     def ajouter_conge(self, conge_model):
+        # Les dates sont toujours stockées en YYYY-MM-DD : les recherches les comparent telles quelles.
         return self.execute_query("INSERT INTO conges (agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                       (conge_model.agent_id, conge_model.type_conge, conge_model.justif, conge_model.interim_id, conge_model.date_debut, conge_model.date_fin, conge_model.jours_pris))
+                       (conge_model.agent_id, conge_model.type_conge, conge_model.justif, conge_model.interim_id, conge_model.date_debut.strftime('%Y-%m-%d'), conge_model.date_fin.strftime('%Y-%m-%d'), conge_model.jours_pris))
 
-    def supprimer_conge(self, conge_id):
-        cert = self.execute_query("SELECT chemin_fichier FROM certificats_medicaux WHERE conge_id = ?", (conge_id,), fetch="one")
-        if cert and cert[0] and os.path.exists(cert[0]):
-            try: os.remove(cert[0])
-            except OSError as e: logging.error(f"Erreur suppression certificat pour conge_id {conge_id}: {e}")
-        self.execute_query("DELETE FROM conges WHERE id=?", (conge_id,)); return True
+    def supprimer_conge(self, conge_id): return self.supprimer_conges([conge_id])
+
+    def supprimer_conges(self, conge_ids):
+        """Supprime plusieurs congés (et les fichiers de leurs certificats) en deux requêtes."""
+        if not conge_ids: return True
+        placeholders = ','.join('?' for _ in conge_ids)
+        certs = self.execute_query(f"SELECT conge_id, chemin_fichier FROM certificats_medicaux WHERE conge_id IN ({placeholders})", tuple(conge_ids), fetch="all")
+        for conge_id, chemin in certs:
+            if chemin and os.path.exists(chemin):
+                try: os.remove(chemin)
+                except OSError as e: logging.error(f"Erreur suppression certificat pour conge_id {conge_id}: {e}")
+        self.execute_query(f"DELETE FROM conges WHERE id IN ({placeholders})", tuple(conge_ids)); return True
 
     def get_conges(self, agent_id=None):
         q, p = "SELECT id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut FROM conges", ()
         if agent_id: q += " WHERE agent_id=? ORDER BY date_debut DESC"; p = (agent_id,)
         else: q += " ORDER BY date_debut DESC"
-        return [Conge.from_db_row(r) for r in self.execute_query(q, p, fetch="all") if r]
+        return self.execute_query(q, p, fetch="all", row_factory=Conge.row_factory)
 
     def get_conge_by_id(self, conge_id):
-        r = self.execute_query("SELECT id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut FROM conges WHERE id=?", (conge_id,), fetch="one")
-        return Conge.from_db_row(r) if r else None
+        return self.execute_query("SELECT id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut FROM conges WHERE id=?", (conge_id,), fetch="one", row_factory=Conge.row_factory)
         
+    def get_leave_spans(self, start_sql, end_sql):
+        """
+        Congés actifs qui recouvrent une période : (agent_id, grade, premier jour, dernier jour), les jours
+        en ordinaux (date.toordinal), par agent puis date de début.
+        """
+        # Agents en boucle externe : l'index couvrant (agent_id, statut, date_debut, date_fin) rend les
+        # congés déjà triés, sans tri temporaire ni lecture de la table.
+        return self.execute_query("""SELECT a.id, a.grade, CAST(julianday(c.date_debut) - 1721424.5 AS INTEGER), CAST(julianday(c.date_fin) - 1721424.5 AS INTEGER)
+                                     FROM agents a CROSS JOIN conges c ON c.agent_id = a.id
+                                     WHERE c.statut = 'Actif' AND c.date_debut <= ? AND c.date_fin >= ? ORDER BY a.id, c.date_debut""",
+                                  (end_sql, start_sql), fetch="all")
+
+    def get_active_leave_intervals(self, agent_ids):
+        """Congés actifs de plusieurs agents, en une requête : (id, agent_id, type_conge, date_debut, date_fin)."""
+        # CROSS JOIN impose la liste d'agents en boucle externe : chaque agent est lu par l'index
+        # (agent_id, statut, ...) au lieu de parcourir tous les congés actifs.
+        return self.execute_query("""SELECT c.id, c.agent_id, c.type_conge, c.date_debut, c.date_fin FROM json_each(?) j
+                                     CROSS JOIN conges c ON c.agent_id = j.value WHERE c.statut = 'Actif'""", (json.dumps(list(agent_ids)),), fetch="all")
+
     def get_overlapping_leaves(self, agent_id, start_date, end_date, conge_id_exclu=None):
-        q = "SELECT * FROM conges WHERE agent_id=? AND date_fin >= ? AND date_debut <= ? AND statut = 'Actif'"; p = [agent_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+        q = "SELECT id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut FROM conges WHERE agent_id=? AND statut = 'Actif' AND date_debut <= ? AND date_fin >= ?"; p = [agent_id, end_date.strftime('%Y-%m-%d'), start_date.strftime('%Y-%m-%d')]
         if conge_id_exclu: q += " AND id != ?"; p.append(conge_id_exclu)
-        return [Conge.from_db_row(r) for r in self.execute_query(q, tuple(p), fetch="all") if r]
+        return self.execute_query(q, tuple(p), fetch="all", row_factory=Conge.row_factory)
+
+    def get_holidays_between(self, start_sql, end_sql):
+        """Jours fériés officiels et personnalisés d'une plage de dates : (date, nom, type, source)."""
+        return self.execute_query("SELECT date, nom, type, source FROM jours_feries WHERE date BETWEEN ? AND ? ORDER BY date, source", (start_sql, end_sql), fetch="all")
+
+    def get_generated_holiday_years(self, country_code):
+        rows = self.execute_query("SELECT annee FROM jours_feries_annees_generees WHERE pays = ?", (country_code,), fetch="all")
+        return {row[0] for row in rows}
+
+    def replace_official_holidays(self, country_code, year, holidays_by_date):
+        """Remplace les jours fériés officiels d'une année par ceux fournis ({date: nom})."""
+        try:
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM jours_feries WHERE source = 'Officiel' AND date BETWEEN ? AND ?", (f"{year}-01-01", f"{year}-12-31"))
+                conn.executemany("INSERT INTO jours_feries (date, nom, type, source) VALUES (?, ?, 'Officiel', 'Officiel')",
+                                 [(h_date.strftime('%Y-%m-%d'), name) for h_date, name in holidays_by_date.items()])
+                conn.execute("REPLACE INTO jours_feries_annees_generees (annee, pays) VALUES (?, ?)", (year, country_code))
+        except sqlite3.Error as e:
+            logging.error(f"Échec de la génération des jours fériés officiels pour {year} : {e}", exc_info=True)
+            raise e
 
     def get_holidays_for_year(self, year):
-        return self.execute_query("SELECT date, nom, type FROM jours_feries_personnalises WHERE strftime('%Y', date) = ? ORDER BY date", (str(year),), fetch="all")
+        return self.execute_query("SELECT date, nom, type FROM jours_feries_personnalises WHERE date BETWEEN ? AND ? ORDER BY date", (f"{year}-01-01", f"{year}-12-31"), fetch="all")
         
     def get_certificat_for_conge(self, conge_id):
         return self.execute_query("SELECT * FROM certificats_medicaux WHERE conge_id = ?", (conge_id,), fetch="one")
@@ -229,23 +736,26 @@ class DatabaseManager:
             query_join = "INNER JOIN certificats_medicaux cm ON c.id = cm.conge_id"
         else: # 'tous'
             query_join = "LEFT JOIN certificats_medicaux cm ON c.id = cm.conge_id"
-        if search_term:
-            term = f"%{search_term.lower()}%"
-            where_clauses.append("(LOWER(a.nom) LIKE ? OR LOWER(a.prenom) LIKE ? OR LOWER(a.ppr) LIKE ?)")
-            params.extend([term, term, term])
+        search_clause, search_params = self._agents_search_clause(search_term, id_column="a.id")
+        if search_clause:
+            where_clauses.append(search_clause)
+            params.extend(search_params)
         final_query = f"{query_base} {query_join} WHERE {' AND '.join(where_clauses)} ORDER BY c.date_debut DESC"
         return self.execute_query(final_query, tuple(params), fetch="all")
     
     def get_agents_on_leave_today(self):
+        # Les dates sont stockées au format YYYY-MM-DD : une comparaison directe des colonnes
+        # (sans date(...)) permet d'utiliser l'index (statut, date_debut, date_fin).
         query = """
             SELECT a.nom, a.prenom, a.ppr, c.type_conge, c.date_fin
             FROM conges c
             JOIN agents a ON c.agent_id = a.id
             WHERE c.statut = 'Actif'
-              AND date('now', 'localtime') BETWEEN date(c.date_debut) AND date(c.date_fin)
+              AND c.date_debut <= ? AND c.date_fin >= ?
             ORDER BY a.nom, a.prenom
         """
-        return self.execute_query(query, fetch="all")
+        today = datetime.now().strftime('%Y-%m-%d')
+        return self.execute_query(query, (today, today), fetch="all")
         
     def get_db_path(self):
         """Retourne le chemin complet vers le fichier de la base de données."""
@@ -0,0 +1,222 @@
+# Fichier : db/instrumentation.py
+# Mesure des requêtes SQL exécutées par le DatabaseManager (activée par configuration).
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+SLOW_QUERY_LOGGER = logging.getLogger("conges.requetes_lentes")
+
+# Racine du projet : les appelants sont identifiés par leur chemin relatif (ui/..., core/...).
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DB_DIR = os.path.join(_PROJECT_DIR, "db")
+
+_RE_CHAINE = re.compile(r"'(?:[^']|'')*'")
+_RE_NOMBRE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_LISTE_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Forme canonique d'une requête : littéraux remplacés par '?', listes IN (?, ?, ...) repliées, espaces réduits."""
+    sql = _RE_CHAINE.sub("?", sql)
+    sql = _RE_NOMBRE.sub("?", sql)
+    sql = _RE_LISTE_IN.sub("(?, ...)", sql)
+    return _RE_ESPACES.sub(" ", sql).strip()
+
+
+class _StatementStats:
+    __slots__ = ('count', 'total', 'rows', 'samples')
+
+    def __init__(self, max_samples):
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=max_samples)
+
+
+class QueryInstrumentation:
+    """
+    Statistiques par (requête normalisée, appelant) : nombre d'appels, durée totale, moyenne et
+    95e centile (sur les 'max_samples' dernières exécutions), lignes retournées.
+    Les requêtes plus longues que 'slow_threshold_ms' sont journalisées avec leur EXPLAIN QUERY PLAN
+    dans le logger 'conges.requetes_lentes' et conservées (les 'max_slow' dernières) pour l'affichage.
+    """
+    def __init__(self, slow_threshold_ms=100, max_samples=500, max_slow=100):
+        self.slow_threshold = slow_threshold_ms / 1000.0
+        self.max_samples = max_samples
+        self._stats = {}
+        self._slow = deque(maxlen=max_slow)
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self, sql, params, elapsed, rows, conn=None, caller=None):
+        key = (normalize_sql(sql), caller or self.caller())
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _StatementStats(self.max_samples)
+            stats.count += 1
+            stats.total += elapsed
+            stats.rows += rows
+            stats.samples.append(elapsed)
+        if elapsed >= self.slow_threshold:
+            self._record_slow(sql, params, elapsed, key[1], conn)
+
+    def snapshot(self):
+        """Statistiques courantes, de la requête la plus coûteuse (durée cumulée) à la moins coûteuse."""
+        with self._lock:
+            items = [(sql, caller, s.count, s.total, s.rows, sorted(s.samples)) for (sql, caller), s in self._stats.items()]
+            slow = list(self._slow)
+        statements = []
+        for sql, caller, count, total, rows, samples in items:
+            p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))] if samples else 0.0
+            statements.append({
+                'sql': sql, 'appelant': caller, 'appels': count, 'lignes': rows,
+                'total_ms': round(total * 1000, 3), 'moyenne_ms': round(total * 1000 / count, 3), 'p95_ms': round(p95 * 1000, 3),
+            })
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        return {'depuis': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+                'seuil_lent_ms': self.slow_threshold * 1000, 'requetes': statements, 'requetes_lentes': slow}
+
+    def dump_json(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self.started_at = time.time()
+
+    def _record_slow(self, sql, params, elapsed, caller, conn):
+        plan = []
+        if conn is not None:
+            try:
+                # Curseur non instrumenté : l'EXPLAIN lui-même n'est pas mesuré.
+                plan = [row[3] for row in sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except Exception:
+                # Instructions sans plan (BEGIN, PRAGMA...) ou connexion indisponible : on journalise sans plan.
+                plan = []
+        entry = {'quand': time.strftime('%Y-%m-%d %H:%M:%S'), 'duree_ms': round(elapsed * 1000, 3), 'appelant': caller,
+                 'sql': _RE_ESPACES.sub(" ", sql).strip(), 'parametres': repr(params)[:200], 'plan': plan}
+        with self._lock:
+            self._slow.append(entry)
+        SLOW_QUERY_LOGGER.warning("Requête lente (%.1f ms) depuis %s : %s | paramètres=%s\n  plan : %s",
+                                  entry['duree_ms'], caller, entry['sql'], entry['parametres'], " ; ".join(plan) or "-")
+
+    @staticmethod
+    def caller():
+        """
+        Méthode appelante hors du paquet 'db' ; si c'est une méthode du noyau (core/), on y ajoute la
+        première méthode d'interface (ui/) ou utilitaire (utils/) remontée, ex. 'MainWindow.refresh_all > CongeManager.get_x'.
+        """
+        frame = sys._getframe(2)
+        core_caller = None
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(_PROJECT_DIR) and not filename.startswith(_DB_DIR):
+                name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+                relative = os.path.relpath(filename, _PROJECT_DIR)
+                if core_caller is None and relative.startswith("core" + os.sep):
+                    core_caller = name
+                elif not relative.startswith("core" + os.sep):
+                    return f"{name} > {core_caller}" if core_caller else name
+            frame = frame.f_back
+        return core_caller or "?"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Curseur qui mesure ses requêtes quand sa connexion porte une QueryInstrumentation.
+    Une requête sans résultat (écriture, executemany, script) est enregistrée dès son exécution ;
+    une requête qui retourne des lignes l'est à sa lecture (fetchone, fetchmany ou fetchall), durée
+    de lecture et nombre de lignes compris, ou à l'exécution suivante / la fermeture du curseur.
+    """
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        return self._measure(super().execute, sql, parameters, (sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        # Les paramètres (souvent un générateur) sont consommés par l'exécution : ils ne sont pas conservés.
+        return self._measure(super().executemany, sql, None, (sql, seq_of_parameters))
+
+    def executescript(self, sql_script):
+        return self._measure(super().executescript, sql_script, None, (sql_script,))
+
+    def fetchone(self):
+        if self._pending is None: return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._flush(time.perf_counter() - start, int(row is not None))
+        return row
+
+    def fetchmany(self, size=None):
+        if self._pending is None: return super().fetchmany(self.arraysize if size is None else size)
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._flush(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        if self._pending is None: return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._flush(time.perf_counter() - start, len(rows))
+        return rows
+
+    def close(self):
+        if self._pending is not None: self._flush()
+        super().close()
+
+    def __del__(self):
+        if self._pending is not None: self._flush()
+
+    def _measure(self, method, sql, params, args):
+        if self._pending is not None: self._flush()
+        instrumentation = getattr(self.connection, 'instrumentation', None)
+        if instrumentation is None: return method(*args)
+        caller = instrumentation.caller()
+        start = time.perf_counter()
+        result = method(*args)
+        elapsed = time.perf_counter() - start
+        if self.description is None:
+            instrumentation.record(sql, params, elapsed, max(self.rowcount, 0), self.connection, caller)
+        else:
+            self._pending = (instrumentation, sql, params, elapsed, caller)
+        return result
+
+    def _flush(self, fetch_elapsed=0.0, rows=0):
+        instrumentation, sql, params, elapsed, caller = self._pending
+        self._pending = None
+        instrumentation.record(sql, params, elapsed + fetch_elapsed, rows, self.connection, caller)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connexion du pool du DatabaseManager : toutes ses requêtes passent par un InstrumentedCursor,
+    y compris les écritures en masse et les transactions qui appellent conn.execute / executemany
+    directement. Sans 'instrumentation', le coût se limite à un test par exécution.
+    """
+    instrumentation = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
@@ -0,0 +1,44 @@
+-- ##########################################################################
+-- ## Version 3 : Jours fériés officiels matérialisés en base               ##
+-- ##########################################################################
+-- Les jours fériés officiels (bibliothèque 'holidays') sont générés une seule fois par année
+-- et stockés dans 'jours_feries', à côté des jours personnalisés qui y sont recopiés par triggers.
+-- Toute recherche de jours fériés devient ainsi une seule requête par plage de dates.
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS jours_feries (
+    date TEXT NOT NULL,
+    nom TEXT NOT NULL,
+    type TEXT NOT NULL,
+    source TEXT NOT NULL CHECK (source IN ('Officiel', 'Personnalisé')),
+    PRIMARY KEY (date, source)
+);
+
+-- Années déjà générées, et pour quel pays (une génération par année suffit).
+CREATE TABLE IF NOT EXISTS jours_feries_annees_generees (
+    annee INTEGER PRIMARY KEY,
+    pays TEXT NOT NULL
+);
+
+-- Les jours personnalisés restent gérés dans 'jours_feries_personnalises' ; on les recopie.
+INSERT OR REPLACE INTO jours_feries (date, nom, type, source)
+    SELECT date, nom, type, 'Personnalisé' FROM jours_feries_personnalises;
+
+CREATE TRIGGER IF NOT EXISTS trg_feries_perso_insert AFTER INSERT ON jours_feries_personnalises
+BEGIN
+    INSERT OR REPLACE INTO jours_feries (date, nom, type, source) VALUES (NEW.date, NEW.nom, NEW.type, 'Personnalisé');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feries_perso_update AFTER UPDATE ON jours_feries_personnalises
+BEGIN
+    DELETE FROM jours_feries WHERE date = OLD.date AND source = 'Personnalisé';
+    INSERT OR REPLACE INTO jours_feries (date, nom, type, source) VALUES (NEW.date, NEW.nom, NEW.type, 'Personnalisé');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feries_perso_delete AFTER DELETE ON jours_feries_personnalises
+BEGIN
+    DELETE FROM jours_feries WHERE date = OLD.date AND source = 'Personnalisé';
+END;
+
+COMMIT;
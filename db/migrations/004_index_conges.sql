@@ -0,0 +1,17 @@
+-- ##########################################################################
+-- ## Version 4 : Index composites pour les recherches de congés            ##
+-- ##########################################################################
+-- Couvrent les recherches par agent (chevauchements, historique) et par période
+-- (agents en congé, justificatifs), écrites sous forme de plages de dates simples.
+-- Ces plages comparent les colonnes directement à des dates YYYY-MM-DD : les congés
+-- enregistrés avec une heure ('2024-07-01 00:00:00') sont d'abord ramenés à leur date.
+
+BEGIN TRANSACTION;
+
+UPDATE conges SET date_debut = date(date_debut), date_fin = date(date_fin)
+WHERE length(date_debut) > 10 OR length(date_fin) > 10;
+
+CREATE INDEX IF NOT EXISTS idx_conges_agent_statut_dates ON conges (agent_id, statut, date_debut, date_fin);
+CREATE INDEX IF NOT EXISTS idx_conges_statut_dates ON conges (statut, date_debut, date_fin);
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- ##########################################################################
+-- ## Version 5 : Index plein texte (FTS5) pour la recherche d'agents       ##
+-- ##########################################################################
+-- Table FTS5 à contenu externe sur agents(nom, prenom, ppr) : insensible à la casse et aux
+-- accents (unicode61 remove_diacritics), avec index de préfixes pour la saisie au clavier.
+-- Les triggers la maintiennent synchronisée avec la table 'agents'.
+
+BEGIN TRANSACTION;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS agents_fts USING fts5(
+    nom, prenom, ppr,
+    content='agents', content_rowid='id',
+    tokenize="unicode61 remove_diacritics 2",
+    prefix='1 2 3'
+);
+
+-- Indexation des agents déjà présents.
+INSERT INTO agents_fts (agents_fts) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS trg_agents_fts_insert AFTER INSERT ON agents
+BEGIN
+    INSERT INTO agents_fts (rowid, nom, prenom, ppr) VALUES (NEW.id, NEW.nom, NEW.prenom, NEW.ppr);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_agents_fts_delete AFTER DELETE ON agents
+BEGIN
+    INSERT INTO agents_fts (agents_fts, rowid, nom, prenom, ppr) VALUES ('delete', OLD.id, OLD.nom, OLD.prenom, OLD.ppr);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_agents_fts_update AFTER UPDATE OF nom, prenom, ppr ON agents
+BEGIN
+    INSERT INTO agents_fts (agents_fts, rowid, nom, prenom, ppr) VALUES ('delete', OLD.id, OLD.nom, OLD.prenom, OLD.ppr);
+    INSERT INTO agents_fts (rowid, nom, prenom, ppr) VALUES (NEW.id, NEW.nom, NEW.prenom, NEW.ppr);
+END;
+
+COMMIT;
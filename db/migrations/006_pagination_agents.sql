@@ -0,0 +1,15 @@
+-- ##########################################################################
+-- ## Version 6 : Pagination par clé de la liste des agents                 ##
+-- ##########################################################################
+-- La liste est parcourue par clé (nom, prenom, id) au lieu de LIMIT/OFFSET.
+-- Un prénom NULL casserait la comparaison de tuples : on le normalise en chaîne vide, et les
+-- noms sont débarrassés de leurs espaces comme le fait le modèle Agent, pour que la clé d'une
+-- page (relue depuis le modèle) corresponde exactement aux valeurs stockées.
+
+BEGIN TRANSACTION;
+
+UPDATE agents SET nom = TRIM(nom), prenom = TRIM(COALESCE(prenom, ''));
+
+CREATE INDEX IF NOT EXISTS idx_agents_nom_prenom_id ON agents (nom, prenom, id);
+
+COMMIT;
@@ -0,0 +1,32 @@
+-- ##########################################################################
+-- ## Version 7 : Un seul solde par agent et par année                      ##
+-- ##########################################################################
+-- Contrainte nécessaire aux écritures en masse (INSERT ... ON CONFLICT DO UPDATE).
+-- Les éventuels doublons existants (glissement annuel exécuté deux fois, par exemple)
+-- sont retirés en conservant la première ligne créée ; les lignes retirées sont d'abord
+-- recopiées dans 'soldes_annuels_doublons' pour pouvoir être vérifiées et corrigées.
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS soldes_annuels_doublons (
+    id INTEGER PRIMARY KEY,
+    agent_id INTEGER NOT NULL,
+    annee INTEGER NOT NULL,
+    solde REAL NOT NULL,
+    statut TEXT NOT NULL,
+    solde_conserve_id INTEGER NOT NULL,
+    date_retrait TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+INSERT INTO soldes_annuels_doublons (id, agent_id, annee, solde, statut, solde_conserve_id)
+SELECT s.id, s.agent_id, s.annee, s.solde, s.statut, k.id_conserve
+FROM soldes_annuels s
+JOIN (SELECT agent_id, annee, MIN(id) AS id_conserve FROM soldes_annuels GROUP BY agent_id, annee HAVING COUNT(*) > 1) k
+  ON k.agent_id = s.agent_id AND k.annee = s.annee
+WHERE s.id <> k.id_conserve;
+
+DELETE FROM soldes_annuels WHERE id IN (SELECT id FROM soldes_annuels_doublons);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_soldes_agent_annee ON soldes_annuels (agent_id, annee);
+
+COMMIT;
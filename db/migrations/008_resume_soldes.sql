@@ -0,0 +1,89 @@
+-- ##########################################################################
+-- ## Version 8 : Résumé des soldes par agent, maintenu par triggers        ##
+-- ##########################################################################
+-- 'agent_solde_summary' contient, pour chaque agent, les soldes actifs des années N-2, N-1 et N
+-- (N = année d'exercice de system_config) et leur total. Les triggers le recalculent pour l'agent
+-- concerné à chaque écriture sur 'soldes_annuels', et pour tous les agents quand l'année
+-- d'exercice change (glissement annuel). L'affichage, les exports et les contrôles de solde
+-- le lisent directement au lieu de charger et d'additionner les soldes.
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS agent_solde_summary (
+    agent_id INTEGER PRIMARY KEY,
+    solde_n2 REAL NOT NULL DEFAULT 0,
+    solde_n1 REAL NOT NULL DEFAULT 0,
+    solde_n REAL NOT NULL DEFAULT 0,
+    total_actif REAL NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_solde_summary_total ON agent_solde_summary (total_actif);
+
+-- Calcul de référence du résumé (une ligne par agent, même sans solde).
+-- Les triggers utilisent des UPSERT explicites : un 'INSERT OR REPLACE' dans un trigger hériterait
+-- de la résolution de conflit de l'instruction appelante (ABORT pour un UPSERT sur les soldes).
+CREATE VIEW IF NOT EXISTS v_agent_solde_summary AS
+SELECT a.id AS agent_id,
+       COALESCE(SUM(CASE WHEN s.statut = 'Actif' AND s.annee = e.annee - 2 THEN s.solde END), 0) AS solde_n2,
+       COALESCE(SUM(CASE WHEN s.statut = 'Actif' AND s.annee = e.annee - 1 THEN s.solde END), 0) AS solde_n1,
+       COALESCE(SUM(CASE WHEN s.statut = 'Actif' AND s.annee = e.annee THEN s.solde END), 0) AS solde_n,
+       COALESCE(SUM(CASE WHEN s.statut = 'Actif' THEN s.solde END), 0) AS total_actif
+FROM agents a
+LEFT JOIN (SELECT CAST(config_value AS INTEGER) AS annee FROM system_config WHERE config_key = 'annee_exercice') e ON 1
+LEFT JOIN soldes_annuels s ON s.agent_id = a.id
+GROUP BY a.id;
+
+INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE true ON CONFLICT(agent_id) DO UPDATE SET
+        solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1, solde_n = excluded.solde_n, total_actif = excluded.total_actif;
+
+-- Écritures sur les soldes : seul l'agent concerné est recalculé. Les écritures en masse posent
+-- la clé 'resume_soldes_differe' dans system_config (le temps de leur transaction) et recalculent
+-- ensuite les agents concernés en une seule requête.
+CREATE TRIGGER IF NOT EXISTS trg_summary_solde_insert AFTER INSERT ON soldes_annuels
+WHEN NOT EXISTS (SELECT 1 FROM system_config WHERE config_key = 'resume_soldes_differe')
+BEGIN
+    INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE agent_id = NEW.agent_id ON CONFLICT(agent_id) DO UPDATE SET
+        solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1, solde_n = excluded.solde_n, total_actif = excluded.total_actif;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_solde_update AFTER UPDATE OF agent_id, annee, solde, statut ON soldes_annuels
+WHEN NOT EXISTS (SELECT 1 FROM system_config WHERE config_key = 'resume_soldes_differe')
+BEGIN
+    INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE agent_id IN (OLD.agent_id, NEW.agent_id) ON CONFLICT(agent_id) DO UPDATE SET
+        solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1, solde_n = excluded.solde_n, total_actif = excluded.total_actif;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_solde_delete AFTER DELETE ON soldes_annuels
+WHEN NOT EXISTS (SELECT 1 FROM system_config WHERE config_key = 'resume_soldes_differe')
+BEGIN
+    INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE agent_id = OLD.agent_id ON CONFLICT(agent_id) DO UPDATE SET
+        solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1, solde_n = excluded.solde_n, total_actif = excluded.total_actif;
+END;
+
+-- Cycle de vie des agents.
+CREATE TRIGGER IF NOT EXISTS trg_summary_agent_insert AFTER INSERT ON agents
+BEGIN
+    INSERT INTO agent_solde_summary (agent_id) VALUES (NEW.id) ON CONFLICT(agent_id) DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_agent_delete AFTER DELETE ON agents
+BEGIN
+    DELETE FROM agent_solde_summary WHERE agent_id = OLD.id;
+END;
+
+-- Changement d'année d'exercice (REPLACE INTO déclenche un INSERT) : tout le résumé glisse.
+CREATE TRIGGER IF NOT EXISTS trg_summary_exercice_insert AFTER INSERT ON system_config
+WHEN NEW.config_key = 'annee_exercice'
+BEGIN
+    INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE true ON CONFLICT(agent_id) DO UPDATE SET
+        solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1, solde_n = excluded.solde_n, total_actif = excluded.total_actif;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_exercice_update AFTER UPDATE ON system_config
+WHEN NEW.config_key = 'annee_exercice'
+BEGIN
+    INSERT INTO agent_solde_summary SELECT * FROM v_agent_solde_summary WHERE true ON CONFLICT(agent_id) DO UPDATE SET
+        solde_n2 = excluded.solde_n2, solde_n1 = excluded.solde_n1, solde_n = excluded.solde_n, total_actif = excluded.total_actif;
+END;
+
+COMMIT;
@@ -0,0 +1,60 @@
+-- ##########################################################################
+-- ## Version 9 : Journal des mouvements de solde et points de contrôle    ##
+-- ##########################################################################
+-- Chaque modification d'un solde annuel (débit, crédit, solde initial, glissement, expiration,
+-- apurement, correction manuelle) ajoute une ligne à 'mouvements_solde', dans la même transaction,
+-- avec la valeur du solde après le mouvement et, le cas échéant, le congé qui l'a provoqué.
+-- Le journal est en ajout seul : ni modification ni suppression.
+--
+-- 'points_controle_solde' photographie périodiquement les soldes de tous les agents. Le solde d'un
+-- agent à une date donnée se reconstitue à partir du dernier point de contrôle antérieur, complété
+-- par les quelques mouvements postérieurs de cet agent (la "queue"), sans rejouer tout l'historique.
+
+BEGIN TRANSACTION;
+
+CREATE TABLE IF NOT EXISTS mouvements_solde (
+    id INTEGER PRIMARY KEY,
+    agent_id INTEGER NOT NULL,
+    solde_id INTEGER,
+    annee INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    delta REAL NOT NULL,
+    solde_apres REAL NOT NULL,
+    statut TEXT NOT NULL,
+    conge_id INTEGER,
+    date_mouvement TEXT NOT NULL
+);
+
+-- Queue d'un agent après un point de contrôle : (agent_id, id > dernier id couvert).
+CREATE INDEX IF NOT EXISTS idx_mouvements_solde_agent ON mouvements_solde (agent_id, id);
+CREATE INDEX IF NOT EXISTS idx_mouvements_solde_conge ON mouvements_solde (conge_id) WHERE conge_id IS NOT NULL;
+
+CREATE TRIGGER IF NOT EXISTS trg_mouvements_solde_no_update BEFORE UPDATE ON mouvements_solde
+BEGIN
+    SELECT RAISE(ABORT, 'Le journal des mouvements de solde est en ajout seul.');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mouvements_solde_no_delete BEFORE DELETE ON mouvements_solde
+BEGIN
+    SELECT RAISE(ABORT, 'Le journal des mouvements de solde est en ajout seul.');
+END;
+
+-- Une ligne par agent et par année de solde ; 'mouvement_id' est le dernier mouvement (tous agents
+-- confondus) déjà pris en compte par le point de contrôle.
+CREATE TABLE IF NOT EXISTS points_controle_solde (
+    agent_id INTEGER NOT NULL,
+    date_point TEXT NOT NULL,
+    mouvement_id INTEGER NOT NULL,
+    annee INTEGER NOT NULL,
+    solde REAL NOT NULL,
+    statut TEXT NOT NULL,
+    PRIMARY KEY (agent_id, date_point, annee)
+);
+
+CREATE INDEX IF NOT EXISTS idx_points_controle_solde_date ON points_controle_solde (date_point);
+
+-- Point de contrôle d'ouverture : les soldes existants, antérieurs au journal.
+INSERT OR IGNORE INTO points_controle_solde (agent_id, date_point, mouvement_id, annee, solde, statut)
+    SELECT agent_id, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'), 0, annee, solde, statut FROM soldes_annuels;
+
+COMMIT;
@@ -1,11 +1,30 @@
 # Fichier : db/models.py
-# Version 5.2 : Utilise l'Enum SoldeStatus pour éviter les magic strings.
+# Version 5.3 : Modèles compacts (__slots__) et constructeurs rapides pour les lignes lues en base.
 
-from utils.date_utils import validate_date
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+from utils.date_utils import parse_sql_date
 from core.constants import SoldeStatus # <-- IMPORT DE NOTRE ENUM
 
+# --- Constructeurs rapides (row_factory) ---
+# Les lignes lues en base sont déjà propres : chaînes sans espaces superflus, colonnes NOT NULL,
+# dates au format YYYY-MM-DD. Les 'row_factory' des modèles ne refont donc aucune validation.
+# Les dates (objets immuables) sont partagées entre les congés qui ont les mêmes, et les libellés
+# répétitifs (type, statut) sont internés : un export de centaines de milliers de congés ne stocke
+# qu'une fois chaque date et chaque libellé.
+_date_sql = lru_cache(maxsize=16384)(parse_sql_date)
+_STATUTS_SOLDE = {statut.value: statut for statut in SoldeStatus}
+
+def _statut_solde(statut):
+    return _STATUTS_SOLDE.get(statut) or SoldeStatus(statut.strip() if statut else SoldeStatus.ACTIF)
+
+
 class SoldeAnnuel:
     """Représente une ligne de la table soldes_annuels."""
+    __slots__ = ('id', 'agent_id', 'annee', 'solde', 'statut')
+
     def __init__(self, id, agent_id, annee, solde, statut):
         self.id = id
         self.agent_id = agent_id
@@ -22,16 +41,55 @@ class SoldeAnnuel:
         # id, agent_id, annee, solde, statut
         return cls(id=row[0], agent_id=row[1], annee=row[2], solde=row[3], statut=row[4])
 
+    @staticmethod
+    def row_factory(cursor, row):
+        """row_factory sqlite3 : (id, agent_id, annee, solde, statut) -> SoldeAnnuel, sans validation."""
+        solde = object.__new__(SoldeAnnuel)
+        solde.id, solde.agent_id, solde.annee, solde.solde, statut = row
+        solde.statut = _statut_solde(statut)
+        return solde
+
+
+class SoldeResume:
+    """Représente une ligne de la table agent_solde_summary (soldes actifs N-2, N-1, N et total)."""
+    __slots__ = ('agent_id', 'solde_n2', 'solde_n1', 'solde_n', 'total_actif')
+
+    def __init__(self, agent_id, solde_n2, solde_n1, solde_n, total_actif):
+        self.agent_id = agent_id
+        self.solde_n2 = float(solde_n2 or 0)
+        self.solde_n1 = float(solde_n1 or 0)
+        self.solde_n = float(solde_n or 0)
+        self.total_actif = float(total_actif or 0)
+
+    @classmethod
+    def from_db_row(cls, row):
+        """Crée une instance de SoldeResume à partir d'une ligne de la base de données."""
+        if not row:
+            return None
+        # agent_id, solde_n2, solde_n1, solde_n, total_actif
+        return cls(agent_id=row[0], solde_n2=row[1], solde_n1=row[2], solde_n=row[3], total_actif=row[4])
+
+
+class AgentRef(namedtuple('AgentRef', ['id', 'nom', 'prenom', 'ppr'])):
+    """Référence légère vers un agent (sans grade ni soldes), pour les listes de choix et les libellés."""
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.nom} {self.prenom or ''} (PPR: {self.ppr})"
+
 
 class Agent:
     """Représente un agent avec ses attributs."""
-    def __init__(self, id, nom, prenom, ppr, grade, soldes_annuels=None):
+    __slots__ = ('id', 'nom', 'prenom', 'ppr', 'grade', 'soldes_annuels', 'resume_soldes')
+
+    def __init__(self, id, nom, prenom, ppr, grade, soldes_annuels=None, resume_soldes=None):
         self.id = id
         self.nom = nom.strip() if nom else ""
         self.prenom = prenom.strip() if prenom else ""
         self.ppr = ppr.strip() if ppr else ""
         self.grade = grade.strip() if grade else ""
         self.soldes_annuels = soldes_annuels if soldes_annuels is not None else []
+        self.resume_soldes = resume_soldes
 
     def __str__(self):
         return f"{self.nom} {self.prenom} (PPR: {self.ppr})"
@@ -45,22 +103,38 @@ class Agent:
             return None
         return cls(id=row[0], nom=row[1], prenom=row[2], ppr=row[3], grade=row[4])
 
+    @staticmethod
+    def row_factory(cursor, row):
+        """row_factory sqlite3 : (id, nom, prenom, ppr, grade) -> Agent, sans validation."""
+        agent = object.__new__(Agent)
+        agent.id, agent.nom, prenom, agent.ppr, grade = row
+        agent.prenom = prenom or ""
+        agent.grade = sys.intern(grade)
+        agent.soldes_annuels = []
+        agent.resume_soldes = None
+        return agent
+
     def get_solde_total_actif(self):
         """Calcule et retourne la somme de tous les soldes avec le statut 'Actif'."""
+        # Résumé maintenu par la base, s'il a été chargé avec l'agent.
+        if self.resume_soldes is not None:
+            return self.resume_soldes.total_actif
         # On compare maintenant avec la constante au lieu d'une chaîne de caractères
         return sum(s.solde for s in self.soldes_annuels if s.statut == SoldeStatus.ACTIF)
 
 
 class Conge:
     """Représente un congé avec ses attributs."""
+    __slots__ = ('id', 'agent_id', 'type_conge', 'justif', 'interim_id', 'date_debut', 'date_fin', 'jours_pris', 'statut')
+
     def __init__(self, id, agent_id, type_conge, justif, interim_id, date_debut, date_fin, jours_pris, statut='Actif'):
         self.id = id
         self.agent_id = agent_id
         self.type_conge = type_conge.strip() if type_conge else ""
         self.justif = justif.strip() if justif else ""
         self.interim_id = interim_id
-        self.date_debut = validate_date(date_debut)
-        self.date_fin = validate_date(date_fin)
+        self.date_debut = parse_sql_date(date_debut)
+        self.date_fin = parse_sql_date(date_fin)
         self.jours_pris = jours_pris
         self.statut = statut.strip() if statut else "Actif"
 
@@ -84,4 +158,19 @@ class Conge:
             date_fin=row[6], 
             jours_pris=row[7],
             statut=row[8]
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def row_factory(cursor, row):
+        """
+        row_factory sqlite3 : (id, agent_id, type_conge, justif, interim_id, date_debut, date_fin,
+        jours_pris, statut) -> Conge, sans validation, avec dates partagées et libellés internés.
+        """
+        conge = object.__new__(Conge)
+        conge.id, conge.agent_id, type_conge, justif, conge.interim_id, date_debut, date_fin, conge.jours_pris, statut = row
+        conge.type_conge = sys.intern(type_conge)
+        conge.justif = justif or ""
+        conge.date_debut = _date_sql(date_debut)
+        conge.date_fin = _date_sql(date_fin)
+        conge.statut = sys.intern(statut)
+        return conge
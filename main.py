@@ -6,6 +6,8 @@ from tkinter import messagebox
 import sys
 import os
 import logging
+import threading
+from datetime import datetime
 
 # --- Étape 1 : Définir les chemins de base ---
 try:
@@ -26,6 +28,7 @@ except Exception as e:
 
 # --- Étape 3 : Importer les autres composants de l'architecture ---
 from db.database import DatabaseManager
+from db.instrumentation import QueryInstrumentation, SLOW_QUERY_LOGGER
 from core.conges.manager import CongeManager
 from ui.main_window import MainWindow
 
@@ -33,7 +36,8 @@ from ui.main_window import MainWindow
 if __name__ == "__main__":
     # --- Étape 4 : Vérifier les dépendances externes ---
     try:
-        import tkcalendar, dateutil, holidays, yaml, openpyxl
+        # 'holidays' n'est plus importé ici : il n'est chargé qu'à la génération d'une année absente de la base.
+        import tkcalendar, dateutil, yaml, openpyxl
     except ImportError as e:
         root = tk.Tk(); root.withdraw()
         messagebox.showerror("Bibliothèque Manquante", f"Une bibliothèque nécessaire est manquante : {e.name}.\n\nVeuillez l'installer avec la commande :\npip install -r requirements.txt")
@@ -50,6 +54,12 @@ if __name__ == "__main__":
     logging.basicConfig(filename=LOG_FILE_PATH, level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
 
+    INSTRUMENTATION_CONFIG = CONFIG['db'].get('instrumentation') or {}
+    if INSTRUMENTATION_CONFIG.get('enabled'):
+        slow_log_handler = logging.FileHandler(os.path.join(BASE_DIR, INSTRUMENTATION_CONFIG.get('slow_query_log', "requetes_lentes.log")), encoding="utf-8")
+        slow_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        SLOW_QUERY_LOGGER.addHandler(slow_log_handler)
+
     # --- Boucle de l'application pour permettre le redémarrage ---
     restart_app = True
     while restart_app:
@@ -57,6 +67,8 @@ if __name__ == "__main__":
 
         # --- Étape 6 : Initialiser les composants principaux ---
         db_manager = DatabaseManager(DB_PATH_ABS)
+        if INSTRUMENTATION_CONFIG.get('enabled'):
+            db_manager.instrumentation = QueryInstrumentation(slow_threshold_ms=float(INSTRUMENTATION_CONFIG.get('slow_query_ms', 100)))
         if not db_manager.connect():
             sys.exit(1)
             
@@ -67,6 +79,17 @@ if __name__ == "__main__":
             sys.exit(1)
             
         conge_manager = CongeManager(db_manager, CERTIFICATS_DIR_ABS)
+        try:
+            conge_manager.holiday_calendar.materialize_window(conge_manager.get_annee_exercice())
+        except Exception as e:
+            logging.error(f"Impossible de générer les jours fériés officiels : {e}", exc_info=True)
+        conge_manager.point_controle_periodique()
+
+        # Instantané quotidien en arrière-plan (seuls les blocs modifiés depuis la veille sont écrits).
+        daily_backup_thread = None
+        if (CONFIG.get('backups') or {}).get('daily', True):
+            daily_backup_thread = threading.Thread(target=conge_manager.sauvegarde_quotidienne, name="sauvegarde-quotidienne")
+            daily_backup_thread.start()
         
         # --- Étape 7 : Lancer l'application ---
         print(f"--- Lancement de {CONFIG['app']['title']} v{CONFIG['app']['version']} ---")
@@ -77,6 +100,14 @@ if __name__ == "__main__":
         if hasattr(app, 'restart_on_close') and app.restart_on_close:
             restart_app = True # On indique qu'il faut refaire un tour de boucle
         
+        if db_manager.instrumentation is not None:
+            dump_dir = os.path.join(BASE_DIR, INSTRUMENTATION_CONFIG.get('dump_dir', "diagnostics"))
+            try:
+                db_manager.instrumentation.dump_json(os.path.join(dump_dir, f"requetes_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"))
+            except OSError as e:
+                logging.error(f"Impossible d'écrire l'instantané des requêtes : {e}")
+        if daily_backup_thread is not None:
+            daily_backup_thread.join()
         db_manager.close()
     
     print("--- Application fermée, connexion à la base de données terminée. ---")
\ No newline at end of file
@@ -1,14 +1,16 @@
 import sys
 import os
-from datetime import date
+from datetime import date, datetime
 
 # --- Configuration pour permettre l'importation depuis le dossier racine ---
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 # ---------------------------------------------------------------------------
 
 import pytest
+from core.conges import strategies as strategies_module
 from core.conges.strategies import CongeAnnuelStrategy, CongeCalendaireStrategy
 from utils.config_loader import CONFIG, load_config
+from utils.date_utils import jours_ouvres, calculate_reprise_date, validate_date
 
 # Charger une configuration minimale pour les tests
 # Créez un fichier 'config.yaml' à la racine si ce n'est pas déjà fait.
@@ -83,4 +85,67 @@ def test_calendaire_calculate_days_single_day():
     strategy = CongeCalendaireStrategy()
     start_date = date(2024, 8, 9)
     end_date = date(2024, 8, 9)
-    assert strategy.calculate_days(start_date, end_date, HOLIDAYS_SET_FIXTURE) == 1
\ No newline at end of file
+    assert strategy.calculate_days(start_date, end_date, HOLIDAYS_SET_FIXTURE) == 1
+
+# --- Tests pour l'index des jours ouvrés ---
+
+def test_annuel_calculate_days_multi_year():
+    strategy = CongeAnnuelStrategy()
+    start_date = date(2023, 12, 29)  # Vendredi
+    end_date = date(2025, 1, 2)      # Jeudi
+    # 2024 compte 262 jours ouvrés, moins le lundi férié du fixture, + le 29/12/2023, + les 1er et 2 janvier 2025.
+    assert strategy.calculate_days(start_date, end_date, HOLIDAYS_SET_FIXTURE) == 264
+
+def test_jours_ouvres_accepts_datetimes():
+    assert jours_ouvres(datetime(2024, 8, 16), datetime(2024, 8, 20), HOLIDAYS_SET_FIXTURE) == 2
+
+def test_annuel_calculate_end_date_keeps_datetime_and_skips_holiday():
+    strategy = CongeAnnuelStrategy()
+    # Avec une date de début de type datetime, le jour férié du lundi 19 doit aussi être sauté.
+    assert strategy.calculate_end_date(datetime(2024, 8, 16), 2, HOLIDAYS_SET_FIXTURE) == datetime(2024, 8, 20)
+
+def test_annuel_calculate_end_date_long_span():
+    strategy = CongeAnnuelStrategy()
+    start_date = date(2024, 1, 1)  # Lundi
+    # 262 jours ouvrés en 2024 moins le lundi férié : le 261e tombe le 31/12/2024.
+    assert strategy.calculate_end_date(start_date, 261, HOLIDAYS_SET_FIXTURE) == date(2024, 12, 31)
+    assert strategy.calculate_end_date(start_date, 262, HOLIDAYS_SET_FIXTURE) == date(2025, 1, 1)
+
+def test_calculate_reprise_date_skips_weekend_and_holiday():
+    # Fin le vendredi 16 : samedi, dimanche puis lundi 19 (férié) sont sautés.
+    assert calculate_reprise_date(date(2024, 8, 16), HOLIDAYS_SET_FIXTURE) == date(2024, 8, 20)
+
+
+# --- Tests des calculs par lots (avec et sans NumPy) ---
+
+@pytest.fixture(params=["numpy", "python"])
+def batch_backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(strategies_module, "np", None)
+    return request.param
+
+def test_annuel_batch_matches_scalar(batch_backend):
+    strategy = CongeAnnuelStrategy()
+    starts = [date(2024, 8, 5), date(2024, 8, 9), date(2024, 8, 19), date(2024, 8, 15), datetime(2024, 12, 20)]
+    ends = [date(2024, 8, 9), date(2024, 8, 12), date(2024, 8, 20), date(2024, 8, 10), datetime(2025, 1, 10)]
+    expected = [strategy.calculate_days(s, e, HOLIDAYS_SET_FIXTURE) for s, e in zip(starts, ends)]
+    assert strategy.calculate_days_batch(starts, ends, HOLIDAYS_SET_FIXTURE) == expected
+
+def test_annuel_end_dates_batch_matches_scalar(batch_backend):
+    strategy = CongeAnnuelStrategy()
+    starts = [date(2024, 8, 5), date(2024, 8, 15), date(2024, 8, 17), date(2024, 8, 9)]
+    days = [5, 4, 3, 0]
+    expected = [strategy.calculate_end_date(s, n, HOLIDAYS_SET_FIXTURE) for s, n in zip(starts, days)]
+    assert strategy.calculate_end_dates_batch(starts, days, HOLIDAYS_SET_FIXTURE) == expected
+
+def test_calendaire_batch_matches_scalar(batch_backend):
+    strategy = CongeCalendaireStrategy()
+    starts, ends = [date(2024, 8, 9), date(2024, 2, 28), datetime(2024, 8, 15)], [date(2024, 8, 12), date(2024, 3, 1), datetime(2024, 8, 10)]
+    expected = [strategy.calculate_days(s, e, HOLIDAYS_SET_FIXTURE) for s, e in zip(starts, ends)]
+    assert strategy.calculate_days_batch(starts, ends, HOLIDAYS_SET_FIXTURE) == expected == [4, 3, 0]
+
+def test_validate_date_rejects_overflowing_input():
+    assert validate_date("9" * 25) is None
+    assert validate_date("05/07/2024") == datetime(2024, 7, 5)
@@ -0,0 +1,38 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import pytest
+from db import database as database_module
+from db.database import DatabaseManager
+from core.conges.manager import CongeManager
+from utils.config_loader import CONFIG
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Base de test sur fichier, avec toutes les migrations appliquées."""
+    monkeypatch.setattr(database_module.messagebox, "showinfo", lambda *args, **kwargs: None)
+    manager = DatabaseManager(str(tmp_path / "test.db"))
+    assert manager.connect()
+    manager.run_migrations()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def conges_config():
+    """Section 'conges' de la configuration pour les tests du manager ; un module peut la surcharger."""
+    return {'types_decompte_solde': ['Congé annuel'], 'solde_annuel_par_defaut': 22.0}
+
+
+@pytest.fixture
+def manager(db, tmp_path, monkeypatch, conges_config):
+    """CongeManager sur la base de test, sans jours fériés."""
+    monkeypatch.setitem(CONFIG, 'conges', conges_config)
+    manager = CongeManager(db, str(tmp_path / "certificats"))
+    monkeypatch.setattr(manager, "get_holidays_set_for_period", lambda start, end: frozenset())
+    return manager
@@ -0,0 +1,41 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import pytest
+
+
+@pytest.fixture
+def roster_db(db):
+    # Homonymes volontaires : seul l'id départage certains agents.
+    for i in range(25):
+        agent_id = db.ajouter_agent(f"Nom{i % 4}", "Prénom" if i % 2 else "", f"PPR{i:03d}", "Technicien")
+        db.execute_query("INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, ?, ?, ?)", (agent_id, 2024, float(i), "Actif"))
+    return db
+
+
+def test_keyset_pages_cover_roster_in_order(roster_db):
+    seen, after = [], None
+    while True:
+        page = roster_db.get_agents_page(after=after, limit=7)
+        if not page: break
+        seen.extend(page)
+        after = (page[-1].nom, page[-1].prenom, page[-1].id)
+    expected = roster_db.get_agents()
+    assert [a.id for a in seen] == [a.id for a in sorted(expected, key=lambda a: (a.nom, a.prenom, a.id))]
+    assert all(a.resume_soldes.total_actif == float(int(a.ppr[3:])) for a in seen)
+
+
+def test_count_cache_is_invalidated_on_agent_changes(roster_db):
+    assert roster_db.get_agents_count() == 25
+    assert roster_db.get_agents_count(term="ppr024") == 1
+    agent_id = roster_db.ajouter_agent("Nouveau", "Agent", "PPR999", "Technicien")
+    assert roster_db.get_agents_count() == 26
+    roster_db.supprimer_agent(agent_id)
+    assert roster_db.get_agents_count() == 25
+    with roster_db.transaction():
+        roster_db.ajouter_agent("Dans", "Transaction", "PPR998", "Technicien")
+    assert roster_db.get_agents_count() == 26
@@ -0,0 +1,48 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import pytest
+
+
+@pytest.fixture
+def agents_db(db):
+    db.ajouter_agent("Élouafi", "Hélène", "A12345", "Ingénieur")
+    db.ajouter_agent("El Amrani", "Mohamed", "B67890", "Technicien")
+    db.ajouter_agent("Dupont", "Jean", "C11111", "Technicien")
+    return db
+
+
+@pytest.mark.parametrize("term, expected", [
+    ("elo", ["Élouafi"]),          # insensible aux accents
+    ("HÉLÈ", ["Élouafi"]),         # insensible à la casse
+    ("el am", ["El Amrani"]),      # plusieurs préfixes
+    ("b678", ["El Amrani"]),       # PPR
+    ("inconnu", []),
+])
+def test_search_by_prefix(agents_db, term, expected):
+    assert [a.nom for a in agents_db.get_agents(term=term)] == expected
+    assert agents_db.get_agents_count(term=term) == len(expected)
+
+
+def test_search_without_words_returns_everyone(agents_db):
+    assert agents_db.get_agents_count(term="  - ") == 3
+
+
+def test_index_follows_agent_changes(agents_db):
+    agents_db.execute_query("UPDATE agents SET nom = ? WHERE ppr = ?", ("Zeroual", "C11111"))
+    agents_db.execute_query("DELETE FROM agents WHERE ppr = ?", ("B67890",))
+    assert [a.nom for a in agents_db.get_agents(term="zer")] == ["Zeroual"]
+    assert agents_db.get_agents_count(term="dupont") == 0
+    assert agents_db.get_agents_count(term="amrani") == 0
+
+
+def test_agent_refs_are_lightweight_tuples(agents_db):
+    dupont_id = agents_db.get_agents(term="dupont")[0].id
+    refs = agents_db.get_agent_refs(term="el", exclude_id=dupont_id)
+    assert [(r.nom, r.ppr) for r in refs] == [("El Amrani", "B67890"), ("Élouafi", "A12345")]
+    assert tuple(agents_db.get_agent_ref(dupont_id)) == (dupont_id, "Dupont", "Jean", "C11111")
+    assert str(agents_db.get_agent_ref(dupont_id)) == "Dupont Jean (PPR: C11111)"
@@ -0,0 +1,50 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+from datetime import date
+import pytest
+from core.conges.audit import AnnualLeaveAuditor, _chevauchements
+from db.models import Conge
+
+
+@pytest.fixture
+def agents(db):
+    ids = [db.ajouter_agent(f"Nom{i}", "Prenom", f"P{i}", "Technicien") for i in range(3)]
+    db.bulk_upsert_soldes([(agent_id, 2024, 22.0, "Actif") for agent_id in ids])
+    db.bulk_insert_conges([
+        # Du lundi 1er au vendredi 5 juillet : 5 jours ouvrés, 4 une fois le 3 juillet férié.
+        Conge(None, ids[0], 'Congé annuel', None, None, date(2024, 7, 1), date(2024, 7, 5), 5),
+        Conge(None, ids[1], 'Congé annuel', None, None, date(2024, 3, 4), date(2024, 3, 8), 5),
+        Conge(None, ids[1], 'Congé de maladie', None, None, date(2024, 3, 8), date(2024, 3, 10), 3),
+        Conge(None, ids[2], 'Congé annuel', None, None, date(2023, 12, 25), date(2023, 12, 29), 5),
+    ])
+    db.corriger_soldes([(db.get_agent_by_id(ids[2]).soldes_annuels[0].id, -2.0)])
+    # Écriture hors journal : le solde ne correspond plus à ses mouvements.
+    db.execute_query("UPDATE soldes_annuels SET solde = 10 WHERE agent_id = ?", (ids[1],))
+    return ids
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_audit_reports_days_overlaps_and_balances(db, agents, max_workers):
+    progress = []
+    auditor = AnnualLeaveAuditor(db.get_db_path(), max_workers=max_workers, agents_par_tranche=2)
+    report = auditor.run(2024, {date(2024, 7, 3)}, progress=lambda done, total: progress.append((done, total)))
+
+    assert progress[-1] == (3, 3) and report.nb_conges == 2
+    assert [(c.agent_id, c.jours_pris, jours) for c, jours in report.jours_incoherents] == [(agents[0], 5, 4)]
+    assert [(a.type_conge, b.type_conge) for a, b in report.chevauchements] == [('Congé annuel', 'Congé de maladie')]
+    assert [(s.agent_id, s.solde) for s in report.soldes_negatifs] == [(agents[2], -2.0)]
+    assert [(s.agent_id, s.solde, solde_journal) for s, solde_journal in report.ecarts_journal] == [(agents[1], 10.0, 22.0)]
+    assert report.agent_name(agents[1]) == "Nom1 Prenom" and len(report) == 4
+
+
+def test_chevauchements_reports_every_overlapping_pair():
+    def row(conge_id, agent_id, debut, fin):
+        return (conge_id, agent_id, 'Congé annuel', None, None, debut, fin, 1, 'Actif')
+    a, b, c = row(1, 1, "2024-07-01", "2024-07-10"), row(2, 1, "2024-07-02", "2024-07-05"), row(3, 1, "2024-07-04", "2024-07-06")
+    d, e = row(4, 1, "2024-07-11", "2024-07-12"), row(5, 2, "2024-07-05", "2024-07-06")
+    assert _chevauchements([a, b, c, d, e]) == [(a, b), (a, c), (b, c)]
@@ -0,0 +1,78 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import sqlite3
+import threading
+import pytest
+from db.backup import BackupEngine, BackupError
+
+
+def test_backup_is_verified_and_renamed(db, tmp_path):
+    db.bulk_insert_agents([(f"Nom{i}", "Prenom", f"P{i}", "Technicien") for i in range(2000)])
+    engine = BackupEngine(db)
+    engine.PAGES_PER_STEP = 5
+    progress = []
+    path = engine.create_backup(label="TEST", progress=lambda done, total: progress.append((done, total)))
+
+    assert os.path.dirname(path) == str(tmp_path / "backups")
+    assert "_TEST_" in os.path.basename(path)
+    assert os.listdir(tmp_path / "backups") == [os.path.basename(path)]
+    assert len(progress) > 1 and progress[-1][0] == progress[-1][1]
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM agents").fetchone()[0] == 2000
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+
+
+def test_live_restore_rejects_corrupted_backup(db, tmp_path):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    engine = BackupEngine(db)
+    path = engine.create_backup()
+    bad_path = str(tmp_path / "corrompue.db")
+    with open(path, "rb") as f: data = bytearray(f.read())
+    data[len(data) // 2:] = b"\x00" * (len(data) - len(data) // 2)
+    with open(bad_path, "wb") as f: f.write(data)
+
+    db.supprimer_agent(agent_id)
+    with pytest.raises(BackupError):
+        engine.restore_live(bad_path)
+    assert db.get_agent_by_id(agent_id) is None
+
+    # Restauration dans la base ouverte : une autre connexion du pool voit aussitôt le contenu restauré.
+    engine.restore_live(path)
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(db.get_agent_by_id(agent_id)))
+    worker.start(); worker.join()
+    assert seen[0].ppr == "P1"
+    assert db.execute_query("PRAGMA journal_mode", fetch="one")[0] == "wal"
+
+
+def test_manager_hot_restore_invalidates_caches(db, tmp_path):
+    from core.conges.manager import CongeManager
+    manager = CongeManager(db, str(tmp_path / "certificats"))
+    db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    path = manager.backups.create_backup()
+    db.ajouter_agent("Bennani", "Omar", "P2", "Technicien")
+    assert manager.get_agents_count() == 2
+
+    manager.restaurer_fichier(path)
+    assert manager.get_agents_count() == 1
+    assert db.execute_query("SELECT MAX(version) FROM db_version", fetch="one")[0] >= 9
+
+
+def test_backup_paths_with_uri_characters(db, tmp_path):
+    import shutil
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    engine = BackupEngine(db)
+    # '#', '?' et '%' couperaient ou altéreraient une URI 'file:' écrite à la main.
+    target_dir = tmp_path / "sauvegardes #1 ?%20"
+    target_dir.mkdir()
+    path = shutil.copy(engine.create_backup(), target_dir / "copie.db")
+    engine.verify(str(path))
+    db.supprimer_agent(agent_id)
+    engine.restore_live(str(path))
+    assert db.get_agent_by_id(agent_id).ppr == "P1"
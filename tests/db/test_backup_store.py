@@ -0,0 +1,76 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import json
+import sqlite3
+import pytest
+from db.backup import BackupEngine, BackupError
+from db.backup_store import BackupStore
+
+
+@pytest.fixture
+def store(db, tmp_path):
+    return BackupStore(BackupEngine(db), str(tmp_path / "magasin"), chunk_pages=4)
+
+
+def _chunk_files(store):
+    return {f for d in os.listdir(store.chunks_dir) for f in os.listdir(os.path.join(store.chunks_dir, d))}
+
+
+def test_second_snapshot_writes_only_changed_chunks(db, store, tmp_path):
+    db.bulk_insert_agents([(f"Nom{i}", "Prenom", f"P{i}", "Technicien") for i in range(5000)])
+    first = store.create_snapshot(label="A")
+    assert first['blocs_nouveaux'] == len(set(first['blocs']))
+
+    agent_id = db.ajouter_agent("Alami", "Sara", "X1", "Ingénieur")
+    second = store.create_snapshot(label="B")
+    assert len(second['blocs']) >= 20
+    assert second['blocs_nouveaux'] < len(second['blocs']) // 2
+
+    restored = store.assemble(second['id'], str(tmp_path / "restauree.db"))
+    conn = sqlite3.connect(restored)
+    assert conn.execute("SELECT ppr FROM agents WHERE id = ?", (agent_id,)).fetchone() == ("X1",)
+    conn.close()
+
+
+def test_retention_keeps_labelled_and_collects_chunks(db, store):
+    db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    labelled = store.create_snapshot(label="AVANT_CLOTURE_2024")
+    ids = []
+    for day in ("2024-01-10", "2024-03-01", "2024-03-02", "2024-03-03"):
+        db.ajouter_agent("Nom", day, f"P{day}", "Technicien")
+        manifest = store.create_snapshot()
+        # On antidate l'instantané pour simuler des sauvegardes quotidiennes.
+        manifest['cree_le'] = f"{day} 08:00:00"
+        with open(store._manifest_path(manifest['id']), "w", encoding="utf-8") as f: json.dump(manifest, f)
+        ids.append(manifest['id'])
+
+    store.retention = {'daily': 2, 'weekly': 1, 'monthly': 1}
+    removed = store.apply_retention()
+    remaining = {m['id'] for m in store.list_snapshots()}
+    assert set(removed) == {ids[0], ids[1]}
+    assert remaining == {labelled['id'], ids[2], ids[3]}
+    referenced = {f"{d}.zlib" for m in store.list_snapshots() for d in m['blocs']}
+    assert _chunk_files(store) == referenced
+
+    os.remove(store._chunk_path(labelled['blocs'][0]))
+    with pytest.raises(BackupError):
+        store.assemble(labelled['id'], os.path.join(store.root, "x.db"))
+
+
+def test_unreadable_manifest_keeps_every_chunk(db, store):
+    db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    first = store.create_snapshot(label="A")
+    db.bulk_insert_agents([(f"Nom{i}", "Prenom", f"P{i + 2}", "Technicien") for i in range(2000)])
+    second = store.create_snapshot(label="B")
+    chunks = _chunk_files(store)
+    # Manifeste à moitié écrit : ses blocs ne sont plus connus.
+    with open(store._manifest_path(first['id']), "w", encoding="utf-8") as f: f.write('{"id": "')
+
+    store.delete_snapshot(second['id'])
+    assert _chunk_files(store) == chunks
+    assert [m['id'] for m in store.list_snapshots()] == []
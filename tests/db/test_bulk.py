@@ -0,0 +1,63 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import sqlite3
+import pytest
+from db.models import Conge
+
+
+def test_bulk_insert_agents_returns_ids_in_order(db):
+    ids = db.bulk_insert_agents([("Zeroual", "Ali", "P2", "Technicien"), ("Alami", "Sara", "P1", "Ingénieur")])
+    assert [db.get_agent_by_id(i).ppr for i in ids] == ["P2", "P1"]
+    assert db.get_agents_count() == 2
+
+
+def test_bulk_insert_agents_upsert_by_ppr(db):
+    first_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    with pytest.raises(sqlite3.IntegrityError):
+        db.bulk_insert_agents([("Alami", "Sara", "P1", "Ingénieur")])
+    ids = db.bulk_insert_agents([("Alami", "Sarah", "P1", "Technicien"), ("Bennani", "Omar", "P3", "Technicien")], update_existing=True)
+    assert ids[0] == first_id
+    assert db.get_agent_by_id(first_id).prenom == "Sarah"
+
+
+def test_bulk_upsert_and_update_soldes(db):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    ids = db.bulk_upsert_soldes([(agent_id, 2023, 10.0, "Actif"), (agent_id, 2024, 22.0, "Actif")])
+    assert db.bulk_upsert_soldes([(agent_id, 2024, 15.0, "Actif")]) == [ids[1]]
+    db.bulk_update_soldes([(ids[0], 4.0)])
+    soldes = {s.annee: s.solde for s in db.get_agent_by_id(agent_id).soldes_annuels}
+    assert soldes == {2023: 4.0, 2024: 15.0}
+
+
+def test_bulk_insert_conges_returns_generated_ids(db):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    conges = [Conge(None, agent_id, "Congé annuel", "", None, f"2024-0{m}-01", f"2024-0{m}-05", 5) for m in (3, 4, 5)]
+    ids = db.bulk_insert_conges(conges)
+    assert [db.get_conge_by_id(i).date_debut.month for i in ids] == [3, 4, 5]
+
+
+def test_glissement_annuel_is_set_based_and_idempotent(db):
+    ids = db.bulk_insert_agents([("Alami", "Sara", "P1", "Ingénieur"), ("Bennani", "Omar", "P2", "Technicien")])
+    db.bulk_upsert_soldes([(ids[0], 2022, 3.0, "Actif"), (ids[1], 2022, 0.0, "Actif"), (ids[0], 2024, 22.0, "Actif")])
+    assert db.glissement_annuel(2024, 2022, 22.0) == {'soldes_crees': 1, 'soldes_expires': 2}
+    assert db.glissement_annuel(2024, 2022, 22.0) == {'soldes_crees': 0, 'soldes_expires': 0}
+    assert db.get_annee_exercice() == 2024
+    assert {(s.annee, s.statut.value) for s in db.get_agent_by_id(ids[1]).soldes_annuels} == {(2022, "Expiré"), (2024, "Actif")}
+
+
+def test_migration_7_archives_duplicate_soldes(db):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    db.execute_query("DROP INDEX idx_soldes_agent_annee")
+    for solde in (22.0, 18.5):
+        db.execute_query("INSERT INTO soldes_annuels (agent_id, annee, solde, statut) VALUES (?, 2024, ?, 'Actif')", (agent_id, solde))
+    script = os.path.join(os.path.dirname(__file__), '../../db/migrations/007_soldes_unicite.sql')
+    with open(script, encoding='utf-8') as f: db.conn.executescript(f.read())
+    assert [(s.annee, s.solde) for s in db.get_agent_by_id(agent_id).soldes_annuels] == [(2024, 22.0)]
+    # Le solde retiré reste consultable, avec la ligne qui a été conservée à sa place.
+    kept_id = db.get_agent_by_id(agent_id).soldes_annuels[0].id
+    assert db.execute_query("SELECT agent_id, annee, solde, solde_conserve_id FROM soldes_annuels_doublons", fetch="all") == [(agent_id, 2024, 18.5, kept_id)]
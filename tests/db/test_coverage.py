@@ -0,0 +1,71 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import csv
+import random
+from datetime import date, timedelta
+import pytest
+from core.conges.coverage import CoverageEngine
+from db.models import Conge
+from utils.file_utils import export_coverage_to_csv
+
+
+@pytest.fixture
+def conges_config(conges_config):
+    return {**conges_config, 'couverture': {'seuil': 1, 'seuils_par_grade': {'Infirmier': 0}}}
+
+
+def test_sweep_matches_brute_force():
+    rng = random.Random(11)
+    origin = date(2024, 1, 1)
+    spans = []
+    for agent_id in range(40):
+        grade = rng.choice(['Infirmier', 'Technicien'])
+        for _ in range(rng.randint(0, 6)):
+            debut = origin + timedelta(days=rng.randint(-20, 380))
+            spans.append((agent_id, grade, debut.toordinal(), debut.toordinal() + rng.choice([0, 1, 5, 30])))
+    spans.sort(key=lambda s: (s[0], s[2]))
+    debut, fin = date(2024, 2, 1), date(2024, 11, 30)
+
+    par_grade = CoverageEngine._sweep(debut, fin, spans)
+    for i in range(0, (fin - debut).days + 1, 7):
+        jour = (debut + timedelta(days=i)).toordinal()
+        for grade in ('Infirmier', 'Technicien'):
+            # Un agent dont deux congés se recouvrent n'est compté qu'une fois.
+            absents = {a for a, g, d, f in spans if g == grade and d <= jour <= f}
+            assert par_grade.get(grade, [0] * (i + 1))[i] == len(absents)
+
+
+def test_thresholds_cache_and_csv_export(db, manager, tmp_path):
+    infirmier = db.ajouter_agent("Alami", "Sara", "P1", "Infirmier")
+    techniciens = [db.ajouter_agent(f"Nom{i}", "Prenom", f"P{i + 2}", "Technicien") for i in range(2)]
+    db.bulk_upsert_soldes([(agent_id, 2024, 22.0, "Actif") for agent_id in [infirmier, *techniciens]])
+    manager.importer_conges([Conge(None, agent_id, 'Congé annuel', None, None, date(2024, 7, 1), date(2024, 7, 3), 3) for agent_id in techniciens])
+
+    report = manager.calculer_couverture(date(2024, 7, 1), date(2024, 7, 5))
+    assert report.par_grade['Technicien'] == [2, 2, 2, 0, 0] and report.totaux == [2, 2, 2, 0, 0]
+    assert list(report.jours_critiques()) == [date(2024, 7, 1), date(2024, 7, 2), date(2024, 7, 3)]
+
+    form = {'agent_id': infirmier, 'type_conge': 'Congé annuel', 'date_debut': "03/07/2024", 'date_fin': "04/07/2024", 'jours_pris': 2}
+    manager.handle_conge_submission(form, is_modification=False)
+    report = manager.calculer_couverture(date(2024, 7, 1), date(2024, 7, 5))
+    assert report.par_grade['Infirmier'] == [0, 0, 1, 1, 0]
+    assert report.jours_critiques()[date(2024, 7, 4)] == ['Infirmier']
+
+    save_path = tmp_path / "couverture.csv"
+    export_coverage_to_csv(manager, str(save_path), date(2024, 7, 1), date(2024, 7, 5))
+    with open(save_path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert rows[0] == ["Date", "Total absents", "Infirmier", "Technicien", "Grades au-delà du seuil"]
+    assert rows[3][1:] == ["3", "1", "2", "Infirmier, Technicien"]
+
+
+def test_period_without_leave(db, manager):
+    assert CoverageEngine._sweep(date(2024, 1, 1), date(2024, 1, 5), []) == {}
+    db.ajouter_agent("Alami", "Sara", "P1", "Infirmier")
+    report = manager.calculer_couverture(date(2024, 1, 1), date(2024, 1, 5))
+    assert report.totaux == [0] * 5 and report.jours_critiques() == {}
@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+import logging
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+from db.instrumentation import QueryInstrumentation, normalize_sql
+
+
+def test_normalize_sql_groups_equivalent_statements():
+    assert normalize_sql("SELECT *  FROM conges\n WHERE id IN (1, 2, 3) AND statut = 'Actif'") == \
+        "SELECT * FROM conges WHERE id IN (?, ...) AND statut = ?"
+    assert normalize_sql("SELECT id FROM t WHERE id IN (?, ?)") == normalize_sql("SELECT id FROM t WHERE id IN (?,?,?)")
+    assert normalize_sql("SAVEPOINT sp_niveau_1") == "SAVEPOINT sp_niveau_1"
+
+
+def test_statements_are_counted_per_caller(db, tmp_path):
+    db.instrumentation = QueryInstrumentation(slow_threshold_ms=10_000)
+    db.ajouter_agent("Dupont", "Jean", "A1", "Technicien")
+    for _ in range(3): db.get_agents_count(term="dup")
+    db.get_conges(agent_id=1)
+
+    snapshot = db.instrumentation.snapshot()
+    by_sql = {s['sql']: s for s in snapshot['requetes']}
+    conges = next(s for sql, s in by_sql.items() if sql.startswith("SELECT id, agent_id, type_conge"))
+    assert conges['appels'] == 1 and conges['appelant'] == "test_statements_are_counted_per_caller"
+    # Le comptage est mis en cache : une seule requête COUNT pour trois appels.
+    assert sum(s['appels'] for sql, s in by_sql.items() if sql.startswith("SELECT COUNT(*)")) == 1
+
+    dump = db.instrumentation.dump_json(str(tmp_path / "diag" / "requetes.json"))
+    with open(dump, encoding="utf-8") as f:
+        assert json.load(f)['requetes']
+
+
+def test_slow_queries_are_logged_with_their_plan(db, caplog):
+    db.instrumentation = QueryInstrumentation(slow_threshold_ms=0)
+    with caplog.at_level(logging.WARNING, logger="conges.requetes_lentes"):
+        db.get_conges(agent_id=1)
+    slow = db.instrumentation.snapshot()['requetes_lentes']
+    assert any("idx_conges_agent_statut_dates" in " ".join(entry['plan']) for entry in slow)
+    assert "Requête lente" in caplog.text
+
+
+def test_bulk_and_transactional_statements_are_counted(db):
+    db.instrumentation = QueryInstrumentation(slow_threshold_ms=10_000)
+    ids = db.bulk_insert_agents([(f"Nom{i}", "Prenom", f"P{i}", "Technicien") for i in range(3)])
+    with db.transaction():
+        db.conn.execute("UPDATE agents SET grade = 'Ingénieur' WHERE id = ?", (ids[0],))
+    rows = db.conn.execute("SELECT id FROM agents ORDER BY id").fetchall()
+
+    by_sql = {s['sql']: s for s in db.instrumentation.snapshot()['requetes']}
+    insert = next(s for sql, s in by_sql.items() if sql.startswith("INSERT INTO agents"))
+    assert insert['lignes'] == 3
+    assert by_sql["UPDATE agents SET grade = ? WHERE id = ?"]['appels'] == 1
+    assert by_sql["SELECT id FROM agents ORDER BY id"]['lignes'] == len(rows) == 3
+    assert any(sql.startswith("SAVEPOINT") or sql.startswith("BEGIN") for sql in by_sql)
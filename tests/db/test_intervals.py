@@ -0,0 +1,60 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import random
+from datetime import date, timedelta
+import pytest
+from core.conges.intervals import AgentIntervals, LeaveInterval
+from db.models import Conge
+
+
+def test_agent_intervals_match_brute_force():
+    rng = random.Random(7)
+    origin = date(2024, 1, 1)
+    intervals = AgentIntervals()
+    reference = []
+    for conge_id in range(200):
+        debut = origin + timedelta(days=rng.randint(0, 360))
+        interval = LeaveInterval(debut, debut + timedelta(days=rng.choice([0, 2, 4, 30])), conge_id, 'Congé annuel')
+        intervals.add(interval); reference.append(interval)
+    for conge_id in range(0, 200, 3):
+        intervals.remove(conge_id)
+    reference = [i for i in reference if i.conge_id % 3]
+    for _ in range(300):
+        debut = origin + timedelta(days=rng.randint(-10, 370))
+        fin = debut + timedelta(days=rng.randint(0, 20))
+        expected = sorted(i for i in reference if i.debut <= fin and i.fin >= debut)
+        assert intervals.overlapping(debut, fin) == expected
+
+
+def test_index_follows_mutations_and_checks_imports(db, manager):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    db.bulk_upsert_soldes([(agent_id, 2024, 22.0, "Actif")])
+    form = {'agent_id': agent_id, 'type_conge': 'Congé annuel', 'date_debut': "01/07/2024", 'date_fin': "05/07/2024", 'jours_pris': 5}
+    assert manager.find_conflicting_leaves(agent_id, date(2024, 7, 3), date(2024, 7, 3)) == []
+    manager.handle_conge_submission(form, is_modification=False)
+    conge_id = db.get_conges(agent_id)[0].id
+    assert [c.conge_id for c in manager.find_conflicting_leaves(agent_id, date(2024, 7, 5), date(2024, 7, 8))] == [conge_id]
+    assert manager.find_conflicting_leaves(agent_id, date(2024, 7, 5), date(2024, 7, 8), exclude_id=conge_id) == []
+
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        with pytest.raises(ValueError, match="chevauchements"):
+            manager.importer_conges([Conge(None, agent_id, 'Congé annuel', None, None, date(2024, 8, 1), date(2024, 8, 2), 2),
+                                     Conge(None, agent_id, 'Congé annuel', None, None, date(2024, 8, 2), date(2024, 8, 2), 1),
+                                     Conge(None, agent_id, 'Congé de maladie', None, None, date(2024, 7, 4), date(2024, 7, 4), 1)])
+    finally:
+        db.conn.set_trace_callback(None)
+    assert statements == []
+
+    assert manager.importer_conges([Conge(None, agent_id, 'Congé annuel', None, None, date(2024, 8, 1), date(2024, 8, 2), 2)]) == 1
+    assert len(manager.find_conflicting_leaves(agent_id, date(2024, 7, 1), date(2024, 8, 31))) == 2
+    assert db.get_solde_resume(agent_id).total_actif == 15.0
+
+    manager.delete_conge(conge_id)
+    assert [c.debut for c in manager.find_conflicting_leaves(agent_id, date(2024, 7, 1), date(2024, 8, 31))] == [date(2024, 8, 1)]
@@ -0,0 +1,66 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+from datetime import date
+import pytest
+from core.conges.ledger import SoldeLedger
+from db.models import Conge
+
+
+def _soldes(db, agent_id):
+    return {annee: solde for _, annee, solde in db.get_soldes_actifs(agent_id)}
+
+
+def test_ledger_debits_fifo_and_credits_lifo(db):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    db.bulk_upsert_soldes([(agent_id, 2023, 5.0, "Actif"), (agent_id, 2024, 22.0, "Actif")])
+    ledger = SoldeLedger(db, 22.0)
+    ledger.debiter(agent_id, 8)
+    assert ledger.changes() and _soldes(db, agent_id) == {2023: 5.0, 2024: 22.0}
+    ledger.crediter(agent_id, 3)
+    ledger.flush()
+    assert _soldes(db, agent_id) == {2023: 0.0, 2024: 22.0}
+    assert db.get_solde_resume(agent_id).total_actif == 22.0
+    with pytest.raises(ValueError):
+        ledger.debiter(agent_id, 23)
+
+
+def _count_statements(db, action):
+    # Les instructions des triggers sont rapportées sous le texte de l'instruction qui les déclenche,
+    # et executemany une fois par ligne (paramètres développés) : on ne compte pas les répétitions
+    # consécutives d'une même instruction, reconnue à son verbe et à sa table.
+    statements = []
+    def trace(sql):
+        key = sql.split()[:3]
+        if not statements or statements[-1] != key: statements.append(key)
+    db.conn.set_trace_callback(trace)
+    try: action()
+    finally: db.conn.set_trace_callback(None)
+    return len(statements)
+
+
+def _replace_leaves(db, manager, ppr, nb_overlaps):
+    """Remplace 'nb_overlaps' congés d'une semaine consécutifs (du mercredi au mercredi) ; retourne le nombre de requêtes."""
+    agent_id = db.ajouter_agent("Alami", "Sara", ppr, "Ingénieur")
+    db.bulk_upsert_soldes([(agent_id, 2023, 4.0, "Actif"), (agent_id, 2024, 22.0 - 5 * nb_overlaps, "Actif")])
+    db.bulk_insert_conges([Conge(None, agent_id, 'Congé annuel', None, None, date(2024, 7, 1 + 7 * i), date(2024, 7, 5 + 7 * i), 5) for i in range(nb_overlaps)])
+    last_day = 3 + 7 * (nb_overlaps - 1)
+    overlaps = db.get_overlapping_leaves(agent_id, date(2024, 7, 3), date(2024, 7, last_day))
+    form = {'agent_id': agent_id, 'type_conge': 'Congé annuel', 'date_debut': "03/07/2024", 'date_fin': f"{last_day:02d}/07/2024", 'jours_pris': 4 + 5 * (nb_overlaps - 1)}
+
+    count = _count_statements(db, lambda: manager._split_or_replace_leaves(overlaps, form))
+
+    conges = sorted(db.get_conges(agent_id), key=lambda c: c.date_debut)
+    assert [(c.date_debut.day, c.date_fin.day, c.jours_pris) for c in conges] == [(1, 2, 2), (3, last_day, form['jours_pris']), (last_day + 1, last_day + 2, 2)]
+    # Restitution LIFO (le solde 2024 revient à 22), puis débit FIFO de 3 jours de plus qu'avant :
+    # le solde 2023 est épuisé en premier.
+    assert _soldes(db, agent_id) == {2023: 0.0, 2024: 23.0 - 5 * nb_overlaps}
+    return count
+
+
+def test_replace_leaves_uses_constant_queries(db, manager):
+    assert _replace_leaves(db, manager, "P1", 1) == _replace_leaves(db, manager, "P2", 4)
@@ -0,0 +1,50 @@
+import sys
+import os
+import gc
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+from core.constants import SoldeStatus
+from db.models import Conge
+
+NB_CONGES = 5000
+# Objet à __slots__ (~100 octets), pointeur de liste et entiers ; dates et libellés sont partagés.
+OCTETS_MAX_PAR_CONGE = 256
+
+
+def _seed_conges(db):
+    agent_id = db.ajouter_agent("Dupont", "Jean", "A1", "Technicien")
+    origine = date(2020, 1, 1)
+    db.bulk_insert_conges([
+        Conge(None, agent_id, "Congé annuel", "", None, (origine + timedelta(days=i % 700)).isoformat(),
+              (origine + timedelta(days=i % 700 + 2)).isoformat(), 3)
+        for i in range(NB_CONGES)])
+    return agent_id
+
+
+def test_loaded_conges_are_compact(db):
+    _seed_conges(db)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        conges = db.get_conges()
+        octets, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(conges) == NB_CONGES
+    assert not hasattr(conges[0], '__dict__')
+    assert octets / NB_CONGES < OCTETS_MAX_PAR_CONGE
+
+
+def test_row_factories_build_the_same_models(db):
+    agent_id = _seed_conges(db)
+    db.bulk_upsert_soldes([(agent_id, 2024, 12.5, "Expiré")])
+    conge = db.get_conges(agent_id)[0]
+    assert isinstance(conge.date_debut, datetime) and conge.justif == "" and conge.statut == "Actif"
+    agent = db.get_agent_by_id(agent_id)
+    assert (agent.nom, agent.prenom, agent.grade) == ("Dupont", "Jean", "Technicien")
+    assert agent.soldes_annuels[0].statut is SoldeStatus.EXPIRE and agent.soldes_annuels[0].solde == 12.5
@@ -0,0 +1,62 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import sqlite3
+import pytest
+
+
+def _soumettre(manager, agent_id, debut, fin, jours):
+    form = {'agent_id': agent_id, 'type_conge': 'Congé annuel', 'date_debut': debut, 'date_fin': fin, 'jours_pris': jours}
+    return manager.handle_conge_submission(form, is_modification=False)
+
+
+def _antidater(db, date_mouvement):
+    # Le journal est en ajout seul : pour simuler des mouvements passés, on suspend le trigger le temps du test.
+    with db.transaction() as conn:
+        conn.execute("DROP TRIGGER trg_mouvements_solde_no_update")
+        conn.execute("UPDATE mouvements_solde SET date_mouvement = ?", (date_mouvement,))
+
+
+def test_journal_records_every_balance_change(db, manager):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    db.bulk_upsert_soldes([(agent_id, 2023, 3.0, "Actif"), (agent_id, 2024, 22.0, "Actif")])
+    _soumettre(manager, agent_id, "01/07/2024", "05/07/2024", 5)
+    conge = db.get_conges(agent_id)[0]
+    manager.delete_conge(conge.id)
+    solde_2024 = next(s for s in db.get_agent_by_id(agent_id).soldes_annuels if s.annee == 2024)
+    manager.update_soldes_manuellement({solde_2024.id: 20.0})
+
+    mouvements = [(annee, str(type_mvt), delta, solde_apres, conge_id) for _, _, annee, type_mvt, delta, solde_apres, _, conge_id in reversed(db.get_mouvements_solde(agent_id))]
+    assert mouvements == [
+        (2023, "Initial", 3.0, 3.0, None), (2024, "Initial", 22.0, 22.0, None),
+        (2023, "Débit", -3.0, 0.0, conge.id), (2024, "Débit", -2.0, 20.0, conge.id),
+        (2024, "Crédit", 2.0, 22.0, conge.id), (2023, "Crédit", 3.0, 3.0, conge.id),
+        (2024, "Correction", -2.0, 20.0, None),
+    ]
+    with pytest.raises(sqlite3.DatabaseError):
+        db.execute_query("DELETE FROM mouvements_solde")
+
+
+def test_balance_at_date_from_checkpoint_and_tail(db, manager):
+    agent_id = db.ajouter_agent("Alami", "Sara", "P1", "Ingénieur")
+    db.bulk_upsert_soldes([(agent_id, 2024, 22.0, "Actif")])
+    _soumettre(manager, agent_id, "01/07/2024", "05/07/2024", 5)
+    _antidater(db, "2024-07-01 09:00:00")
+    assert db.creer_point_controle("2024-08-01 00:00:00") == 1
+
+    _soumettre(manager, agent_id, "01/09/2024", "03/09/2024", 3)
+    solde_id = db.get_agent_by_id(agent_id).soldes_annuels[0].id
+    db.apurer_soldes_by_ids([solde_id])
+    with db.transaction() as conn:
+        conn.execute("UPDATE mouvements_solde SET date_mouvement = '2024-09-01 09:00:00' WHERE type = 'Débit' AND date_mouvement > '2024-08'")
+
+    def solde_au(date_sql):
+        return [(s.annee, s.solde) for s in db.get_soldes_a_date(agent_id, date_sql)]
+    assert solde_au("2024-06-30") == []
+    assert solde_au("2024-07-15") == [(2024, 17.0)]
+    assert solde_au("2024-09-01") == [(2024, 14.0)]
+    assert solde_au("2099-01-01") == [(2024, 0.0)]
@@ -0,0 +1,56 @@
+import sys
+import os
+from datetime import date, datetime
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+import pytest
+from db.models import Conge
+
+# Tables qui ne doivent jamais être parcourues intégralement par les recherches de congés.
+TABLES_INDEXEES = ("conges", "jours_feries", "jours_feries_personnalises")
+
+
+def _captured_statements(db, operation):
+    """Exécute 'operation' et retourne les requêtes SQL (paramètres déjà substitués) envoyées à SQLite."""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        operation()
+    finally:
+        db.conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def _full_scans(db, sql):
+    plan = db.conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[3] for row in plan
+            if any(row[3].startswith(f"SCAN {table}") for table in TABLES_INDEXEES)]
+
+
+@pytest.mark.parametrize("operation", [
+    lambda db: db.get_overlapping_leaves(1, date(2024, 7, 1), date(2024, 7, 31)),
+    lambda db: db.get_overlapping_leaves(1, date(2024, 7, 1), date(2024, 7, 31), 5),
+    lambda db: db.get_conges(agent_id=1),
+    lambda db: db.get_agents_on_leave_today(),
+    lambda db: db.get_holidays_for_year(2024),
+    lambda db: db.get_holidays_between("2024-01-01", "2024-12-31"),
+], ids=["chevauchements", "chevauchements_exclusion", "conges_agent", "en_conge_aujourdhui",
+        "feries_personnalises_annee", "feries_plage"])
+def test_leave_queries_use_indexes(db, operation):
+    statements = _captured_statements(db, lambda: operation(db))
+    assert statements, "Aucune requête SELECT capturée"
+    for sql in statements:
+        assert _full_scans(db, sql) == [], f"Parcours complet de table pour : {sql}"
+
+
+def test_leave_dates_are_stored_as_plain_dates(db):
+    agent_id = db.ajouter_agent("Dupont", "Jean", "A1", "Technicien")
+    today = date.today().strftime('%Y-%m-%d')
+    db.ajouter_conge(Conge(None, agent_id, "Congé annuel", "", None, today, today, 1))
+    assert db.execute_query("SELECT date_debut, date_fin FROM conges", fetch="one") == (today, today)
+    # Un congé d'un seul jour doit être vu par les recherches par plage, bornes incluses.
+    assert len(db.get_overlapping_leaves(agent_id, datetime.now(), datetime.now())) == 1
+    assert [row[2] for row in db.get_agents_on_leave_today()] == ["A1"]
@@ -0,0 +1,35 @@
+import sys
+import os
+
+# --- Configuration pour permettre l'importation depuis le dossier racine ---
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+# ---------------------------------------------------------------------------
+
+
+def _summary(db):
+    return set(db.execute_query("SELECT agent_id, solde_n2, solde_n1, solde_n, total_actif FROM agent_solde_summary", fetch="all"))
+
+
+def _recomputed(db):
+    return set(db.execute_query("SELECT agent_id, solde_n2, solde_n1, solde_n, total_actif FROM v_agent_solde_summary", fetch="all"))
+
+
+def test_summary_follows_solde_writes_and_rollover(db):
+    db.set_annee_exercice(2024)
+    a, b = db.bulk_insert_agents([("Alami", "Sara", "P1", "Ingénieur"), ("Bennani", "Omar", "P2", "Technicien")])
+    assert db.get_solde_resume(a).total_actif == 0
+    ids = db.bulk_upsert_soldes([(a, 2022, 2.0, "Actif"), (a, 2023, 5.0, "Actif"), (a, 2024, 22.0, "Actif"), (b, 2024, 10.0, "Actif")])
+    resume = db.get_solde_resume(a)
+    assert (resume.solde_n2, resume.solde_n1, resume.solde_n, resume.total_actif) == (2.0, 5.0, 22.0, 29.0)
+
+    db.bulk_update_soldes([(ids[2], 20.0)])
+    db.execute_query("DELETE FROM soldes_annuels WHERE id = ?", (ids[1],))
+    assert db.get_solde_resume(a).total_actif == 22.0
+
+    db.glissement_annuel(2025, 2023, 22.0)
+    resume = db.get_solde_resume(a)
+    assert (resume.solde_n2, resume.solde_n1, resume.solde_n, resume.total_actif) == (0.0, 20.0, 22.0, 44.0)
+    assert [agent.id for agent in db.get_agents_with_resume(order_by="total_actif")] == [a, b]
+
+    db.supprimer_agent(b)
+    assert _summary(db) == _recomputed(db)
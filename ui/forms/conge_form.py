@@ -4,6 +4,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
+import re
 import sqlite3
 import logging
 from datetime import datetime
@@ -17,6 +18,9 @@ from ui.widgets.date_picker import DatePickerWindow
 from utils.date_utils import validate_date, format_date_for_display, calculate_reprise_date
 from utils.config_loader import CONFIG
 
+# Saisie complète JJ/MM/AAAA : en cours de frappe, "12" serait lu comme le 12 du mois courant.
+_DATE_SAISIE_COMPLETE = re.compile(r"\d{1,2}/\d{1,2}/\d{4}")
+
 class CongeForm(tk.Toplevel):
     STRATEGIES = {
         "Congé annuel": CongeAnnuelStrategy(),
@@ -25,6 +29,8 @@ class CongeForm(tk.Toplevel):
         "Congé de maternité": CongeMaterniteStrategy(),
         "Congé de paternité": CongePaterniteStrategy(),
     }
+    # Nombre maximal d'agents proposés dans la liste des intérimaires pour une saisie donnée.
+    INTERIM_SUGGESTIONS = 50
 
     def __init__(self, parent, manager, agent_id, conge_id=None):
         super().__init__(parent)
@@ -80,6 +86,9 @@ class CongeForm(tk.Toplevel):
 
         form_frame = ttk.Frame(main_frame)
         form_frame.pack(fill="x")
+        # Avertissement de chevauchement, mis à jour pendant la saisie des dates.
+        self.conflict_label = ttk.Label(main_frame, text="", foreground="red", wraplength=400, justify="left")
+        self.conflict_label.pack(fill="x")
         
         labels = ["Type de congé:", "Date de début:", "Durée (jours):", "Date de fin:", "Date de reprise:", "Justification:", "Intérimaire:"]
         for i, text in enumerate(labels):
@@ -105,8 +114,10 @@ class CongeForm(tk.Toplevel):
         self.justif_entry = ttk.Entry(form_frame, width=40)
         self.justif_entry.grid(row=5, column=1, columnspan=2, sticky="ew")
 
-        self.interim_combo = ttk.Combobox(form_frame, textvariable=self.interim_var, state="readonly", width=38)
+        # Combobox éditable : la saisie filtre les agents via l'index plein texte.
+        self.interim_combo = ttk.Combobox(form_frame, textvariable=self.interim_var, width=38)
         self.interim_combo.grid(row=6, column=1, columnspan=2, sticky="ew")
+        self.interim_combo.bind("<KeyRelease>", self._filter_interim_agents)
 
         self.cert_frame = ttk.LabelFrame(main_frame, text="Certificat Médical", padding=10)
         self.cert_file_label = ttk.Label(self.cert_frame, text="Aucun fichier attaché.", anchor="w", wraplength=350)
@@ -129,6 +140,8 @@ class CongeForm(tk.Toplevel):
         self.days_spinbox.bind("<Return>", lambda e: self.after(100, self._update_end_date_from_days))
         self.end_date_entry.bind("<FocusOut>", lambda e: self.after(100, self._update_days_from_dates))
         self.end_date_entry.bind("<<DatePicked>>", lambda e: self.after(100, self._update_days_from_dates))
+        self.start_date_entry.bind("<KeyRelease>", lambda e: self._check_conflicts())
+        self.end_date_entry.bind("<KeyRelease>", lambda e: self._check_conflicts())
 
     def _on_type_change(self, event=None):
         type_conge = self.type_var.get()
@@ -180,6 +193,25 @@ class CongeForm(tk.Toplevel):
             if reprise:
                 self.reprise_date_entry.insert(0, reprise.strftime("%d/%m/%Y"))
         self.reprise_date_entry.config(state="readonly")
+        self._check_conflicts()
+
+    def _check_conflicts(self):
+        """Signale les congés existants que les dates saisies recouvrent (index en mémoire : aucune requête)."""
+        saisies = (self.start_date_entry.get().strip(), self.end_date_entry.get().strip())
+        start_date = end_date = None
+        if all(_DATE_SAISIE_COMPLETE.fullmatch(saisie) for saisie in saisies):
+            start_date, end_date = validate_date(saisies[0]), validate_date(saisies[1])
+        conflicts = []
+        if start_date and end_date and end_date >= start_date:
+            conflicts = self.manager.find_conflicting_leaves(self.agent_id, start_date, end_date, exclude_id=self.conge_id)
+        if not conflicts:
+            self.conflict_label.config(text=""); return
+        details = "\n".join(f"- {c.type_conge} du {c.debut:%d/%m/%Y} au {c.fin:%d/%m/%Y}" for c in conflicts[:3])
+        if len(conflicts) > 3: details += f"\n- ... et {len(conflicts) - 3} autre(s)"
+        if all(c.type_conge == 'Congé annuel' for c in conflicts):
+            self.conflict_label.config(text=f"⚠ Chevauche (sera proposé au remplacement) :\n{details}")
+        else:
+            self.conflict_label.config(text=f"⚠ Chevauchement invalide :\n{details}")
 
     def _populate_data(self):
         conge = self.manager.get_conge_by_id(self.conge_id)
@@ -193,14 +225,24 @@ class CongeForm(tk.Toplevel):
         self.days_var.set(str(conge.jours_pris))
         self.after(100, self._update_reprise_date)
         if conge.interim_id:
-            for name, id_ in self.interim_agents.items():
-                if id_ == conge.interim_id:
-                    self.interim_var.set(name); break
+            interim = self.manager.get_agent_ref(conge.interim_id)
+            if interim:
+                self.interim_agents[str(interim)] = interim.id
+                self.interim_var.set(str(interim))
 
-    def _load_interim_agents(self):
-        agents = self.manager.get_all_agents(exclude_id=self.agent_id)
-        self.interim_agents = {f"{a.nom} {a.prenom} (PPR: {a.ppr})": a.id for a in agents}
-        self.interim_combo['values'] = [""] + sorted(list(self.interim_agents.keys()))
+    def _load_interim_agents(self, term=None):
+        # Les libellés déjà connus sont conservés pour que la sélection courante reste résolue.
+        if not hasattr(self, 'interim_agents'): self.interim_agents = {}
+        agents = self.manager.get_agent_refs(term=term, exclude_id=self.agent_id, limit=self.INTERIM_SUGGESTIONS)
+        suggestions = {str(a): a.id for a in agents}
+        self.interim_agents.update(suggestions)
+        self.interim_combo['values'] = [""] + sorted(suggestions.keys())
+
+    def _filter_interim_agents(self, event=None):
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Escape", "Tab"): return
+        text = self.interim_var.get().strip()
+        if text in self.interim_agents: return
+        self._load_interim_agents(term=text or None)
 
     def _attach_certificate(self):
         filetypes = CONFIG.get('ui', {}).get('certificat_file_types', [("Tous les fichiers", "*.*")])
@@ -214,6 +256,13 @@ class CongeForm(tk.Toplevel):
             self.cert_path_var.set("")
             self.current_strategy._update_certificat_display(self)
     
+    def _selected_interim_id(self):
+        label = self.interim_var.get().strip()
+        if not label: return None
+        if label not in self.interim_agents:
+            raise ValueError("Veuillez choisir l'intérimaire dans la liste proposée.")
+        return self.interim_agents[label]
+
     def _on_validate(self):
         try:
             # On prépare le dictionnaire de données pour le manager
@@ -222,7 +271,7 @@ class CongeForm(tk.Toplevel):
                 'conge_id': self.conge_id, 'type_conge': self.type_var.get(),
                 'date_debut': self.start_date_entry.get(), 'date_fin': self.end_date_entry.get(),
                 'jours_pris': int(self.days_var.get()), 'justif': self.justif_entry.get().strip(),
-                'interim_id': self.interim_agents.get(self.interim_var.get()),
+                'interim_id': self._selected_interim_id(),
                 'cert_path': self.cert_path_var.get(), 'original_cert_path': self.original_cert_path,
                 'annee_exercice': self.annee_exercice # On transmet l'année d'exercice
             }
@@ -4,7 +4,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from collections import defaultdict, Counter
-from dateutil import parser
 import logging
 import os
 import sqlite3
@@ -12,12 +11,11 @@ import threading
 from datetime import datetime
 
 from core.conges.manager import CongeManager
-from core.constants import SoldeStatus
 from ui.forms.agent_form import AgentForm
 from ui.forms.conge_form import CongeForm
-from ui.widgets.secondary_windows import AdminWindow, JustificatifsWindow
+from ui.widgets.secondary_windows import AdminWindow, CoverageWindow, JustificatifsWindow
 from utils.file_utils import export_agents_to_excel, export_all_conges_to_excel, import_agents_from_excel
-from utils.date_utils import format_date_for_display, format_date_for_display_short, calculate_reprise_date
+from utils.date_utils import format_date_for_display, format_date_for_display_short, calculate_reprise_date, parse_sql_date
 from utils.config_loader import CONFIG
 
 def treeview_sort_column(tv, col, reverse):
@@ -44,6 +42,9 @@ class MainWindow(tk.Tk):
         self.current_page = 1
         self.items_per_page = 50
         self.total_pages = 1
+        # Pagination par clé : clé (nom, prenom, id) de départ de chaque page visitée (None = début).
+        self.page_keys = [None]
+        self.next_page_key = None
         
         # Ajout pour la gestion du redémarrage
         self.restart_on_close = False
@@ -60,6 +61,18 @@ class MainWindow(tk.Tk):
         self.restart_on_close = True
         self.destroy()
 
+    def on_database_restored(self):
+        """Recharge la fenêtre principale et les fenêtres ouvertes après une restauration à chaud."""
+        self.page_keys = [None]
+        self.refresh_all()
+        pending = list(self.winfo_children())
+        while pending:
+            widget = pending.pop()
+            if isinstance(widget, tk.Toplevel):
+                refresh = getattr(widget, 'refresh_after_restore', None)
+                if refresh: refresh()
+                pending.extend(widget.winfo_children())
+
     def set_status(self, message):
         self.status_var.set(message)
         self.update_idletasks()
@@ -117,6 +130,7 @@ class MainWindow(tk.Tk):
         self.global_actions_frame = ttk.Frame(stats_frame); self.global_actions_frame.pack(fill=tk.X, padx=5, pady=(5, 5))
         ttk.Button(self.global_actions_frame, text="Actualiser", command=self.refresh_stats).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
         ttk.Button(self.global_actions_frame, text="Suivi Justificatifs", command=self.open_justificatifs_suivi).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ttk.Button(self.global_actions_frame, text="Couverture des Effectifs", command=self.open_coverage_window).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
         ttk.Button(self.global_actions_frame, text="Administration", command=self.open_admin_window).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
         ttk.Button(self.global_actions_frame, text="Exporter Tous les Congés", command=self.export_conges).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
         
@@ -182,16 +196,13 @@ class MainWindow(tk.Tk):
         term = self.search_var.get().strip().lower() or None; 
         total_items = self.manager.get_agents_count(term); 
         self.total_pages = max(1, (total_items + self.items_per_page - 1) // self.items_per_page); 
-        self.current_page = min(self.current_page, self.total_pages); 
-        offset = (self.current_page - 1) * self.items_per_page; 
-        agents = self.manager.get_all_agents(term=term, limit=self.items_per_page, offset=offset); 
+        del self.page_keys[self.total_pages:]; self.current_page = len(self.page_keys); 
+        agents = self.manager.get_agents_page(term=term, after=self.page_keys[-1], limit=self.items_per_page); 
+        self.next_page_key = (agents[-1].nom, agents[-1].prenom, agents[-1].id) if agents else None; 
         selected_item_id = None
-        an_n, an_n1, an_n2 = self.annee_exercice, self.annee_exercice - 1, self.annee_exercice - 2
         for agent in agents:
-            soldes_par_annee = {s.annee: s.solde for s in agent.soldes_annuels if s.statut == SoldeStatus.ACTIF}
-            solde_n2 = soldes_par_annee.get(an_n2, 0.0); solde_n1 = soldes_par_annee.get(an_n1, 0.0); solde_n  = soldes_par_annee.get(an_n, 0.0)
-            solde_total = solde_n2 + solde_n1 + solde_n
-            agent_values = (agent.id, agent.nom, agent.prenom, agent.ppr, agent.grade, f"{solde_n2:.1f} j", f"{solde_n1:.1f} j", f"{solde_n:.1f} j", f"{solde_total:.1f} j")
+            r = agent.resume_soldes
+            agent_values = (agent.id, agent.nom, agent.prenom, agent.ppr, agent.grade, f"{r.solde_n2:.1f} j", f"{r.solde_n1:.1f} j", f"{r.solde_n:.1f} j", f"{r.total_actif:.1f} j")
             item_id = self.list_agents.insert("", "end", values=agent_values)
             if agent.id == agent_to_select_id: selected_item_id = item_id
         if selected_item_id: self.list_agents.selection_set(selected_item_id); self.list_agents.focus(selected_item_id)
@@ -210,7 +221,7 @@ class MainWindow(tk.Tk):
             total_jours = sum(c.jours_pris for c in conges_par_annee[annee] if c.type_conge == 'Congé annuel' and c.statut == 'Actif'); summary_id = self.list_conges.insert("", "end", values=("", "", f"📅 ANNÉE {annee}", "", "", "", total_jours, f"{total_jours} jours pris", ""), tags=("summary",), open=True); holidays_set = self.manager.get_holidays_set_for_period(annee, annee + 1)
             for conge in sorted(conges_par_annee[annee], key=lambda c: c.date_debut):
                 cert_status = "✅ Justifié" if self.manager.get_certificat_for_conge(conge.id) else "❌ Manquant" if conge.type_conge == 'Congé de maladie' else ""; interim_info = ""
-                if conge.interim_id: interim = self.manager.get_agent_by_id(conge.interim_id); interim_info = f"{interim.nom} {interim.prenom}" if interim else "Agent Supprimé"
+                if conge.interim_id: interim = self.manager.get_agent_ref(conge.interim_id); interim_info = f"{interim.nom} {interim.prenom}" if interim else "Agent Supprimé"
                 tags = ('annule',) if conge.statut == 'Annulé' else (); reprise_date = calculate_reprise_date(conge.date_fin, holidays_set); reprise_date_str = format_date_for_display_short(reprise_date) if reprise_date else ""
                 self.list_conges.insert(summary_id, "end", values=(conge.id, cert_status, conge.type_conge, format_date_for_display_short(conge.date_debut), format_date_for_display_short(conge.date_fin), reprise_date_str, conge.jours_pris, conge.justif or "", interim_info), tags=tags)
 
@@ -220,21 +231,21 @@ class MainWindow(tk.Tk):
             holidays_set = self.manager.get_holidays_set_for_period(self.annee_exercice, self.annee_exercice + 1)
             agents_on_leave_data = self.manager.get_agents_on_leave_today()
             for nom, prenom, ppr, type_conge, date_fin_str in agents_on_leave_data:
-                date_fin = parser.parse(date_fin_str).date()
+                date_fin = parse_sql_date(date_fin_str).date()
                 reprise_date = calculate_reprise_date(date_fin, holidays_set)
                 reprise_date_display = format_date_for_display(reprise_date)
                 self.list_on_leave.insert("", "end", values=(f"{nom} {prenom}", ppr, type_conge, reprise_date_display))
         except sqlite3.Error as e:
             self.list_on_leave.insert("", "end", values=(f"Erreur DB: {e}", "", "", ""))
 
-    def search_agents(self): self.current_page = 1; self.refresh_agents_list()
+    def search_agents(self): self.page_keys = [None]; self.refresh_agents_list()
     def on_agent_select(self, event=None):
         if self.get_selected_agent_id(): self.refresh_conges_list(self.get_selected_agent_id())
         else: self.list_conges.delete(*self.list_conges.get_children())
     def prev_page(self):
-        if self.current_page > 1: self.current_page -= 1; self.refresh_agents_list(self.get_selected_agent_id())
+        if len(self.page_keys) > 1: self.page_keys.pop(); self.refresh_agents_list(self.get_selected_agent_id())
     def next_page(self):
-        if self.current_page < self.total_pages: self.current_page += 1; self.refresh_agents_list(self.get_selected_agent_id())
+        if self.current_page < self.total_pages and self.next_page_key: self.page_keys.append(self.next_page_key); self.refresh_agents_list(self.get_selected_agent_id())
     def on_conge_double_click(self):
         conge_id = self.get_selected_conge_id();
         if not conge_id: return
@@ -247,21 +258,19 @@ class MainWindow(tk.Tk):
             else: messagebox.showinfo("Justificatif", "Aucun justificatif n'est attaché à ce congé.", parent=self)
         else: self.modify_selected_conge()
     def open_justificatifs_suivi(self): JustificatifsWindow(self, self.manager)
+    def open_coverage_window(self): CoverageWindow(self, self.manager)
     def export_agents(self):
         save_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Fichiers Excel", "*.xlsx")], title="Exporter la liste des agents", initialfile=f"Export_Agents_{datetime.now().strftime('%Y-%m-%d')}.xlsx")
         if not save_path: return
-        db_path = self.manager.db.db_file
-        self._run_long_task(lambda: export_agents_to_excel(db_path, save_path), self._on_task_complete, "Exportation des agents en cours...")
+        self._run_long_task(lambda: export_agents_to_excel(self.manager, save_path), self._on_task_complete, "Exportation des agents en cours...")
     def export_conges(self):
         save_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Fichiers Excel", "*.xlsx")], title="Exporter tous les congés", initialfile=f"Export_Conges_Total_{datetime.now().strftime('%Y-%m-%d')}.xlsx")
         if not save_path: return
-        db_path = self.manager.db.db_file
-        self._run_long_task(lambda: export_all_conges_to_excel(db_path, save_path), self._on_task_complete, "Exportation de tous les congés en cours...")
+        self._run_long_task(lambda: export_all_conges_to_excel(self.manager, save_path), self._on_task_complete, "Exportation de tous les congés en cours...")
     def import_agents(self):
         source_path = filedialog.askopenfilename(title="Sélectionner un fichier Excel à importer", filetypes=[("Fichiers Excel", "*.xlsx")])
         if not source_path: return
-        db_path = self.manager.db.db_file
-        self._run_long_task(lambda: import_agents_from_excel(db_path, source_path), self._on_import_complete, "Importation des agents depuis Excel en cours...")
+        self._run_long_task(lambda: import_agents_from_excel(self.manager, source_path), self._on_import_complete, "Importation des agents depuis Excel en cours...")
     def _run_long_task(self, task_lambda, on_complete, status_message):
         self.set_status(status_message); self.config(cursor="watch"); self._toggle_buttons_state("disabled"); result_container = []
         def task_wrapper():
@@ -2,17 +2,16 @@
 # Version finale avec simplification du texte pour la suppression des jours fériés.
 
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-from datetime import datetime
-import holidays
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from datetime import datetime, timedelta
 import sqlite3
 import threading
 import os
-import shutil
 
 from ui.widgets.date_picker import DatePickerWindow
-from utils.date_utils import validate_date, format_date_for_display
+from utils.date_utils import validate_date, parse_sql_date, format_date_for_display
 from utils.config_loader import CONFIG
+from utils.file_utils import export_coverage_to_csv
 
 class EditHolidayWindow(tk.Toplevel):
     """
@@ -63,9 +62,55 @@ class EditHolidayWindow(tk.Toplevel):
         self.callback(self.original_date_str, new_date_obj, new_name)
         self.destroy()
 
+class BackupProgressWindow(tk.Toplevel):
+    """
+    Exécute une sauvegarde (ou une restauration) dans un thread de travail en affichant son avancement.
+    'task' reçoit le callback de progression (pages_copiees, pages_totales) ; 'on_complete' reçoit
+    le résultat de la tâche, ou l'exception levée, une fois de retour dans le thread Tk.
+    """
+    def __init__(self, parent, title, task, on_complete):
+        super().__init__(parent)
+        self.on_complete = on_complete
+        self._progress = [0, 0]
+        self._result = []
+
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(parent)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        frame = ttk.Frame(self, padding=20)
+        frame.pack(fill="both", expand=True)
+        self.status_label = ttk.Label(frame, text="Préparation...")
+        self.status_label.pack(fill="x", pady=(0, 10))
+        self.progressbar = ttk.Progressbar(frame, length=350, mode="determinate")
+        self.progressbar.pack(fill="x")
+
+        def progress(done, total): self._progress[:] = [done, total]
+        def task_wrapper():
+            try: self._result.append(task(progress))
+            except Exception as e: self._result.append(e)
+        self._thread = threading.Thread(target=task_wrapper, daemon=True)
+        self._thread.start()
+        self._poll()
+
+    def _poll(self):
+        done, total = self._progress
+        if total:
+            self.progressbar.configure(maximum=total, value=done)
+            self.status_label.configure(text=f"Progression : {done} / {total}")
+        if self._thread.is_alive():
+            self.after(100, self._poll)
+            return
+        self.grab_release()
+        self.destroy()
+        self.on_complete(self._result[0] if self._result else None)
+
 class BackupWindow(tk.Toplevel):
     """
-    Fenêtre de gestion des sauvegardes et de la restauration.
+    Fenêtre de gestion des sauvegardes et de la restauration : instantanés incrémentaux du magasin
+    de sauvegardes, ainsi que les anciennes copies complètes (.db) encore présentes dans 'backups'.
     """
     def __init__(self, parent, manager, main_app_instance):
         super().__init__(parent)
@@ -74,9 +119,11 @@ class BackupWindow(tk.Toplevel):
         self.db_path = self.manager.db.get_db_path()
         self.base_dir = os.path.dirname(self.db_path)
         self.backups_dir = os.path.join(self.base_dir, "backups")
+        # iid de l'arbre -> ('instantane', id) ou ('fichier', chemin)
+        self._entries = {}
 
         self.title("Gérer les Sauvegardes et Restaurer")
-        self.geometry("700x400")
+        self.geometry("800x400")
         self.grab_set()
         self.transient(parent)
 
@@ -90,14 +137,16 @@ class BackupWindow(tk.Toplevel):
         list_frame = ttk.LabelFrame(main_frame, text="Sauvegardes Disponibles", padding=10)
         list_frame.pack(fill="both", expand=True)
         
-        cols = ("Fichier", "Date de création", "Taille")
+        cols = ("Sauvegarde", "Date de création", "Taille", "Stockage")
         self.tree = ttk.Treeview(list_frame, columns=cols, show="headings")
-        self.tree.heading("Fichier", text="Nom du Fichier")
+        self.tree.heading("Sauvegarde", text="Sauvegarde")
         self.tree.heading("Date de création", text="Date de création")
         self.tree.heading("Taille", text="Taille")
-        self.tree.column("Fichier", width=350)
+        self.tree.heading("Stockage", text="Écrit à la création")
+        self.tree.column("Sauvegarde", width=300)
         self.tree.column("Date de création", width=150, anchor="center")
-        self.tree.column("Taille", width=100, anchor="e")
+        self.tree.column("Taille", width=90, anchor="e")
+        self.tree.column("Stockage", width=200, anchor="e")
         self.tree.pack(fill="both", expand=True)
 
         btn_frame = ttk.Frame(main_frame, padding=(0, 10))
@@ -106,14 +155,27 @@ class BackupWindow(tk.Toplevel):
         ttk.Button(btn_frame, text="Fermer", command=self.destroy).pack(side="right")
         ttk.Button(btn_frame, text="Restaurer la version sélectionnée", command=self._run_restore).pack(side="right", padx=10)
         ttk.Button(btn_frame, text="Supprimer la sauvegarde", command=self._delete_backup).pack(side="left")
+        ttk.Button(btn_frame, text="Créer une sauvegarde maintenant", command=self._create_backup).pack(side="left", padx=10)
+
+    @staticmethod
+    def _format_size(size):
+        return f"{size / 1024:.1f} KB" if size < 1024*1024 else f"{size / (1024*1024):.1f} MB"
 
     def _populate_backups(self):
         for row in self.tree.get_children():
             self.tree.delete(row)
-        
+        self._entries.clear()
+
+        for manifest in self.manager.lister_sauvegardes():
+            date_str = datetime.strptime(manifest['cree_le'], '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M:%S')
+            written = f"{manifest['blocs_nouveaux']}/{len(manifest['blocs'])} blocs ({self._format_size(manifest['octets_ecrits'])})"
+            iid = self.tree.insert("", "end", values=(manifest['id'], date_str, self._format_size(manifest['taille']), written))
+            self._entries[iid] = ('instantane', manifest['id'])
+
         if not os.path.exists(self.backups_dir):
             return
 
+        # Anciennes sauvegardes : copies complètes du fichier de base.
         backups = []
         for filename in os.listdir(self.backups_dir):
             if filename.endswith((".db", ".sqlite3")):
@@ -129,49 +191,64 @@ class BackupWindow(tk.Toplevel):
         
         for filename, mtime, size in backups:
             date_str = datetime.fromtimestamp(mtime).strftime('%d/%m/%Y %H:%M:%S')
-            size_str = f"{size / 1024:.1f} KB" if size < 1024*1024 else f"{size / (1024*1024):.1f} MB"
-            self.tree.insert("", "end", values=(filename, date_str, size_str))
+            iid = self.tree.insert("", "end", values=(filename, date_str, self._format_size(size), "Copie complète"))
+            self._entries[iid] = ('fichier', os.path.join(self.backups_dir, filename))
 
-    def _get_selected_backup_path(self):
+    def _get_selected_backup(self):
         selection = self.tree.selection()
         if not selection:
             messagebox.showwarning("Aucune sélection", "Veuillez sélectionner une sauvegarde dans la liste.", parent=self)
             return None
-        
-        filename = self.tree.item(selection[0], "values")[0]
-        return os.path.join(self.backups_dir, filename)
+        return self._entries[selection[0]]
 
     def _delete_backup(self):
-        backup_path = self._get_selected_backup_path()
-        if not backup_path:
+        selected = self._get_selected_backup()
+        if not selected:
             return
+        kind, target = selected
 
-        if messagebox.askyesno("Confirmation", f"Êtes-vous sûr de vouloir supprimer définitivement le fichier de sauvegarde suivant ?\n\n{os.path.basename(backup_path)}", parent=self):
+        if messagebox.askyesno("Confirmation", f"Êtes-vous sûr de vouloir supprimer définitivement la sauvegarde suivante ?\n\n{os.path.basename(target)}", parent=self):
             try:
-                os.remove(backup_path)
+                if kind == 'instantane': self.manager.supprimer_sauvegarde(target)
+                else: os.remove(target)
                 messagebox.showinfo("Succès", "La sauvegarde a été supprimée.", parent=self)
                 self._populate_backups()
             except OSError as e:
-                messagebox.showerror("Erreur", f"Impossible de supprimer le fichier : {e}", parent=self)
+                messagebox.showerror("Erreur", f"Impossible de supprimer la sauvegarde : {e}", parent=self)
     
+    def _create_backup(self):
+        BackupProgressWindow(self, "Sauvegarde en cours", lambda progress: self.manager.creer_sauvegarde(progress=progress), self._on_backup_complete)
+
+    def _on_backup_complete(self, result):
+        self.grab_set()
+        if isinstance(result, Exception):
+            messagebox.showerror("Échec de la Sauvegarde", f"La sauvegarde a échoué : {result}", parent=self)
+            return
+        self._populate_backups()
+        messagebox.showinfo("Succès", f"Instantané créé : {result['id']}\n{result['blocs_nouveaux']} bloc(s) modifié(s) sur {len(result['blocs'])} écrit(s) ({self._format_size(result['octets_ecrits'])}).", parent=self)
+
     def _run_restore(self):
-        backup_path = self._get_selected_backup_path()
-        if not backup_path:
+        selected = self._get_selected_backup()
+        if not selected:
             return
+        kind, target = selected
         
         msg = ("Êtes-vous absolument certain de vouloir restaurer cette version ?\n\n"
                "ATTENTION : Toutes les données actuelles seront PERDUES et remplacées par les données de la sauvegarde. "
                "Cette action est IRRÉVERSIBLE.")
         
         if messagebox.askyesno("Confirmation de Restauration", msg, icon='warning', parent=self):
-            try:
-                self.manager.db.close()
-                shutil.copy2(backup_path, self.db_path)
-                messagebox.showinfo("Restauration Réussie", "La restauration a été effectuée avec succès.\n\nL'application va maintenant redémarrer pour appliquer les changements.", parent=self)
+            restore = self.manager.restaurer_sauvegarde if kind == 'instantane' else self.manager.restaurer_fichier
+            BackupProgressWindow(self, "Restauration en cours", lambda progress: restore(target, progress=progress), self._on_restore_complete)
+
+    def _on_restore_complete(self, result):
+        self.grab_set()
+        if isinstance(result, Exception):
+            if messagebox.askyesno("Erreur Critique", f"La restauration a échoué : {result}\n\nL'application risque d'être instable. Voulez-vous la redémarrer maintenant ?", icon='error', parent=self):
                 self.main_app.trigger_restart()
-            except Exception as e:
-                messagebox.showerror("Erreur Critique", f"La restauration a échoué : {e}\n\nL'application risque d'être instable. Veuillez la redémarrer.", parent=self)
-                self.destroy()
+            return
+        self.main_app.on_database_restored()
+        messagebox.showinfo("Restauration Réussie", "La restauration a été effectuée avec succès.\n\nLes données affichées ont été rechargées.", parent=self)
 
 class AdminWindow(tk.Toplevel):
     def __init__(self, parent, conge_manager):
@@ -190,29 +267,40 @@ class AdminWindow(tk.Toplevel):
         self._create_widgets()
         
     def _create_widgets(self):
-        notebook = ttk.Notebook(self)
+        self.notebook = notebook = ttk.Notebook(self)
         notebook.pack(fill="both", expand=True, padx=10, pady=10)
 
         tab_gestion = ttk.Frame(notebook)
         tab_soldes = ttk.Frame(notebook)
         tab_feries = ttk.Frame(notebook)
+        tab_diagnostics = ttk.Frame(notebook)
         
         notebook.add(tab_gestion, text=" Gestion Annuelle ")
         notebook.add(tab_soldes, text=" Gestion Manuelle des Soldes ")
         notebook.add(tab_feries, text=" Jours Fériés ")
+        notebook.add(tab_diagnostics, text=" Diagnostics ")
         
         self._populate_gestion_tab(tab_gestion)
         self._populate_soldes_tab(tab_soldes)
         self._populate_feries_tab(tab_feries)
+        self._populate_diagnostics_tab(tab_diagnostics)
+
+    def refresh_after_restore(self):
+        """Reconstruit les onglets à partir de la base restaurée (exercice, agents, jours fériés...)."""
+        self.annee_exercice = self.manager.get_annee_exercice()
+        self.selected_agent_id.set("")
+        self.solde_entries = {}
+        self.notebook.destroy()
+        self._create_widgets()
 
     def _populate_soldes_tab(self, parent_frame):
         selection_frame = ttk.LabelFrame(parent_frame, text="Sélectionner un Agent", padding=10)
         selection_frame.pack(fill="x", padx=10, pady=10)
         ttk.Label(selection_frame, text="Agent :").pack(side="left", padx=(0, 5))
         
-        all_agents = self.manager.get_all_agents()
-        agent_names = sorted([f"{agent.nom} {agent.prenom} (PPR: {agent.ppr})" for agent in all_agents])
-        self.agent_map = {f"{agent.nom} {agent.prenom} (PPR: {agent.ppr})": agent.id for agent in all_agents}
+        all_agents = self.manager.get_agent_refs()
+        agent_names = sorted([str(agent) for agent in all_agents])
+        self.agent_map = {str(agent): agent.id for agent in all_agents}
 
         agent_combo = ttk.Combobox(selection_frame, textvariable=self.selected_agent_id, values=agent_names, state="readonly", width=50)
         agent_combo.pack(side="left", fill="x", expand=True)
@@ -230,8 +318,16 @@ class AdminWindow(tk.Toplevel):
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        save_button = ttk.Button(parent_frame, text="Enregistrer les Modifications de Solde", command=self._save_soldes_manuellement)
-        save_button.pack(pady=10)
+        buttons_frame = ttk.Frame(parent_frame)
+        buttons_frame.pack(pady=10)
+        ttk.Button(buttons_frame, text="Enregistrer les Modifications de Solde", command=self._save_soldes_manuellement).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Historique des mouvements...", command=self._open_historique_soldes).pack(side="left", padx=5)
+
+    def _open_historique_soldes(self):
+        agent_name = self.selected_agent_id.get()
+        if not agent_name:
+            messagebox.showwarning("Aucun Agent", "Veuillez d'abord sélectionner un agent.", parent=self); return
+        HistoriqueSoldesWindow(self, self.manager, self.agent_map[agent_name], agent_name)
 
     def _on_agent_selected_for_soldes(self, event=None):
         for widget in self.scrollable_frame.winfo_children(): widget.destroy()
@@ -304,6 +400,7 @@ class AdminWindow(tk.Toplevel):
         action_frame = ttk.Frame(top_frame); action_frame.pack(pady=5, fill="x", padx=5)
         # --- CORRECTION DU TEXTE DU BOUTON ---
         delete_btn = ttk.Button(action_frame, text="Supprimer le jour sélectionné", command=self._delete_holiday); delete_btn.pack(side="right")
+        audit_btn = ttk.Button(action_frame, text="Vérifier les congés annuels de l'année", command=lambda: self._audit_conges_annuels(int(self.year_var.get()))); audit_btn.pack(side="left")
         edit_btn = ttk.Button(action_frame, text="Modifier le jour sélectionné", command=self._edit_holiday); edit_btn.pack(side="right", padx=(0, 10))
         bottom_frame = ttk.LabelFrame(main_frame, text="Ajouter un Jour Férié Personnalisé"); bottom_frame.pack(fill="x", pady=5, padx=5); add_frame = ttk.Frame(bottom_frame, padding=5); add_frame.pack(); ttk.Label(add_frame, text="Date:").grid(row=0, column=0, sticky="w", pady=2); self.date_entry = ttk.Entry(add_frame, width=15); self.date_entry.grid(row=0, column=1, padx=5); ttk.Button(add_frame, text="📅", width=2, command=lambda: DatePickerWindow(self, self.date_entry, self.manager)).grid(row=0, column=2); ttk.Label(add_frame, text="Description:").grid(row=1, column=0, sticky="w", pady=2); self.desc_entry = ttk.Entry(add_frame, width=30); self.desc_entry.grid(row=1, column=1, columnspan=2, padx=5); ttk.Button(bottom_frame, text="Ajouter ce jour férié", command=self.add_holiday).pack(pady=5); self.refresh_holidays_list()
 
@@ -317,26 +414,21 @@ class AdminWindow(tk.Toplevel):
 
     def _run_glissement_annuel(self):
         if messagebox.askyesno("Confirmation", f"Êtes-vous sûr de vouloir clôturer l'exercice {self.annee_exercice} ?\nCette action est IRREVERSIBLE.", icon='warning', parent=self):
-            try:
-                db_path = self.manager.db.get_db_path()
-                base_dir = os.path.dirname(db_path)
-                backups_dir = os.path.join(base_dir, "backups")
-                os.makedirs(backups_dir, exist_ok=True)
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                db_filename = os.path.basename(db_path)
-                backup_filename = f"backup_{timestamp}_AVANT_CLOTURE_{self.annee_exercice}_{db_filename}"
-                backup_path = os.path.join(backups_dir, backup_filename)
-                shutil.copy2(db_path, backup_path)
-            except Exception as e:
-                messagebox.showerror("Échec de la Sauvegarde", f"La sauvegarde automatique a échoué. L'opération de clôture est annulée.\n\nErreur : {e}", parent=self)
-                return
-            try:
-                self.manager.effectuer_glissement_annuel()
-                messagebox.showinfo("Succès", f"Le glissement annuel a été effectué.\nUne sauvegarde a été créée ici :\n{backup_path}", parent=self)
-                self.parent_window.refresh_all()
-                self.destroy()
-            except Exception as e:
-                messagebox.showerror("Erreur", f"Le glissement annuel a échoué : {e}\n\nPensez à vérifier la sauvegarde créée avant de réessayer.", parent=self)
+            label = f"AVANT_CLOTURE_{self.annee_exercice}"
+            BackupProgressWindow(self, "Sauvegarde avant clôture", lambda progress: self.manager.creer_sauvegarde(label=label, progress=progress), self._on_backup_avant_glissement)
+
+    def _on_backup_avant_glissement(self, snapshot):
+        self.grab_set()
+        if isinstance(snapshot, Exception):
+            messagebox.showerror("Échec de la Sauvegarde", f"La sauvegarde automatique a échoué. L'opération de clôture est annulée.\n\nErreur : {snapshot}", parent=self)
+            return
+        try:
+            resume = self.manager.effectuer_glissement_annuel()
+            messagebox.showinfo("Succès", f"Le glissement annuel a été effectué (exercice {resume['nouvelle_annee']}).\n- Soldes {resume['nouvelle_annee']} créés : {resume['soldes_crees']}\n- Soldes {resume['annee_expiree']} expirés : {resume['soldes_expires']}\n\nUn instantané a été créé avant la clôture :\n{snapshot['id']}", parent=self)
+            self.parent_window.refresh_all()
+            self.destroy()
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Le glissement annuel a échoué : {e}\n\nPensez à vérifier la sauvegarde créée avant de réessayer.", parent=self)
 
     def _run_apurement(self):
         selection = self.tree_expires.selection()
@@ -346,16 +438,47 @@ class AdminWindow(tk.Toplevel):
             try: self.manager.apurer_soldes(solde_ids); self.refresh_soldes_expires_list()
             except Exception as e: messagebox.showerror("Erreur", f"L'apurement a échoué : {e}", parent=self)
 
+    def _populate_diagnostics_tab(self, parent_frame):
+        instrumentation = self.manager.get_query_instrumentation()
+        if instrumentation is None:
+            ttk.Label(parent_frame, text="La mesure des requêtes est désactivée.\nActivez 'db.instrumentation.enabled' dans config.yaml puis relancez l'application.", justify="center").pack(expand=True)
+            return
+        self.diagnostics_label = ttk.Label(parent_frame, text=""); self.diagnostics_label.pack(fill="x", padx=10, pady=(10, 0))
+        cols = ("Appelant", "Requête", "Appels", "Total (ms)", "Moyenne (ms)", "p95 (ms)", "Lignes")
+        self.diagnostics_tree = ttk.Treeview(parent_frame, columns=cols, show="headings", height=15)
+        for col in cols: self.diagnostics_tree.heading(col, text=col)
+        self.diagnostics_tree.column("Appelant", width=200); self.diagnostics_tree.column("Requête", width=300)
+        for col in cols[2:]: self.diagnostics_tree.column(col, width=70, anchor="e")
+        self.diagnostics_tree.pack(fill="both", expand=True, padx=10, pady=5)
+        btn_frame = ttk.Frame(parent_frame); btn_frame.pack(fill="x", padx=10, pady=(0, 10))
+        ttk.Button(btn_frame, text="Rafraîchir", command=self.refresh_diagnostics).pack(side="left")
+        ttk.Button(btn_frame, text="Réinitialiser", command=lambda: (instrumentation.reset(), self.refresh_diagnostics())).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Exporter en JSON...", command=self._export_diagnostics).pack(side="right")
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        snapshot = self.manager.get_query_instrumentation().snapshot()
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for s in snapshot['requetes']:
+            self.diagnostics_tree.insert("", "end", values=(s['appelant'], s['sql'], s['appels'], f"{s['total_ms']:.1f}", f"{s['moyenne_ms']:.2f}", f"{s['p95_ms']:.2f}", s['lignes']))
+        self.diagnostics_label.config(text=f"Depuis le {snapshot['depuis']} : {sum(s['appels'] for s in snapshot['requetes'])} requêtes, {len(snapshot['requetes_lentes'])} requêtes lentes (> {snapshot['seuil_lent_ms']:.0f} ms).")
+
+    def _export_diagnostics(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json")], initialfile=f"requetes_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+        if not path: return
+        try:
+            self.manager.get_query_instrumentation().dump_json(path)
+            messagebox.showinfo("Export", f"Instantané des requêtes enregistré :\n{path}", parent=self)
+        except OSError as e:
+            messagebox.showerror("Erreur", f"Impossible d'enregistrer l'instantané : {e}", parent=self)
+
     def refresh_holidays_list(self):
         for row in self.holidays_tree.get_children(): self.holidays_tree.delete(row)
         try:
             year = int(self.year_var.get())
-            country_code = CONFIG['conges']['holidays_country']
-            official_holidays = holidays.country_holidays(country_code, years=year)
-            custom_holidays_list = self.manager.get_holidays_for_year(str(year))
             all_holidays_dict = {}
-            for h_date, h_name in official_holidays.items(): all_holidays_dict[h_date] = (h_name, "Officiel")
-            for h_date_str, h_name, h_type in custom_holidays_list: all_holidays_dict[validate_date(h_date_str).date()] = (h_name, h_type)
+            # Les jours personnalisés arrivent après les officiels de même date et les remplacent.
+            for h_date_str, h_name, h_type, h_source in self.manager.get_all_holidays_for_year(year): all_holidays_dict[parse_sql_date(h_date_str).date()] = (h_name, h_type)
             for h_date, (h_name, h_type) in sorted(all_holidays_dict.items()): self.holidays_tree.insert("", "end", values=(format_date_for_display(h_date), h_name, h_type))
         except (tk.TclError, ValueError): pass
         except Exception as e: messagebox.showerror("Erreur", f"Impossible de charger les jours fériés: {e}", parent=self)
@@ -378,6 +501,7 @@ class AdminWindow(tk.Toplevel):
             try:
                 if self.manager.delete_holiday(date_sql):
                     self.refresh_holidays_list()
+                    self._proposer_audit(int(date_sql[:4]))
                 else:
                     messagebox.showerror("Échec", "La suppression a échoué.", parent=self)
             except Exception as e:
@@ -397,6 +521,7 @@ class AdminWindow(tk.Toplevel):
                 self.manager.delete_holiday(original_date_sql)
             if self.manager.add_or_update_holiday(new_date_sql, new_name, "Personnalisé"):
                 self.refresh_holidays_list()
+                self._proposer_audit(new_date_obj.year)
             else:
                 messagebox.showerror("Échec", "La mise à jour a échoué.", parent=self)
         except Exception as e:
@@ -406,9 +531,167 @@ class AdminWindow(tk.Toplevel):
         date_str = self.date_entry.get(); desc = self.desc_entry.get().strip(); validated_date = validate_date(date_str)
         if not validated_date or not desc: messagebox.showerror("Erreur", "Veuillez entrer une date et une description valides.", parent=self); return
         date_sql = validated_date.strftime("%Y-%m-%d")
-        if self.manager.add_holiday(date_sql, desc, "Personnalisé"): self.desc_entry.delete(0, tk.END); self.date_entry.delete(0, tk.END); self.refresh_holidays_list()
+        if self.manager.add_holiday(date_sql, desc, "Personnalisé"): self.desc_entry.delete(0, tk.END); self.date_entry.delete(0, tk.END); self.refresh_holidays_list(); self._proposer_audit(validated_date.year)
         else: messagebox.showerror("Erreur", "Cette date est déjà enregistrée.", parent=self)
 
+    def _proposer_audit(self, year):
+        """Après une modification du calendrier, propose (sans l'imposer) l'audit de l'année : il parcourt toute la base."""
+        if messagebox.askyesno("Jours fériés modifiés", f"Le calendrier {year} a changé : les jours pris de certains congés annuels peuvent ne plus correspondre.\n\n"
+                               f"Vérifier maintenant les congés annuels de {year} ? (analyse de toute la base, possible plus tard avec le bouton de vérification)", parent=self):
+            self._audit_conges_annuels(year)
+
+    def _audit_conges_annuels(self, year):
+        """Audite les congés annuels de 'year' hors du thread Tk ; le rapport s'ouvre s'il relève des anomalies."""
+        def on_complete(report):
+            self.grab_set()
+            if isinstance(report, Exception):
+                messagebox.showerror("Erreur", f"L'audit des congés a échoué : {report}", parent=self); return
+            if len(report): ReportWindow(self, year, report)
+            else: messagebox.showinfo("Audit", f"Aucune anomalie sur les {report.nb_conges} congés annuels de {year} ({report.nb_agents} agents).", parent=self)
+        BackupProgressWindow(self, f"Audit des congés annuels {year}", lambda progress: self.manager.find_inconsistent_annual_leaves(year, progress=progress), on_complete)
+
+class HistoriqueSoldesWindow(tk.Toplevel):
+    """Journal des mouvements de solde d'un agent, et reconstitution de ses soldes à une date passée."""
+    LIMITE_MOUVEMENTS = 500
+
+    def __init__(self, parent, manager, agent_id, agent_name):
+        super().__init__(parent)
+        self.manager = manager
+        self.agent_id = agent_id
+        self.title(f"Historique des soldes - {agent_name}")
+        self.grab_set()
+        self.geometry("850x550")
+        self._create_widgets()
+        self.refresh_after_restore()
+
+    def _create_widgets(self):
+        main_frame = ttk.Frame(self, padding=10)
+        main_frame.pack(fill="both", expand=True)
+
+        date_frame = ttk.LabelFrame(main_frame, text="Soldes à une date", padding=10)
+        date_frame.pack(fill="x", pady=(0, 10))
+        ttk.Label(date_frame, text="Date (jj/mm/aaaa) :").pack(side="left")
+        self.date_entry = ttk.Entry(date_frame, width=12)
+        self.date_entry.pack(side="left", padx=5)
+        self.date_entry.insert(0, datetime.now().strftime("%d/%m/%Y"))
+        self.date_entry.bind("<Return>", lambda e: self._show_soldes_a_date())
+        ttk.Button(date_frame, text="📅", width=2, command=lambda: DatePickerWindow(self, self.date_entry, self.manager)).pack(side="left")
+        ttk.Button(date_frame, text="Afficher", command=self._show_soldes_a_date).pack(side="left", padx=5)
+        self.soldes_label = ttk.Label(date_frame, text="")
+        self.soldes_label.pack(side="left", padx=10)
+
+        cols = ("Date", "Année", "Type", "Mouvement", "Solde après", "Statut", "Congé")
+        self.tree = ttk.Treeview(main_frame, columns=cols, show="headings")
+        for col in cols: self.tree.heading(col, text=col); self.tree.column(col, width=100, anchor="center")
+        self.tree.column("Date", width=150)
+        scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def refresh_after_restore(self):
+        for row in self.tree.get_children(): self.tree.delete(row)
+        try:
+            for _, date_mvt, annee, type_mvt, delta, solde_apres, statut, conge_id in self.manager.get_mouvements_solde(self.agent_id, limit=self.LIMITE_MOUVEMENTS):
+                self.tree.insert("", "end", values=(date_mvt, annee, type_mvt, f"{delta:+.1f}", f"{solde_apres:.1f}", statut, conge_id or ""))
+        except sqlite3.Error as e: messagebox.showerror("Erreur BD", f"Impossible de charger l'historique : {e}", parent=self)
+        self._show_soldes_a_date()
+
+    def _show_soldes_a_date(self):
+        date_obj = validate_date(self.date_entry.get())
+        if not date_obj:
+            messagebox.showerror("Erreur", "Veuillez entrer une date valide.", parent=self); return
+        try: soldes = self.manager.get_soldes_a_date(self.agent_id, date_obj.strftime("%Y-%m-%d"))
+        except sqlite3.Error as e: messagebox.showerror("Erreur BD", f"Impossible de reconstituer les soldes : {e}", parent=self); return
+        actifs = [s for s in soldes if s.statut == "Actif"]
+        details = ", ".join(f"{s.annee} : {s.solde:.1f}j" for s in actifs) or "aucun solde actif"
+        self.soldes_label.config(text=f"{details} (total {sum(s.solde for s in actifs):.1f}j)")
+
+class CoverageWindow(tk.Toplevel):
+    """Nombre d'agents absents par jour et par grade sur une période ; les jours au-delà du seuil sont en rouge."""
+    JOURS_PAR_DEFAUT = 90
+
+    def __init__(self, parent, manager):
+        super().__init__(parent)
+        self.manager = manager
+        self.report = None
+        self.title("Couverture des effectifs")
+        self.geometry("900x600")
+        self._create_widgets()
+        self.calculer()
+
+    def _create_widgets(self):
+        main_frame = ttk.Frame(self, padding=10)
+        main_frame.pack(fill="both", expand=True)
+
+        period_frame = ttk.LabelFrame(main_frame, text="Période", padding=10)
+        period_frame.pack(fill="x", pady=(0, 10))
+        today = datetime.now()
+        self.start_entry = self._date_field(period_frame, "Du :", today)
+        self.end_entry = self._date_field(period_frame, "Au :", today + timedelta(days=self.JOURS_PAR_DEFAUT))
+        ttk.Button(period_frame, text="Calculer", command=self.calculer).pack(side="left", padx=10)
+        ttk.Button(period_frame, text="Exporter en CSV...", command=self._export_csv).pack(side="left")
+
+        self.summary_label = ttk.Label(main_frame, text="")
+        self.summary_label.pack(fill="x", pady=(0, 5))
+
+        self.tree_frame = ttk.Frame(main_frame)
+        self.tree_frame.pack(fill="both", expand=True)
+        self.tree = None
+
+    def _date_field(self, parent, label, default):
+        ttk.Label(parent, text=label).pack(side="left")
+        entry = ttk.Entry(parent, width=12)
+        entry.pack(side="left", padx=5)
+        entry.insert(0, default.strftime("%d/%m/%Y"))
+        entry.bind("<Return>", lambda e: self.calculer())
+        ttk.Button(parent, text="📅", width=2, command=lambda: DatePickerWindow(self, entry, self.manager)).pack(side="left", padx=(0, 10))
+        return entry
+
+    def _get_period(self):
+        start_date, end_date = validate_date(self.start_entry.get()), validate_date(self.end_entry.get())
+        if not start_date or not end_date or end_date < start_date:
+            messagebox.showerror("Erreur", "Veuillez entrer une période valide (la fin ne peut précéder le début).", parent=self)
+            return None
+        return start_date, end_date
+
+    def _build_tree(self, grades):
+        # Les colonnes dépendent des grades présents : l'arbre est reconstruit à chaque calcul.
+        for child in self.tree_frame.winfo_children(): child.destroy()
+        cols = ("Date", "Total", *grades)
+        self.tree = ttk.Treeview(self.tree_frame, columns=cols, show="headings")
+        for col in cols: self.tree.heading(col, text=col); self.tree.column(col, width=90, anchor="center")
+        self.tree.column("Date", width=110)
+        self.tree.tag_configure("critique", foreground="red")
+        scrollbar = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def refresh_after_restore(self): self.calculer()
+
+    def calculer(self):
+        period = self._get_period()
+        if not period: return
+        try: self.report = self.manager.calculer_couverture(*period)
+        except (sqlite3.Error, ValueError) as e: messagebox.showerror("Erreur", f"Impossible de calculer la couverture : {e}", parent=self); return
+        critiques = self.report.jours_critiques()
+        self._build_tree(self.report.grades)
+        for jour, total, *counts in self.report.rows():
+            self.tree.insert("", "end", values=(format_date_for_display(jour), total, *counts), tags=("critique",) if jour in critiques else ())
+        pic = max(self.report.totaux, default=0)
+        self.summary_label.config(text=f"{len(self.report.totaux)} jour(s), jusqu'à {pic} absent(s) le même jour ; {len(critiques)} jour(s) au-delà du seuil.",
+                                  foreground="red" if critiques else "")
+
+    def _export_csv(self):
+        period = self._get_period()
+        if not period: return
+        save_path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv", filetypes=[("Fichiers CSV", "*.csv")], title="Exporter la couverture des effectifs",
+                                                 initialfile=f"Couverture_{period[0].strftime('%Y-%m-%d')}_{period[1].strftime('%Y-%m-%d')}.csv")
+        if not save_path: return
+        try: messagebox.showinfo("Succès", export_coverage_to_csv(self.manager, save_path, *period), parent=self)
+        except (OSError, sqlite3.Error, ValueError) as e: messagebox.showerror("Erreur", f"L'exportation a échoué :\n{e}", parent=self)
+
 class JustificatifsWindow(tk.Toplevel):
     def __init__(self, parent, manager):
         super().__init__(parent); self.manager = manager; self.title("Suivi des Justificatifs Médicaux"); self.grab_set(); self.geometry("800x600"); self.filter_var = tk.StringVar(value="manquant"); self.search_var = tk.StringVar(); self._create_widgets(); self.refresh_list()
@@ -417,6 +700,7 @@ class JustificatifsWindow(tk.Toplevel):
         for col in cols: self.tree.heading(col, text=col); self.tree.column(col, width=120)
         self.tree.pack(fill="both", expand=True, padx=5, pady=5)
     def _clear_search(self): self.search_var.set(""); self.refresh_list()
+    def refresh_after_restore(self): self.refresh_list()
     def refresh_list(self):
         for row in self.tree.get_children(): self.tree.delete(row)
         try:
@@ -427,11 +711,27 @@ class JustificatifsWindow(tk.Toplevel):
         except sqlite3.Error as e: messagebox.showerror("Erreur BD", f"Impossible de charger la liste : {e}", parent=self)
 
 class ReportWindow(tk.Toplevel):
-    def __init__(self, parent, year, inconsistencies):
-        super().__init__(parent); self.manager = parent.manager; self.title(f"Rapport d'incohérence pour {year}"); self.grab_set(); self.geometry("900x400"); main_frame = ttk.Frame(self, padding=10); main_frame.pack(fill="both", expand=True); info_label = ttk.Label(main_frame, text="Les congés suivants ne sont plus valides car des jours fériés ont été modifiés.\nVous devriez les modifier manuellement.", wraplength=850, justify="center"); info_label.pack(fill="x", pady=10); cols = ("Agent", "Début Congé", "Fin Congé", "Jours Pris (Enregistré)", "Jours Dûs (Calculé)"); tree = ttk.Treeview(main_frame, columns=cols, show="headings");
-        for col in cols: tree.heading(col, text=col)
-        tree.column("Agent", width=200); tree.column("Début Congé", width=120, anchor="center"); tree.column("Fin Congé", width=120, anchor="center"); tree.column("Jours Pris (Enregistré)", width=150, anchor="center"); tree.column("Jours Dûs (Calculé)", width=150, anchor="center"); tree.tag_configure("error", background="#FFDDDD")
-        for conge, recalculated_days in inconsistencies:
-            agent = self.manager.get_agent_by_id(conge.agent_id); agent_name = f"{agent.nom} {agent.prenom}" if agent else "Agent Inconnu"
-            tree.insert("", "end", values=(agent_name, conge.date_debut.strftime('%d/%m/%Y'), conge.date_fin.strftime('%d/%m/%Y'), conge.jours_pris, recalculated_days), tags=("error",))
-        tree.pack(fill="both", expand=True); ttk.Button(main_frame, text="Fermer", command=self.destroy).pack(pady=10)
\ No newline at end of file
+    """Rapport d'audit des congés annuels d'une année (core.conges.audit.AuditReport), un onglet par type d'anomalie."""
+    def __init__(self, parent, year, report):
+        super().__init__(parent); self.title(f"Rapport d'incohérence pour {year}"); self.grab_set(); self.geometry("900x450")
+        main_frame = ttk.Frame(self, padding=10); main_frame.pack(fill="both", expand=True)
+        ttk.Label(main_frame, text=f"{report.nb_conges} congés annuels de {report.nb_agents} agents audités. Les congés dont le décompte ne correspond plus aux jours fériés actuels doivent être modifiés manuellement.", wraplength=850, justify="center").pack(fill="x", pady=10)
+        notebook = ttk.Notebook(main_frame); notebook.pack(fill="both", expand=True)
+        date_fmt = lambda d: d.strftime('%d/%m/%Y')
+        self._add_tab(notebook, f"Jours à recalculer ({len(report.jours_incoherents)})", ("Agent", "Début Congé", "Fin Congé", "Jours Pris (Enregistré)", "Jours Dûs (Calculé)"),
+                      [(report.agent_name(c.agent_id), date_fmt(c.date_debut), date_fmt(c.date_fin), c.jours_pris, jours) for c, jours in report.jours_incoherents])
+        self._add_tab(notebook, f"Chevauchements ({len(report.chevauchements)})", ("Agent", "Congé", "Chevauche"),
+                      [(report.agent_name(a.agent_id), f"{a.type_conge} du {date_fmt(a.date_debut)} au {date_fmt(a.date_fin)}", f"{b.type_conge} du {date_fmt(b.date_debut)} au {date_fmt(b.date_fin)}") for a, b in report.chevauchements])
+        self._add_tab(notebook, f"Soldes ({len(report.soldes_negatifs) + len(report.ecarts_journal)})", ("Agent", "Année", "Statut", "Solde Enregistré", "Solde du Journal"),
+                      [(report.agent_name(s.agent_id), s.annee, s.statut, f"{s.solde:.1f}", "") for s in report.soldes_negatifs]
+                      + [(report.agent_name(s.agent_id), s.annee, s.statut, f"{s.solde:.1f}", f"{solde_journal:.1f}") for s, solde_journal in report.ecarts_journal])
+        ttk.Button(main_frame, text="Fermer", command=self.destroy).pack(pady=10)
+
+    @staticmethod
+    def _add_tab(notebook, title, cols, rows):
+        frame = ttk.Frame(notebook); notebook.add(frame, text=f" {title} ")
+        tree = ttk.Treeview(frame, columns=cols, show="headings"); tree.tag_configure("error", background="#FFDDDD")
+        for col in cols: tree.heading(col, text=col); tree.column(col, width=150, anchor="center")
+        tree.column("Agent", width=200, anchor="w")
+        for values in rows: tree.insert("", "end", values=values, tags=("error",))
+        tree.pack(fill="both", expand=True)
@@ -1,11 +1,11 @@
 # Fichier : utils/date_utils.py
 # Version finale avec ajout de la fonction manquante.
 
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timedelta, date
+from functools import lru_cache
 from dateutil import parser
-import holidays
-import sqlite3
-import logging
 from utils.config_loader import CONFIG
 
 def format_date_for_display(date_str_sql):
@@ -15,7 +15,7 @@ def format_date_for_display(date_str_sql):
         # Si c'est déjà un objet date/datetime, on le formate directement
         if hasattr(date_str_sql, 'strftime'):
             return date_str_sql.strftime("%d/%m/%Y")
-        return parser.parse(date_str_sql).strftime("%d/%m/%Y")
+        return parse_sql_date(date_str_sql).strftime("%d/%m/%Y")
     except (ValueError, TypeError):
         return date_str_sql
 
@@ -28,52 +28,143 @@ def format_date_for_display_short(date_obj):
     try:
         if hasattr(date_obj, 'strftime'):
             return date_obj.strftime("%d/%m/%y")
-        return parser.parse(str(date_obj)).strftime("%d/%m/%y")
+        return parse_sql_date(str(date_obj)).strftime("%d/%m/%y")
     except (ValueError, TypeError):
         return str(date_obj)
 
 def validate_date(date_str, dayfirst=True):
-    """Valide et convertit une chaîne de caractères en objet datetime."""
+    """Valide et convertit une saisie libre de l'utilisateur en objet datetime."""
     if not date_str: return None
     try:
         return parser.parse(date_str, dayfirst=dayfirst)
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError): # OverflowError : longue suite de chiffres
         return None
 
-def get_holidays_set_for_period(db_manager, start_year, end_year):
-    """Charge les jours fériés (officiels et personnalisés) pour une période donnée."""
-    country_code = CONFIG['conges']['holidays_country']
-    all_h = {}
-    for year in range(start_year, end_year + 2):
-        all_h.update(holidays.country_holidays(country_code, years=year))
-        try:
-            if db_manager and db_manager.conn:
-                db_h = db_manager.get_holidays_for_year(str(year))
-                for date_str, name, type in db_h:
-                    all_h[validate_date(date_str).date()] = name
-        except sqlite3.Error as e:
-            logging.error(f"Erreur lors du chargement des jours fériés pour l'année {year}: {e}")
-    return set(all_h.keys())
+def parse_sql_date(value):
+    """
+    Convertit une date écrite par la base (YYYY-MM-DD) en objet datetime.
+    Chemin rapide via datetime.fromisoformat ; dateutil n'est utilisé que pour d'anciennes
+    lignes dans un format libre.
+    """
+    if not value: return None
+    if isinstance(value, datetime): return value
+    if isinstance(value, date): return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return validate_date(value, dayfirst=False)
+
+def load_official_holidays(year, country_code=None):
+    """
+    Génère les jours fériés officiels d'une année, sous forme {date: nom}.
+    La bibliothèque 'holidays' n'est importée qu'ici : elle ne sert qu'à (re)générer une année
+    absente de la base.
+    """
+    import holidays
+    return dict(holidays.country_holidays(country_code or CONFIG['conges']['holidays_country'], years=year))
+
+def as_date(value):
+    """Ramène une date (date, datetime, numpy.datetime64 ou texte YYYY-MM-DD[ HH:MM:SS]) à un objet date."""
+    if isinstance(value, datetime): return value.date()
+    if isinstance(value, date) or value is None: return value
+    if isinstance(value, str): return date.fromisoformat(value[:10])
+    if hasattr(value, 'astype'): return value.astype('datetime64[D]').item() # numpy.datetime64
+    return value
+
+class BusinessDayIndex:
+    """
+    Index des jours ouvrés pour un ensemble de jours fériés donné.
+
+    Conserve, pour une plage d'années civiles complètes :
+      - le tableau des cumuls de jours ouvrés indexé par date ordinale :
+        cumul[i] = nombre de jours ouvrés avant le jour 'origine + i' ;
+      - le tableau du « prochain jour ouvré » : suivant[i] = premier jour ouvré >= 'origine + i'.
+    Compter les jours ouvrés entre deux dates revient alors à une soustraction, trouver la date
+    de fin à une recherche dichotomique et trouver la date de reprise à une simple lecture.
+    La plage est étendue automatiquement si une date demandée en sort.
+    """
+    def __init__(self, holidays_set):
+        self.holidays = frozenset(holidays_set)
+        self._holiday_ordinals = {as_date(d).toordinal() for d in self.holidays}
+        self._span = None # (première année, dernière année, ordinal d'origine, cumuls, jours ouvrés suivants)
+
+    def _ensure(self, first_day, last_day):
+        span = self._span
+        if span and span[2] <= first_day.toordinal() and last_day < date(span[1] + 1, 1, 1):
+            return span
+        first_year, last_year = first_day.year, last_day.year
+        if span:
+            first_year, last_year = min(first_year, span[0]), max(last_year, span[1])
+        origin = date(first_year, 1, 1).toordinal()
+        end = date(last_year, 12, 31).toordinal()
+        cumul = array('l', [0])
+        count = 0
+        for ordinal in range(origin, end + 1):
+            # L'ordinal 1 (01/01/0001) est un lundi : (ordinal - 1) % 7 donne le weekday().
+            if (ordinal - 1) % 7 < 5 and ordinal not in self._holiday_ordinals:
+                count += 1
+            cumul.append(count)
+        # suivant[i] vaut -1 s'il n'y a plus de jour ouvré dans la plage.
+        size = end - origin + 1
+        suivant = array('l', [-1]) * size
+        next_offset = -1
+        for offset in range(size - 1, -1, -1):
+            if cumul[offset + 1] != cumul[offset]:
+                next_offset = offset
+            suivant[offset] = next_offset
+        # Une seule affectation : un autre thread voit soit l'ancienne plage, soit la nouvelle.
+        self._span = span = (first_year, last_year, origin, cumul, suivant)
+        return span
+
+    def count(self, date_debut, date_fin):
+        """Nombre de jours ouvrés entre deux dates incluses."""
+        if not date_debut or not date_fin: return 0
+        start, end = as_date(date_debut), as_date(date_fin)
+        if end < start: return 0
+        _, _, origin, cumul, _ = self._ensure(start, end)
+        return cumul[end.toordinal() - origin + 1] - cumul[start.toordinal() - origin]
+
+    def add_working_days(self, date_debut, nb_jours):
+        """Date du N-ième jour ouvré à partir de 'date_debut' (incluse), par recherche dichotomique."""
+        start = as_date(date_debut)
+        # Borne haute : 5 jours ouvrés par semaine, plus une marge pour les jours fériés.
+        horizon = start + timedelta(days=nb_jours * 7 // 5 + len(self.holidays) + 7)
+        while True:
+            _, _, origin, cumul, _ = self._ensure(start, horizon)
+            first = start.toordinal() - origin
+            target = cumul[first] + nb_jours
+            # Premier indice j tel que cumul[j] >= cible : le dernier jour compté est j - 1.
+            found = bisect_left(cumul, target, first + 1)
+            if found < len(cumul):
+                return date.fromordinal(origin + found - 1)
+            horizon = date(horizon.year + 1, 12, 31)
+
+    def next_working_day(self, day):
+        """Premier jour ouvré à partir de 'day' (inclus)."""
+        day = as_date(day)
+        horizon = day + timedelta(days=31)
+        while True:
+            _, _, origin, _, suivant = self._ensure(day, horizon)
+            offset = suivant[day.toordinal() - origin]
+            if offset >= 0:
+                return date.fromordinal(origin + offset)
+            horizon = date(horizon.year + 1, 12, 31)
+
+@lru_cache(maxsize=16)
+def _business_day_index_for(frozen_holidays):
+    return BusinessDayIndex(frozen_holidays)
+
+def get_business_day_index(holidays_set):
+    """Retourne l'index (mis en cache) associé à un ensemble de jours fériés."""
+    # frozenset() sur un frozenset renvoie le même objet, dont le hash est déjà mémorisé.
+    return _business_day_index_for(frozenset(holidays_set))
 
 def jours_ouvres(date_debut, date_fin, holidays_set):
     """Calcule le nombre de jours ouvrés entre deux dates, en excluant les jours fériés."""
-    if not date_debut or not date_fin or date_fin < date_debut:
-        return 0
-    jours = 0
-    current_day = date_debut.date() if isinstance(date_debut, datetime) else date_debut
-    end_day = date_fin.date() if isinstance(date_fin, datetime) else date_fin
-    while current_day <= end_day:
-        if current_day.weekday() < 5 and current_day not in holidays_set:
-            jours += 1
-        current_day += timedelta(days=1)
-    return jours
+    return get_business_day_index(holidays_set).count(date_debut, date_fin)
 
 def calculate_reprise_date(end_date, holidays_set):
     """Calcule la date de reprise de service."""
     if not end_date:
         return None
-    reprise_date = end_date.date() if isinstance(end_date, datetime) else end_date
-    reprise_date += timedelta(days=1)
-    while reprise_date.weekday() >= 5 or reprise_date in holidays_set: 
-        reprise_date += timedelta(days=1)
-    return reprise_date
\ No newline at end of file
+    return get_business_day_index(holidays_set).next_working_day(as_date(end_date) + timedelta(days=1))
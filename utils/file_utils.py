@@ -1,6 +1,7 @@
 # Fichier : utils/file_utils.py
 # Version finale avec la nouvelle logique d'importation flexible.
 
+import csv
 import openpyxl
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
@@ -8,33 +9,22 @@ from datetime import datetime
 import re
 import logging # Ajout pour un meilleur logging
 
-# On importe les classes nécessaires pour communiquer avec la DB et le Manager
-from db.database import DatabaseManager
-from core.conges.manager import CongeManager
 from utils.config_loader import CONFIG
 from utils.date_utils import format_date_for_display
 
-def _perform_db_operation_with_manager(db_path, operation_callback):
+def _perform_db_operation_with_manager(manager, operation_callback):
     """
-    Fonction utilitaire pour gérer la connexion/déconnexion DB dans un thread.
-    Utilise une instance du CongeManager pour accéder à la logique métier.
+    Fonction utilitaire pour exécuter une opération dans un thread de travail.
+    Le thread emprunte une connexion au pool du DatabaseManager de l'application
+    (déjà ouverte et configurée) et la rend à la fin, pour la tâche suivante.
     """
-    db = DatabaseManager(db_path)
-    if not db.connect():
-        raise ConnectionError("Impossible de se connecter à la base de données depuis le thread.")
-    
-    manager = CongeManager(db, certificats_dir='')
-
-    try:
-        result = operation_callback(manager)
-        return result
-    finally:
-        db.close()
-
-def export_agents_to_excel(db_path, save_path):
+    with manager.db.thread_connection():
+        return operation_callback(manager)
+
+def export_agents_to_excel(manager, save_path):
     """Exporte la liste des agents. Conçu pour être exécuté dans un thread."""
     def operation(manager):
-        agents = manager.get_all_agents()
+        agents = manager.get_agents_with_resume()
         if not agents:
             return "Aucun agent à exporter."
         
@@ -50,14 +40,9 @@ def export_agents_to_excel(db_path, save_path):
         for cell in ws[1]: cell.font = header_font
 
         for agent in agents:
-            soldes_par_annee = {s.annee: s.solde for s in agent.soldes_annuels if s.statut == 'Actif'}
-            solde_n2 = soldes_par_annee.get(an_n2, 0.0)
-            solde_n1 = soldes_par_annee.get(an_n1, 0.0)
-            solde_n  = soldes_par_annee.get(an_n, 0.0)
-            solde_total = agent.get_solde_total_actif()
-            
+            r = agent.resume_soldes
             ws.append([agent.id, agent.nom, agent.prenom, agent.ppr, agent.grade, 
-                       solde_n2, solde_n1, solde_n, solde_total])
+                       r.solde_n2, r.solde_n1, r.solde_n, r.total_actif])
 
         for col_idx, col_cells in enumerate(ws.columns, 1):
             max_length = max(len(str(cell.value or "")) for cell in col_cells)
@@ -66,9 +51,9 @@ def export_agents_to_excel(db_path, save_path):
         wb.save(save_path)
         return f"Liste des agents exportée avec succès vers\n{save_path}"
 
-    return _perform_db_operation_with_manager(db_path, operation)
+    return _perform_db_operation_with_manager(manager, operation)
 
-def export_all_conges_to_excel(db_path, save_path):
+def export_all_conges_to_excel(manager, save_path):
     def operation(manager):
         all_conges = manager.get_all_conges()
         if not all_conges: return "Aucun congé à exporter."
@@ -77,7 +62,7 @@ def export_all_conges_to_excel(db_path, save_path):
         ws.append(headers)
         header_font = Font(bold=True)
         for cell in ws[1]: cell.font = header_font
-        all_agents = {agent.id: agent for agent in manager.get_all_agents()}
+        all_agents = {agent.id: agent for agent in manager.get_agent_refs()}
         for conge in all_conges:
             agent = all_agents.get(conge.agent_id)
             agent_nom, agent_prenom, agent_ppr = (agent.nom, agent.prenom, agent.ppr) if agent else ("Agent", "Supprimé", "")
@@ -93,12 +78,26 @@ def export_all_conges_to_excel(db_path, save_path):
         wb.save(save_path)
         return f"Tous les congés ont été exportés avec succès vers\n{save_path}"
 
-    return _perform_db_operation_with_manager(db_path, operation)
+    return _perform_db_operation_with_manager(manager, operation)
 
-def import_agents_from_excel(db_path, source_path):
+def export_coverage_to_csv(manager, save_path, start_date, end_date):
+    """Exporte les absents par jour et par grade d'une période (CSV ';', lisible par Excel)."""
+    def operation(manager):
+        report = manager.calculer_couverture(start_date, end_date)
+        critiques = report.jours_critiques()
+        with open(save_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(["Date", "Total absents", *report.grades, "Grades au-delà du seuil"])
+            for jour, total, *counts in report.rows():
+                writer.writerow([format_date_for_display(jour), total, *counts, ", ".join(critiques.get(jour, []))])
+        return f"Couverture du {format_date_for_display(report.debut)} au {format_date_for_display(report.fin)} exportée vers\n{save_path}\n\n{len(critiques)} jour(s) au-delà du seuil."
+
+    return _perform_db_operation_with_manager(manager, operation)
+
+def import_agents_from_excel(manager, source_path):
     """Importe des agents avec une logique de colonnes optionnelles."""
     def operation(manager):
-        errors = []; added_count, updated_count = 0, 0
+        errors = []
         
         required_headers = ['nom', 'prenom']
         grades = CONFIG['ui']['grades']
@@ -113,59 +112,53 @@ def import_agents_from_excel(db_path, source_path):
 
         col_map = {name: i for i, name in enumerate(header)}
         
-        manager.db.conn.execute('BEGIN TRANSACTION')
-        try:
-            for i, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                if all(c is None for c in row): continue
-                try:
-                    nom = str(row[col_map['nom']] or '').strip()
-                    prenom = str(row[col_map['prenom']] or '').strip()
-                    if not nom or not prenom:
-                        raise ValueError("Nom et prénom sont obligatoires.")
-
-                    ppr = str(row[col_map.get('ppr')] or '').strip() or f"{nom.upper()[:4]}_{datetime.now().strftime('%f')}"
-                    grade = str(row[col_map.get('grade')] or '').strip() or default_grade
-                    if grade not in grades:
-                        raise ValueError(f"Grade '{grade}' invalide. Grades valides : {', '.join(grades)}")
-
-                    soldes = {}
-                    for col_name, col_idx in col_map.items():
-                        match = re.match(r'solde_(\d{4})', col_name)
-                        if match and row[col_idx] is not None:
-                            annee = int(match.group(1))
-                            solde_val = float(str(row[col_idx]).replace(",", "."))
-                            if solde_val < 0:
-                                raise ValueError(f"Solde négatif pour l'année {annee}.")
-                            soldes[annee] = solde_val
-                    
-                    agent_data = {
-                        'nom': nom, 'prenom': prenom, 'ppr': ppr, 'grade': grade,
-                        'soldes': soldes
-                    }
-                    
-                    existing_agent_id = manager.db.execute_query("SELECT id FROM agents WHERE ppr=?", (ppr,), fetch="one")
-                    if existing_agent_id:
-                        agent_data['id'] = existing_agent_id[0]
-                        manager.save_agent(agent_data, is_modification=True)
-                        updated_count += 1
-                    else:
-                        manager.save_agent(agent_data, is_modification=False)
-                        added_count += 1
-                
-                except Exception as ve:
-                    # On logue l'erreur pour le debug, mais on l'ajoute à la liste pour l'utilisateur
-                    logging.warning(f"Erreur d'import à la ligne {i}: {ve}", exc_info=True)
-                    errors.append(f"Ligne {i}: {ve}")
+        # Validation de toutes les lignes en mémoire, puis écriture en masse dans une seule transaction.
+        agents_rows, soldes_par_ppr = [], {}
+        for i, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            if all(c is None for c in row): continue
+            try:
+                nom = str(row[col_map['nom']] or '').strip()
+                prenom = str(row[col_map['prenom']] or '').strip()
+                if not nom or not prenom:
+                    raise ValueError("Nom et prénom sont obligatoires.")
+
+                ppr = str(row[col_map.get('ppr')] or '').strip() or f"{nom.upper()[:4]}_{datetime.now().strftime('%f')}"
+                grade = str(row[col_map.get('grade')] or '').strip() or default_grade
+                if grade not in grades:
+                    raise ValueError(f"Grade '{grade}' invalide. Grades valides : {', '.join(grades)}")
+
+                soldes = {}
+                for col_name, col_idx in col_map.items():
+                    match = re.match(r'solde_(\d{4})', col_name)
+                    if match and row[col_idx] is not None:
+                        annee = int(match.group(1))
+                        solde_val = float(str(row[col_idx]).replace(",", "."))
+                        if solde_val < 0:
+                            raise ValueError(f"Solde négatif pour l'année {annee}.")
+                        soldes[annee] = solde_val
+
+                agents_rows.append((nom, prenom, ppr, grade))
+                soldes_par_ppr.setdefault(ppr, soldes)
             
-            if errors:
-                manager.db.conn.rollback()
-                raise Exception("Importation annulée en raison d'erreurs:\n" + "\n".join(errors[:10]))
-            else:
-                manager.db.conn.commit()
-                return f"Importation réussie !\n\n- Agents ajoutés : {added_count}\n- Agents mis à jour : {updated_count}"
-
-        except Exception as e:
-            manager.db.conn.rollback()
-            raise e
-
-    return _perform_db_operation_with_manager(db_path, operation)
\ No newline at end of file
+            except Exception as ve:
+                # On logue l'erreur pour le debug, mais on l'ajoute à la liste pour l'utilisateur
+                logging.warning(f"Erreur d'import à la ligne {i}: {ve}", exc_info=True)
+                errors.append(f"Ligne {i}: {ve}")
+        
+        if errors:
+            raise Exception("Importation annulée en raison d'erreurs:\n" + "\n".join(errors[:10]))
+
+        with manager.db.transaction():
+            # Les agents déjà connus (par PPR) sont mis à jour ; seuls les nouveaux reçoivent des soldes.
+            pprs_existants = manager.db.get_existing_pprs(list(soldes_par_ppr))
+            agent_ids = manager.db.bulk_insert_agents(agents_rows, update_existing=True)
+            annee_exercice = manager.get_annee_exercice()
+            nouveaux = {row[2]: agent_id for row, agent_id in zip(agents_rows, agent_ids) if row[2] not in pprs_existants}
+            soldes_rows = [r for ppr, agent_id in nouveaux.items() for r in manager.soldes_initiaux_rows(agent_id, soldes_par_ppr[ppr], annee_exercice)]
+            manager.db.bulk_upsert_soldes(soldes_rows)
+        # Les grades des agents mis à jour ont pu changer.
+        manager.coverage.invalidate()
+        added_count = len(nouveaux); updated_count = len(agents_rows) - added_count
+        return f"Importation réussie !\n\n- Agents ajoutés : {added_count}\n- Agents mis à jour : {updated_count}"
+
+    return _perform_db_operation_with_manager(manager, operation)